@@ -1,10 +1,9 @@
-import type { NVConfigOptions } from "@niivue/niivue";
+import type { NVConfigOptions, Niivue } from "@niivue/niivue";
 import type {
 	AnyModel,
+	BatchData,
 	Model,
-	Scene,
 	TypedBufferPayload,
-	UIData,
 } from "./types.ts";
 
 function delay(ms: number) {
@@ -48,12 +47,262 @@ export function deserializeOptions(
 	return result as NVConfigOptions;
 }
 
+/**
+ * Codecs this browser can decode, reported to the kernel through `_codecs`.
+ */
+export function supportedCodecs(): string[] {
+	return typeof DecompressionStream === "undefined" ? [] : ["deflate"];
+}
+
+export async function compressBuffer(
+	buffer: ArrayBuffer,
+	codec: string,
+): Promise<ArrayBuffer> {
+	const stream = new Blob([buffer])
+		.stream()
+		.pipeThrough(new CompressionStream(codec as CompressionFormat));
+	return new Response(stream).arrayBuffer();
+}
+
+export async function decompressBuffer(
+	view: DataView,
+	codec: string,
+): Promise<DataView> {
+	const bytes = new Uint8Array(
+		view.buffer as ArrayBuffer,
+		view.byteOffset,
+		view.byteLength,
+	);
+	const stream = new Blob([bytes])
+		.stream()
+		.pipeThrough(new DecompressionStream(codec as CompressionFormat));
+	return new DataView(await new Response(stream).arrayBuffer());
+}
+
+export type BlobRef = { blob: string | null } | null;
+
+type BlobRegistry = {
+	blobs: Map<string, ArrayBuffer>;
+	pending: Map<string, Promise<ArrayBuffer>>;
+	bytes: number;
+};
+
+// Blobs received from the kernel, keyed by content hash. Kept on globalThis
+// so every widget on the page shares them, whichever bundle loaded it.
+const BLOB_CACHE_BYTES = 512 * 1024 * 1024;
+// A blob request fails if no chunk of it arrives for this long, e.g. when
+// the widget that asked for it was closed
+const BLOB_TIMEOUT_MS = 60_000;
+const blobRegistry: BlobRegistry = ((
+	globalThis as { __ipyniivueBlobs?: BlobRegistry }
+).__ipyniivueBlobs ??= { blobs: new Map(), pending: new Map(), bytes: 0 });
+
+function cacheBlob(hash: string, buffer: ArrayBuffer) {
+	if (buffer.byteLength > BLOB_CACHE_BYTES / 4) {
+		return;
+	}
+	blobRegistry.blobs.set(hash, buffer);
+	blobRegistry.bytes += buffer.byteLength;
+	// evict least recently used blobs, keeping at least the newest one
+	for (const [key, old] of blobRegistry.blobs) {
+		if (blobRegistry.bytes <= BLOB_CACHE_BYTES || key === hash) {
+			break;
+		}
+		blobRegistry.blobs.delete(key);
+		blobRegistry.bytes -= old.byteLength;
+	}
+}
+
+/**
+ * Get the contents of a blob, asking the kernel (through `model`) only if no
+ * widget on the page has received it yet. Cached blobs resolve to a copy,
+ * since loaders may take ownership of (detach) the buffer they are given.
+ */
+export async function resolveBlob(
+	model: AnyModel,
+	hash: string,
+): Promise<ArrayBuffer> {
+	const cached = blobRegistry.blobs.get(hash);
+	if (cached) {
+		// refresh its position in the LRU order
+		blobRegistry.blobs.delete(hash);
+		blobRegistry.blobs.set(hash, cached);
+		return cached.slice(0);
+	}
+
+	let pending = blobRegistry.pending.get(hash);
+	if (!pending) {
+		pending = receiveBlob(model, hash).finally(() => {
+			blobRegistry.pending.delete(hash);
+		});
+		blobRegistry.pending.set(hash, pending);
+	}
+	const buffer = await pending;
+	// blobs too large to cache are handed over without a copy
+	return blobRegistry.blobs.has(hash) ? buffer.slice(0) : buffer;
+}
+
+/**
+ * Request a blob from the kernel, which sends it as `blob_chunk` messages.
+ * Chunks are copied into a buffer allocated once from `total_size` and each
+ * one is acknowledged with a `blob_ack`, which lets the kernel send the next.
+ * The request fails if the kernel reports an error or goes quiet for
+ * `BLOB_TIMEOUT_MS`.
+ */
+function receiveBlob(model: AnyModel, hash: string): Promise<ArrayBuffer> {
+	return new Promise<ArrayBuffer>((resolve, reject) => {
+		let bytes: Uint8Array | null = null;
+		const received = new Set<number>();
+		let timer: ReturnType<typeof setTimeout> | null = null;
+
+		const fail = (err: unknown) => {
+			model.off("msg:custom", onMsg);
+			if (timer !== null) {
+				clearTimeout(timer);
+			}
+			reject(err);
+		};
+		const restartTimer = () => {
+			if (timer !== null) {
+				clearTimeout(timer);
+			}
+			timer = setTimeout(
+				() => fail(new Error(`Blob ${hash}: timed out`)),
+				BLOB_TIMEOUT_MS,
+			);
+		};
+
+		// biome-ignore lint/suspicious/noExplicitAny: custom message payload
+		const onMsg = async (payload: any, buffers: DataView[]) => {
+			if (payload?.type !== "blob_chunk" || payload.data?.hash !== hash) {
+				return;
+			}
+			const { chunk_index, total_chunks, total_size, chunk_size, error } =
+				payload.data;
+			if (error) {
+				fail(new Error(`Blob ${hash}: ${error}`));
+				return;
+			}
+			restartTimer();
+			try {
+				let view = buffers[0];
+				if (payload.data.compression) {
+					view = await decompressBuffer(view, payload.data.compression);
+				}
+				const target = (bytes ??= new Uint8Array(total_size));
+				target.set(
+					new Uint8Array(
+						view.buffer as ArrayBuffer,
+						view.byteOffset,
+						view.byteLength,
+					),
+					chunk_index * chunk_size,
+				);
+				received.add(chunk_index);
+				model.send({ event: "blob_ack", data: { hash, chunk_index } });
+				if (received.size === total_chunks) {
+					model.off("msg:custom", onMsg);
+					if (timer !== null) {
+						clearTimeout(timer);
+					}
+					const buffer = target.buffer as ArrayBuffer;
+					cacheBlob(hash, buffer);
+					resolve(buffer);
+				}
+			} catch (err) {
+				fail(err);
+			}
+		};
+		model.on("msg:custom", onMsg);
+		model.send({ event: "blob_request", data: { hash } });
+		restartTimer();
+	});
+}
+
+export type ArrayBlobRef = { type: string; blob: string } | null;
+
+/**
+ * Resolve an array trait serialized as its dtype and blob key
+ * (serialize_array_blob) to a typed array, or null if it is unset.
+ */
+export async function resolveTypedArray(
+	model: AnyModel,
+	ref: ArrayBlobRef,
+): Promise<TypedArray | null> {
+	if (!ref?.blob) {
+		return null;
+	}
+	const buffer = await resolveBlob(model, ref.blob);
+	return deserializeBufferToTypedArray(buffer, ref.type);
+}
+
+/**
+ * Resolve a `path` ({name, blob}) or `data` ({blob}) trait to its contents,
+ * or null if it is unset.
+ */
+export async function resolveBlobRef(
+	model: AnyModel,
+	ref: BlobRef,
+): Promise<ArrayBuffer | null> {
+	return ref?.blob ? resolveBlob(model, ref.blob) : null;
+}
+
+const bufferMsgTypes = new Set([
+	"buffer_change",
+	"buffer_update",
+	"buffer_ranges",
+]);
+
+// Buffer messages still waiting to be applied (e.g. being decompressed),
+// per target object, so that updates are always applied in order
+const pendingBufferMsgs = new WeakMap<object, Promise<void>>();
+
 export function handleBufferMsg(
 	// biome-ignore lint/suspicious/noExplicitAny: targetObject can be any
 	targetObject: any,
 	payload: TypedBufferPayload,
 	buffers: DataView[],
 	callback: (data: TypedBufferPayload) => void,
+): boolean {
+	if (!bufferMsgTypes.has(payload.type)) {
+		return false;
+	}
+
+	const compression = payload.data.compression;
+	const pending = pendingBufferMsgs.get(targetObject);
+	if (!compression && !pending) {
+		applyBufferMsg(targetObject, payload, buffers, callback);
+		return true;
+	}
+
+	const next = (pending ?? Promise.resolve())
+		.then(async () => {
+			const decoded = compression
+				? await Promise.all(
+						buffers.map((buffer) => decompressBuffer(buffer, compression)),
+					)
+				: buffers;
+			applyBufferMsg(targetObject, payload, decoded, callback);
+		})
+		.catch((err) => {
+			console.error("lib.handleBufferMsg:", err);
+		})
+		.finally(() => {
+			if (pendingBufferMsgs.get(targetObject) === next) {
+				pendingBufferMsgs.delete(targetObject);
+			}
+		});
+	pendingBufferMsgs.set(targetObject, next);
+
+	return true;
+}
+
+function applyBufferMsg(
+	// biome-ignore lint/suspicious/noExplicitAny: targetObject can be any
+	targetObject: any,
+	payload: TypedBufferPayload,
+	buffers: DataView[],
+	callback: (data: TypedBufferPayload) => void,
 ): boolean {
 	const { type, data } = payload;
 
@@ -61,9 +310,8 @@ export function handleBufferMsg(
 		case "buffer_change": {
 			const attrName = data.attr;
 			const dataType = data.type;
-			const buffer = buffers[0].buffer;
-			const TypedArrayConstructor = getTypedArrayConstructor(dataType);
-			const typedArray = new TypedArrayConstructor(buffer);
+			const buffer = buffers[0].buffer as ArrayBuffer;
+			const typedArray = deserializeBufferToTypedArray(buffer, dataType);
 
 			targetObject[attrName] = typedArray;
 
@@ -81,10 +329,12 @@ export function handleBufferMsg(
 			];
 
 			const IndicesArrayConstructor = getTypedArrayConstructor(indicesType);
-			const ValuesArrayConstructor = getTypedArrayConstructor(dataType);
 
 			const indicesArray = new IndicesArrayConstructor(indicesBuffer);
-			const valuesArray = new ValuesArrayConstructor(valuesBuffer);
+			const valuesArray = deserializeBufferToTypedArray(
+				valuesBuffer as ArrayBuffer,
+				dataType,
+			);
 
 			const existingArray = targetObject[attrName] as TypedArray;
 
@@ -101,6 +351,38 @@ export function handleBufferMsg(
 
 			return true;
 		}
+		case "buffer_ranges": {
+			const attrName = data.attr;
+			const dataType = data.type;
+			const rangesType = data.ranges_type;
+			const [rangesBuffer, valuesBuffer] = [
+				buffers[0].buffer,
+				buffers[1].buffer,
+			];
+
+			const RangesArrayConstructor = getTypedArrayConstructor(rangesType);
+
+			const rangesArray = new RangesArrayConstructor(rangesBuffer);
+			const valuesArray = deserializeBufferToTypedArray(
+				valuesBuffer as ArrayBuffer,
+				dataType,
+			);
+
+			const existingArray = targetObject[attrName] as TypedArray;
+
+			if (!existingArray || existingArray.length === 0) {
+				console.error(
+					`Existing array ${attrName} is empty or not initialized.`,
+				);
+				return true;
+			}
+
+			applyRangesToTypedArray(existingArray, rangesArray, valuesArray);
+
+			callback(payload);
+
+			return true;
+		}
 		default:
 			return false;
 	}
@@ -150,10 +432,43 @@ export function getTypedArrayConstructor(
 	throw new Error(`Unsupported data type: ${typeStr}`);
 }
 
+let float16Table: Float32Array | null = null;
+
+/**
+ * Widen float16 bits (sent by the kernel's transport narrowing) to float32,
+ * through a table of all 65536 values built on first use.
+ */
+function float16ToFloat32(bits: Uint16Array): Float32Array {
+	if (!float16Table) {
+		float16Table = new Float32Array(65536);
+		for (let h = 0; h < 65536; h++) {
+			const sign = h & 0x8000 ? -1 : 1;
+			const exponent = (h >> 10) & 0x1f;
+			const fraction = h & 0x3ff;
+			if (exponent === 0) {
+				float16Table[h] = sign * 2 ** -14 * (fraction / 1024);
+			} else if (exponent === 0x1f) {
+				float16Table[h] = fraction ? Number.NaN : sign * Number.POSITIVE_INFINITY;
+			} else {
+				float16Table[h] = sign * 2 ** (exponent - 15) * (1 + fraction / 1024);
+			}
+		}
+	}
+	const table = float16Table;
+	const out = new Float32Array(bits.length);
+	for (let i = 0; i < bits.length; i++) {
+		out[i] = table[bits[i]];
+	}
+	return out;
+}
+
 export function deserializeBufferToTypedArray(
 	buffer: ArrayBuffer,
 	typeStr: string,
 ): TypedArray {
+	if (typeStr === "float16") {
+		return float16ToFloat32(new Uint16Array(buffer));
+	}
 	const TypedArrayConstructor = getTypedArrayConstructor(typeStr);
 	return new TypedArrayConstructor(buffer);
 }
@@ -169,6 +484,51 @@ export function applyDifferencesToTypedArray(
 	}
 }
 
+const FINGERPRINT_SAMPLES = 4096;
+
+/**
+ * Compute the same sampled checksum as `ipyniivue.utils.img_fingerprint`,
+ * so both sides can tell whether they already hold the same voxels.
+ */
+export function imgFingerprint(typedArray: TypedArray): {
+	type: string;
+	length: number;
+	checksum: number;
+} {
+	const n = typedArray.length;
+	const step = Math.max(1, Math.floor(n / FINGERPRINT_SAMPLES));
+	const itemSize = typedArray.BYTES_PER_ELEMENT;
+	const bytes = new Uint8Array(
+		typedArray.buffer,
+		typedArray.byteOffset,
+		typedArray.byteLength,
+	);
+	let checksum = 0;
+	let j = 0;
+	for (let k = 0; k < FINGERPRINT_SAMPLES && k * step < n; k++) {
+		const start = k * step * itemSize;
+		for (let b = 0; b < itemSize; b++) {
+			j += 1;
+			checksum = (checksum + bytes[start + b] * j) % 4294967296;
+		}
+	}
+	return { type: getArrayType(typedArray), length: n, checksum };
+}
+
+export function applyRangesToTypedArray(
+	array: TypedArray,
+	ranges: TypedArray,
+	values: TypedArray,
+): void {
+	let offset = 0;
+	for (let i = 0; i < ranges.length; i += 2) {
+		const start = ranges[i];
+		const length = ranges[i + 1];
+		array.set(values.subarray(offset, offset + length), start);
+		offset += length;
+	}
+}
+
 export async function forceSendState(
 	model: AnyModel,
 	state: Record<string, unknown>,
@@ -185,6 +545,10 @@ export async function forceSendState(
 	}
 }
 
+// Unique per page, so uploads from several views of a model never collide
+const transferPrefix = Math.random().toString(36).slice(2);
+let transferCounter = 0;
+
 export async function sendChunkedData(
 	model: AnyModel,
 	dataProperty: string,
@@ -199,7 +563,28 @@ export async function sendChunkedData(
 		? Math.min(_chunkSize, 2 * 1024 * 1024)
 		: _chunkSize;
 
-	const totalSize = arrayBuffer.byteLength;
+	const transferId = `${transferPrefix}-${transferCounter++}`;
+	const rawSize = arrayBuffer.byteLength;
+
+	// Compress if the kernel asked for it at this size and it actually helps
+	const threshold = (
+		model as AnyModel<{ compression: Record<string, number | null> }>
+	).get("compression")?.chunk;
+	let payload = arrayBuffer;
+	let compression: string | null = null;
+	if (
+		typeof threshold === "number" &&
+		rawSize >= threshold &&
+		typeof CompressionStream !== "undefined"
+	) {
+		const compressed = await compressBuffer(arrayBuffer, "deflate");
+		if (compressed.byteLength < rawSize) {
+			payload = compressed;
+			compression = "deflate";
+		}
+	}
+
+	const totalSize = payload.byteLength;
 	const totalChunks = Math.ceil(totalSize / chunkSize);
 	let offset = 0;
 	let chunkIndex = 0;
@@ -210,14 +595,19 @@ export async function sendChunkedData(
 		}
 
 		const chunkEnd = Math.min(offset + chunkSize, totalSize);
-		const chunk = arrayBuffer.slice(offset, chunkEnd);
+		const chunk = payload.slice(offset, chunkEnd);
 		const chunkView = new DataView(chunk);
 
 		const attributeName: string = `chunk_${dataProperty}_${chunkIndex}`;
 
 		const data = {
+			transfer_id: transferId,
 			chunk_index: chunkIndex,
 			total_chunks: totalChunks,
+			total_size: totalSize,
+			chunk_size: chunkSize,
+			compression: compression,
+			raw_size: rawSize,
 			data_type: dataType,
 			chunk: isMarimo ? dataViewToBase64(chunkView) : chunkView,
 		};
@@ -258,6 +648,146 @@ export function gather_models<T extends AnyModel>(
 	return Promise.all(models);
 }
 
+export type Reply = { data?: object; buffers?: ArrayBuffer[] };
+
+/**
+ * Answer a request from `BaseAnyWidget._request` with a `reply` event: the
+ * data and buffers `compute` returns, or the error it throws.
+ */
+export async function reply(
+	model: AnyModel,
+	requestId: string,
+	compute: () => Reply | Promise<Reply>,
+) {
+	try {
+		const { data = {}, buffers = [] } = await compute();
+		model.send(
+			{ event: "reply", data: { request_id: requestId, ...data } },
+			undefined,
+			buffers,
+		);
+	} catch (err) {
+		model.send({
+			event: "reply",
+			data: { request_id: requestId, error: String(err) },
+		});
+	}
+}
+
+// The parts of a backbone WidgetModel used to replay batched updates
+type BatchTarget = {
+	set_state(state: object): void;
+	trigger(event: string, ...args: unknown[]): void;
+};
+
+function putBuffers(
+	state: Record<string, unknown>,
+	paths: Array<Array<string | number>>,
+	buffers: DataView[],
+) {
+	for (let i = 0; i < paths.length; i++) {
+		const path = paths[i];
+		// biome-ignore lint/suspicious/noExplicitAny: walking arbitrary JSON
+		let obj: any = state;
+		for (const key of path.slice(0, -1)) {
+			obj = obj[key];
+		}
+		obj[path[path.length - 1]] = buffers[i];
+	}
+}
+
+// Redraws requested while a batch is being applied, per NiiVue instance
+const heldRedraws = new WeakMap<
+	Niivue,
+	{ depth: number; redraw: string | null }
+>();
+
+/**
+ * Call `nv.updateGLVolume()`, or hold the call until the batch being applied
+ * to `nv` is done. Listeners redraw through this and `drawScene`.
+ */
+export function updateGLVolume(nv: Niivue) {
+	const held = heldRedraws.get(nv);
+	if (held) {
+		held.redraw = "update_gl_volume";
+	} else {
+		nv.updateGLVolume();
+	}
+}
+
+/**
+ * Call `nv.drawScene()`, or hold the call until the batch being applied to
+ * `nv` is done.
+ */
+export function drawScene(nv: Niivue) {
+	const held = heldRedraws.get(nv);
+	if (held) {
+		held.redraw ??= "draw_scene";
+	} else {
+		nv.drawScene();
+	}
+}
+
+/**
+ * Apply a `batch` message from NiiVue.batch(): state updates and custom
+ * messages for the NiiVue model and its volumes, meshes and layers, in order,
+ * followed by a single redraw.
+ */
+export async function applyBatch(
+	nv: Niivue,
+	model: AnyModel,
+	data: BatchData,
+	buffers: DataView[],
+) {
+	const targets = await Promise.all(
+		data.ops.map(
+			(op) =>
+				model.widget_manager.get_model(op.model_id) as Promise<unknown>,
+		),
+	);
+
+	// Listeners redraw on every change; hold those until everything is
+	// applied. Batches applied concurrently share one redraw at the end.
+	let held = heldRedraws.get(nv);
+	if (!held) {
+		held = { depth: 0, redraw: null };
+		heldRedraws.set(nv, held);
+	}
+	held.depth += 1;
+	if (data.redraw === "update_gl_volume") {
+		held.redraw = data.redraw;
+	} else {
+		held.redraw ??= data.redraw;
+	}
+	try {
+		let offset = 0;
+		data.ops.forEach((op, i) => {
+			const target = targets[i] as BatchTarget;
+			const opBuffers = buffers.slice(offset, offset + op.buffers);
+			offset += op.buffers;
+			if ("state" in op) {
+				putBuffers(op.state, op.buffer_paths, opBuffers);
+				target.set_state(op.state);
+			} else {
+				target.trigger("msg:custom", op.content, opBuffers);
+			}
+		});
+		// let listeners that continue in a microtask run before redrawing
+		await delay(0);
+	} finally {
+		held.depth -= 1;
+	}
+	if (held.depth > 0) {
+		return;
+	}
+	heldRedraws.delete(nv);
+	if (held.redraw === "update_gl_volume") {
+		nv.updateGLVolume();
+	} else if (held.redraw === "draw_scene") {
+		nv.drawScene();
+	}
+}
+
 /**
  * A class to keep track of disposers for callbacks for updating the scene.
  */
@@ -292,24 +822,6 @@ export class Disposer {
 	}
 }
 
-function numberArraysEqual(a: number[], b: number[]): boolean {
-	if (a.length !== b.length) return false;
-	return a.every((val, idx) => val === b[idx]);
-}
-
-function numberArraysEqual2D(
-	a: number[][] | undefined,
-	b: number[][] | undefined,
-): boolean {
-	if (a === b) return true;
-	if (!a || !b) return false; // One is defined, the other isn't
-	if (a.length !== b.length) return false;
-	for (let i = 0; i < a.length; i++) {
-		if (!numberArraysEqual(a[i], b[i])) return false;
-	}
-	return true;
-}
-
 export async function getAnyModel(model: Model): Promise<AnyModel | undefined> {
 	const thisModelId = model.get("this_model_id");
 	if (!thisModelId) {
@@ -325,140 +837,3 @@ export async function getAnyModel(model: Model): Promise<AnyModel | undefined> {
 		return;
 	}
 }
-
-export function sceneDiff(
-	oldScene: Scene | null,
-	newScene: Scene,
-): Partial<Scene> {
-	if (!oldScene) return newScene;
-
-	const diff: Partial<Scene> = {};
-
-	if (oldScene.renderAzimuth !== newScene.renderAzimuth) {
-		diff.renderAzimuth = newScene.renderAzimuth;
-	}
-	if (oldScene.renderElevation !== newScene.renderElevation) {
-		diff.renderElevation = newScene.renderElevation;
-	}
-	if (oldScene.volScaleMultiplier !== newScene.volScaleMultiplier) {
-		diff.volScaleMultiplier = newScene.volScaleMultiplier;
-	}
-	if (oldScene.gamma !== newScene.gamma) {
-		diff.gamma = newScene.gamma;
-	}
-
-	if (
-		oldScene.crosshairPos &&
-		newScene.crosshairPos &&
-		!numberArraysEqual(oldScene.crosshairPos, newScene.crosshairPos)
-	) {
-		diff.crosshairPos = newScene.crosshairPos;
-	}
-
-	if (!numberArraysEqual2D(oldScene.clipPlanes, newScene.clipPlanes)) {
-		diff.clipPlanes = newScene.clipPlanes;
-	}
-
-	if (
-		!numberArraysEqual2D(
-			oldScene.clipPlaneDepthAziElevs,
-			newScene.clipPlaneDepthAziElevs,
-		)
-	) {
-		diff.clipPlaneDepthAziElevs = newScene.clipPlaneDepthAziElevs;
-	}
-
-	if (
-		oldScene.pan2Dxyzmm &&
-		newScene.pan2Dxyzmm &&
-		!numberArraysEqual(oldScene.pan2Dxyzmm, newScene.pan2Dxyzmm)
-	) {
-		diff.pan2Dxyzmm = newScene.pan2Dxyzmm;
-	}
-
-	return diff;
-}
-
-export function uiDataDiff(
-	oldData: UIData | null,
-	newData: UIData,
-): Partial<UIData> {
-	if (!oldData) return newData;
-
-	const diff: Partial<UIData> = {};
-
-	// Primitives
-	if (oldData.mousedown !== newData.mousedown)
-		diff.mousedown = newData.mousedown;
-	if (oldData.touchdown !== newData.touchdown)
-		diff.touchdown = newData.touchdown;
-	if (oldData.mouseButtonLeftDown !== newData.mouseButtonLeftDown)
-		diff.mouseButtonLeftDown = newData.mouseButtonLeftDown;
-	if (oldData.mouseButtonCenterDown !== newData.mouseButtonCenterDown)
-		diff.mouseButtonCenterDown = newData.mouseButtonCenterDown;
-	if (oldData.mouseButtonRightDown !== newData.mouseButtonRightDown)
-		diff.mouseButtonRightDown = newData.mouseButtonRightDown;
-	if (oldData.mouseDepthPicker !== newData.mouseDepthPicker)
-		diff.mouseDepthPicker = newData.mouseDepthPicker;
-	if (oldData.clickedTile !== newData.clickedTile)
-		diff.clickedTile = newData.clickedTile;
-	if (oldData.prevX !== newData.prevX) diff.prevX = newData.prevX;
-	if (oldData.prevY !== newData.prevY) diff.prevY = newData.prevY;
-	if (oldData.currX !== newData.currX) diff.currX = newData.currX;
-	if (oldData.currY !== newData.currY) diff.currY = newData.currY;
-	if (oldData.currentTouchTime !== newData.currentTouchTime)
-		diff.currentTouchTime = newData.currentTouchTime;
-	if (oldData.lastTouchTime !== newData.lastTouchTime)
-		diff.lastTouchTime = newData.lastTouchTime;
-	if (oldData.doubleTouch !== newData.doubleTouch)
-		diff.doubleTouch = newData.doubleTouch;
-	if (oldData.isDragging !== newData.isDragging)
-		diff.isDragging = newData.isDragging;
-	if (oldData.lastTwoTouchDistance !== newData.lastTwoTouchDistance)
-		diff.lastTwoTouchDistance = newData.lastTwoTouchDistance;
-	if (oldData.multiTouchGesture !== newData.multiTouchGesture)
-		diff.multiTouchGesture = newData.multiTouchGesture;
-	if (oldData.dpr !== newData.dpr) diff.dpr = newData.dpr;
-	if (oldData.max2D !== newData.max2D) diff.max2D = newData.max2D;
-	if (oldData.max3D !== newData.max3D) diff.max3D = newData.max3D;
-	if (oldData.windowX !== newData.windowX) diff.windowX = newData.windowX;
-	if (oldData.windowY !== newData.windowY) diff.windowY = newData.windowY;
-	if (oldData.activeDragMode !== newData.activeDragMode)
-		diff.activeDragMode = newData.activeDragMode;
-	if (oldData.activeDragButton !== newData.activeDragButton)
-		diff.activeDragButton = newData.activeDragButton;
-	if (oldData.angleState !== newData.angleState)
-		diff.angleState = newData.angleState;
-	if (oldData.activeClipPlaneIndex !== newData.activeClipPlaneIndex)
-		diff.activeClipPlaneIndex = newData.activeClipPlaneIndex;
-
-	// Arrays
-	if (
-		!numberArraysEqual(
-			oldData.pan2DxyzmmAtMouseDown,
-			newData.pan2DxyzmmAtMouseDown,
-		)
-	) {
-		diff.pan2DxyzmmAtMouseDown = newData.pan2DxyzmmAtMouseDown;
-	}
-	if (!numberArraysEqual(oldData.dragStart, newData.dragStart)) {
-		diff.dragStart = newData.dragStart;
-	}
-	if (!numberArraysEqual(oldData.dragEnd, newData.dragEnd)) {
-		diff.dragEnd = newData.dragEnd;
-	}
-	if (
-		!numberArraysEqual(
-			oldData.dragClipPlaneStartDepthAziElev,
-			newData.dragClipPlaneStartDepthAziElev,
-		)
-	) {
-		diff.dragClipPlaneStartDepthAziElev =
-			newData.dragClipPlaneStartDepthAziElev;
-	}
-	if (!numberArraysEqual(oldData.angleFirstLine, newData.angleFirstLine)) {
-		diff.angleFirstLine = newData.angleFirstLine;
-	}
-
-	return diff;
-}
@@ -28,80 +28,80 @@ function setup_layer_property_listeners(
 	function opacity_changed() {
 		layer.opacity = layerModel.get("opacity");
 		mesh.updateMesh(nv.gl);
-		nv.updateGLVolume();
+		lib.updateGLVolume(nv);
 	}
 
 	function atlas_values_changed() {
 		layer.atlasValues = layerModel.get("atlas_values");
 		mesh.updateMesh(nv.gl);
-		nv.updateGLVolume();
+		lib.updateGLVolume(nv);
 	}
 
 	function colormap_changed() {
 		layer.colormap = layerModel.get("colormap");
 		mesh.updateMesh(nv.gl);
-		nv.updateGLVolume();
+		lib.updateGLVolume(nv);
 	}
 
 	function colormap_negative_changed() {
 		layer.colormapNegative = layerModel.get("colormap_negative");
 		mesh.updateMesh(nv.gl);
-		nv.updateGLVolume();
+		lib.updateGLVolume(nv);
 	}
 
 	function use_negative_cmap_changed() {
 		layer.useNegativeCmap = layerModel.get("use_negative_cmap");
 		mesh.updateMesh(nv.gl);
-		nv.updateGLVolume();
+		lib.updateGLVolume(nv);
 	}
 
 	function cal_min_changed() {
 		layer.cal_min = layerModel.get("cal_min");
 		mesh.updateMesh(nv.gl);
-		nv.updateGLVolume();
+		lib.updateGLVolume(nv);
 	}
 
 	function cal_max_changed() {
 		layer.cal_max = layerModel.get("cal_max");
 		mesh.updateMesh(nv.gl);
-		nv.updateGLVolume();
+		lib.updateGLVolume(nv);
 	}
 
 	function outline_border_changed() {
 		layer.outlineBorder = layerModel.get("outline_border");
 		mesh.updateMesh(nv.gl);
-		nv.updateGLVolume();
+		lib.updateGLVolume(nv);
 	}
 
 	// other props
 	function colormap_invert_changed() {
 		layer.colormapInvert = layerModel.get("colormap_invert");
 		mesh.updateMesh(nv.gl);
-		nv.updateGLVolume();
+		lib.updateGLVolume(nv);
 	}
 
 	function frame_4d_changed() {
 		layer.frame4D = layerModel.get("frame_4d");
 		mesh.updateMesh(nv.gl);
-		nv.updateGLVolume();
+		lib.updateGLVolume(nv);
 	}
 
 	function colorbar_visible_changed() {
 		layer.colorbarVisible = layerModel.get("colorbar_visible");
 		mesh.updateMesh(nv.gl);
-		nv.updateGLVolume();
+		lib.updateGLVolume(nv);
 	}
 
 	function colormap_type_changed() {
 		layer.colormapType = layerModel.get("colormap_type");
 		mesh.updateMesh(nv.gl);
-		nv.updateGLVolume();
+		lib.updateGLVolume(nv);
 	}
 
 	function is_additive_blend_changed() {
 		layer.isAdditiveBlend = layerModel.get("is_additive_blend");
 		mesh.updateMesh(nv.gl);
-		nv.updateGLVolume();
+		lib.updateGLVolume(nv);
 	}
 
 	// set values not set by kwargs
@@ -164,11 +164,11 @@ async function process_meshmodel_layers(
 
 		// Process layers in parallel
 		const layerPromises = layerModels.map(async (layerModel) => {
-			const layerPath = layerModel.get("path")?.name
+			const layerPath = layerModel.get("path")?.blob
 				? layerModel.get("path")
 				: null;
 			const layerUrl = layerModel.get("url");
-			const layerData = layerModel.get("data")?.byteLength
+			const layerData = layerModel.get("data")?.blob
 				? layerModel.get("data")
 				: null;
 
@@ -184,7 +184,10 @@ async function process_meshmodel_layers(
 			if (existingLayerIdx !== -1) {
 				layer = mesh.layers[existingLayerIdx];
 			} else if (layerPath || layerData) {
-				const layerDataBuffer = layerPath?.data?.buffer || layerData?.buffer;
+				const layerDataBuffer = await lib.resolveBlobRef(
+					layerModel,
+					layerPath ?? layerData,
+				);
 				const layerName = layerPath?.name || layerModel.get("name");
 				layer = await niivue.NVMeshLoaders.readLayer(
 					layerName || "",
@@ -291,35 +294,35 @@ function setup_mesh_property_listeners(
 	function opacity_changed() {
 		mesh.opacity = mmodel.get("opacity");
 		mesh.updateMesh(nv.gl);
-		nv.updateGLVolume();
+		lib.updateGLVolume(nv);
 	}
 
 	function rgba255_changed() {
 		mesh.rgba255 = new Uint8Array(mmodel.get("rgba255"));
 		mesh.updateMesh(nv.gl);
-		nv.updateGLVolume();
+		lib.updateGLVolume(nv);
 	}
 
 	function visible_changed() {
 		mesh.visible = mmodel.get("visible");
 		mesh.updateMesh(nv.gl);
-		nv.updateGLVolume();
+		lib.updateGLVolume(nv);
 	}
 
 	// other props
 	function colormap_invert_changed() {
 		mesh.colormapInvert = mmodel.get("colormap_invert");
-		nv.updateGLVolume();
+		lib.updateGLVolume(nv);
 	}
 
 	function colorbar_visible_changed() {
 		mesh.colorbarVisible = mmodel.get("colorbar_visible");
-		nv.updateGLVolume();
+		lib.updateGLVolume(nv);
 	}
 
 	function mesh_shader_index_changed() {
 		mesh.meshShaderIndex = mmodel.get("mesh_shader_index");
-		nv.updateGLVolume();
+		lib.updateGLVolume(nv);
 		const meshIndex = nv.getMeshIndexByID(mesh.id);
 		nv.onMeshShaderChanged(meshIndex, mesh.meshShaderIndex);
 	}
@@ -327,78 +330,78 @@ function setup_mesh_property_listeners(
 	function legend_line_thickness_changed() {
 		mesh.legendLineThickness = mmodel.get("legend_line_thickness");
 		mesh.updateMesh(nv.gl);
-		nv.updateGLVolume();
+		lib.updateGLVolume(nv);
 	}
 
 	function edge_min_changed() {
 		mesh.edgeMin = mmodel.get("edge_min");
 		mesh.updateMesh(nv.gl);
-		nv.updateGLVolume();
+		lib.updateGLVolume(nv);
 	}
 
 	function edge_max_changed() {
 		mesh.edgeMin = mmodel.get("edge_min");
 		mesh.updateMesh(nv.gl);
-		nv.updateGLVolume();
+		lib.updateGLVolume(nv);
 	}
 
 	function node_scale_changed() {
 		mesh.nodeScale = mmodel.get("node_scale");
 		mesh.updateMesh(nv.gl);
-		nv.updateGLVolume();
+		lib.updateGLVolume(nv);
 	}
 
 	function edge_scale_changed() {
 		mesh.edgeScale = mmodel.get("edge_scale");
 		mesh.updateMesh(nv.gl);
-		nv.updateGLVolume();
+		lib.updateGLVolume(nv);
 	}
 
 	function fiber_radius_changed() {
 		mesh.fiberRadius = mmodel.get("fiber_radius");
 		mesh.updateMesh(nv.gl);
-		nv.updateGLVolume();
+		lib.updateGLVolume(nv);
 	}
 
 	function fiber_occlusion_changed() {
 		mesh.fiberOcclusion = mmodel.get("fiber_occlusion");
 		mesh.updateMesh(nv.gl);
-		nv.updateGLVolume();
+		lib.updateGLVolume(nv);
 	}
 
 	function fiber_length_changed() {
 		mesh.fiberLength = mmodel.get("fiber_length");
 		mesh.updateMesh(nv.gl);
-		nv.updateGLVolume();
+		lib.updateGLVolume(nv);
 	}
 
 	function fiber_dither_changed() {
 		mesh.fiberDither = mmodel.get("fiber_dither");
 		mesh.updateMesh(nv.gl);
-		nv.updateGLVolume();
+		lib.updateGLVolume(nv);
 	}
 
 	function fiber_color_changed() {
 		mesh.fiberColor = mmodel.get("fiber_color");
 		mesh.updateMesh(nv.gl);
-		nv.updateGLVolume();
+		lib.updateGLVolume(nv);
 	}
 
 	function fiber_decimation_stride_changed() {
 		mesh.fiberDecimationStride = mmodel.get("fiber_decimation_stride");
 		mesh.updateMesh(nv.gl);
-		nv.updateGLVolume();
+		lib.updateGLVolume(nv);
 	}
 
 	function colormap_changed() {
 		mesh.colormap = mmodel.get("colormap");
-		nv.updateGLVolume();
+		lib.updateGLVolume(nv);
 	}
 
 	function layers_changed() {
 		process_meshmodel_layers(mmodel, mesh, nv);
 		mesh.updateMesh(nv.gl);
-		nv.updateGLVolume();
+		lib.updateGLVolume(nv);
 	}
 
 	// custom msgs
@@ -413,7 +416,7 @@ function setup_mesh_property_listeners(
 			() => {
 				if (nv._gl) {
 					mesh.updateMesh(nv.gl);
-					nv.updateGLVolume();
+					lib.updateGLVolume(nv);
 				}
 			},
 		);
@@ -515,14 +518,34 @@ export async function create_mesh(
 	const backendId = mmodel.get("id");
 	const existingIdx = nv.getMeshIndexByID(backendId);
 
-	const path = mmodel.get("path")?.name ? mmodel.get("path") : null;
+	const path = mmodel.get("path")?.blob ? mmodel.get("path") : null;
 	const url = mmodel.get("url");
-	const data = mmodel.get("data")?.byteLength ? mmodel.get("data") : null;
+	const data = mmodel.get("data")?.blob ? mmodel.get("data") : null;
+	// Built from arrays in Python, so there is no file to parse
+	const fromArrays = !path && !data && !url && !!mmodel.get("pts");
 
 	if (existingIdx !== -1) {
 		mesh = nv.meshes[existingIdx];
+	} else if (fromArrays) {
+		const [pts, tris] = await Promise.all([
+			lib.resolveTypedArray(mmodel, mmodel.get("pts")),
+			lib.resolveTypedArray(mmodel, mmodel.get("tris")),
+		]);
+		mesh = new niivue.NVMesh(
+			pts as Float32Array,
+			tris as Uint32Array,
+			mmodel.get("name"),
+			new Uint8Array(mmodel.get("rgba255")),
+			mmodel.get("opacity"),
+			mmodel.get("visible"),
+			nv.gl,
+		);
+		mesh.id = backendId;
 	} else if (path || data) {
-		const dataBuffer = path?.data?.buffer || data?.buffer;
+		const dataBuffer = (await lib.resolveBlobRef(
+			mmodel,
+			path ?? data,
+		)) as ArrayBuffer;
 		const name = path?.name || mmodel.get("name");
 		if (typeof name === "string" && name.toLowerCase().endsWith(".jcon")) {
 			const decoder = new TextDecoder("utf-8");
@@ -531,7 +554,7 @@ export async function create_mesh(
 			mesh = nv.loadConnectomeAsMesh(jsonObj);
 		} else {
 			mesh = await niivue.NVMesh.readMesh(
-				dataBuffer as ArrayBuffer,
+				dataBuffer,
 				name,
 				nv.gl,
 				mmodel.get("opacity"),
@@ -564,6 +587,7 @@ export async function create_mesh(
 
 	// Save the id and name back to the model
 	mmodel.set("name", mesh.name);
+	mmodel.set("_codecs", lib.supportedCodecs());
 	mmodel.save_changes();
 
 	// Gather MeshLayer models
@@ -584,8 +608,8 @@ export async function create_mesh(
 	}
 	mmodel.save_changes();
 
-	// Send pts and tris back to the model
-	if (mesh.pts) {
+	// Send pts and tris back to the model, unless they came from it
+	if (mesh.pts && !fromArrays) {
 		const dataType = lib.getArrayType(mesh.pts);
 		lib.sendChunkedData(
 			mmodel,
@@ -594,7 +618,7 @@ export async function create_mesh(
 			dataType,
 		);
 	}
-	if (mesh.tris) {
+	if (mesh.tris && !fromArrays) {
 		const dataType = lib.getArrayType(mesh.tris);
 		lib.sendChunkedData(
 			mmodel,
@@ -721,5 +745,5 @@ export async function render_meshes(
 
 	nv.meshes = new_meshes_order;
 
-	nv.updateGLVolume();
+	lib.updateGLVolume(nv);
 }
@@ -21,11 +21,15 @@ export type NiivueObject3D = {
 	field_of_view_de_oblique_mm?: number[];
 };
 
+// path traits: the file name and the key of its contents in the blob store
 interface FileInput {
-	name: string;
-	data: DataView;
+	name: string | null;
+	blob: string | null;
 }
 
+// data traits: the key of the bytes in the blob store
+type BlobInput = { blob: string } | null;
+
 type ColorMap = {
 	R: number[];
 	G: number[];
@@ -110,13 +114,16 @@ export type UIData = {
 };
 
 export type VolumeModel = AnyModel<{
+	_codecs: string[];
+	compression: Record<string, number | null>;
+
 	path: FileInput;
 	url: string;
-	data: DataView;
+	data: BlobInput;
 
 	paired_img_path: FileInput;
 	paired_img_url: string;
-	paired_img_data: DataView;
+	paired_img_data: BlobInput;
 
 	id: string;
 	name: string;
@@ -140,6 +147,11 @@ export type VolumeModel = AnyModel<{
 
 	hdr: Partial<NIFTI1>; // only updated via frontend...but this might change in the future..
 	img: DataView;
+	_img_fingerprint: { type: string; length: number; checksum: number } | null;
+	lazy_img: boolean;
+	_pyramid: { factor: number; blob: string }[];
+	_frame_stream: FrameStreamInfo | null;
+	_img_requested: boolean;
 	dims: number[];
 	extents_min_ortho: number[];
 	extents_max_ortho: number[];
@@ -150,9 +162,12 @@ export type VolumeModel = AnyModel<{
 }>;
 
 export type MeshModel = AnyModel<{
+	_codecs: string[];
+	compression: Record<string, number | null>;
+
 	path: FileInput;
 	url: string;
-	data: DataView;
+	data: BlobInput;
 
 	id: string;
 	name: string;
@@ -177,16 +192,20 @@ export type MeshModel = AnyModel<{
 	fiber_decimation_stride: number;
 	colormap: string;
 
-	pts: DataView;
-	tris: DataView;
+	// dtype and blob key; only set for meshes built from arrays
+	pts: { type: string; blob: string } | null;
+	tris: { type: string; blob: string } | null;
 	extents_min: number[];
 	extents_max: number[];
 }>;
 
 export type MeshLayerModel = AnyModel<{
+	_codecs: string[];
+	compression: Record<string, number | null>;
+
 	path: FileInput;
 	url: string;
-	data: DataView;
+	data: BlobInput;
 
 	id: string;
 	name: string;
@@ -209,6 +228,9 @@ export type MeshLayerModel = AnyModel<{
 }>;
 
 export type Model = AnyModel<{
+	_codecs: string[];
+	compression: Record<string, number | null>;
+
 	this_model_id: string;
 
 	height: number;
@@ -225,6 +247,11 @@ export type Model = AnyModel<{
 	graph: Graph;
 	scene: Scene;
 	ui_data: UIData;
+	// Field -> max updates per second (null for every change), per group
+	_hover_mode: "off" | "frontend" | "kernel";
+	_subscriptions: Partial<
+		Record<"scene" | "ui_data", Record<string, number | null>>
+	>;
 	overlay_outline_width: number;
 	overlay_alpha_shader: number;
 
@@ -298,22 +325,107 @@ export type CustomMessagePayload =
 	| { type: "close_drawing"; data: [] }
 	| { type: "load_drawing_from_url"; data: LoadDrawingFromUrlData }
 	| { type: "load_document_from_url"; data: LoadDocumentFromUrlData }
-	| { type: "refresh_colormaps"; data: [] };
+	| { type: "refresh_colormaps"; data: [] }
+	| { type: "batch"; data: BatchData }
+	| { type: "rpc"; data: RpcData };
+
+export type CaptureView = {
+	slice_type?: number;
+	azimuth?: number;
+	elevation?: number;
+};
+
+export type CaptureData = {
+	width?: number;
+	height?: number;
+	views: CaptureView[];
+	format: "png" | "rgba";
+};
+
+export type RpcData = {
+	request_id: string;
+	method: string;
+	// biome-ignore lint/suspicious/noExplicitAny: parameters come from Python
+	params: any[];
+};
+
+// One envelope from NiiVue.batch(); each op takes `buffers` buffers in order
+export type BatchOp =
+	| {
+			model_id: string;
+			state: Record<string, unknown>;
+			buffer_paths: Array<Array<string | number>>;
+			buffers: number;
+	  }
+	| {
+			model_id: string;
+			content: object;
+			buffers: number;
+	  };
+
+export type BatchData = {
+	ops: BatchOp[];
+	redraw: "update_gl_volume" | "draw_scene" | null;
+};
+
+export type FetchRegionData = {
+	request_id: string;
+	x: [number, number];
+	y: [number, number];
+	z: [number, number];
+	frame: number;
+};
+
+export type FrameData = {
+	index: number;
+	type?: string;
+	compression?: string | null;
+	error?: string;
+};
 
-export type VolumeCustomMessage = {
-	type: "save_to_disk";
-	data: SaveToDiskData;
+export type FrameStreamInfo = {
+	n_frames: number;
+	window: number;
+	blob: string;
 };
 
+export type VolumeCustomMessage =
+	| {
+			type: "save_to_disk";
+			data: SaveToDiskData;
+	  }
+	| {
+			type: "fetch_region";
+			data: FetchRegionData;
+	  }
+	| {
+			type: "frame";
+			data: FrameData;
+	  }
+	| {
+			type: "frames_invalidated";
+			data: Record<string, never>;
+	  };
+
 export type MeshCustomMessage = { type: "reverse_faces"; data: [] };
 
+// Set when the kernel narrowed the array (transport)
+type TransportData = {
+	max_error?: number;
+	scl_slope?: number;
+	scl_inter?: number;
+};
+
 export type TypedBufferPayload =
 	| {
 			type: "buffer_change";
 			data: {
 				attr: string;
 				type: string;
-			};
+				encoding?: string;
+				bytes_saved?: number;
+				compression?: string;
+			} & TransportData;
 	  }
 	| {
 			type: "buffer_update";
@@ -321,5 +433,19 @@ export type TypedBufferPayload =
 				attr: string;
 				type: string;
 				indices_type: string;
-			};
+				encoding: string;
+				bytes_saved: number;
+				compression?: string;
+			} & TransportData;
+	  }
+	| {
+			type: "buffer_ranges";
+			data: {
+				attr: string;
+				type: string;
+				ranges_type: string;
+				encoding: string;
+				bytes_saved: number;
+				compression?: string;
+			} & TransportData;
 	  };
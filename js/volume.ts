@@ -1,6 +1,9 @@
 import * as niivue from "@niivue/niivue";
 import * as lib from "./lib.ts";
 import type {
+	FetchRegionData,
+	FrameData,
+	FrameStreamInfo,
 	Model,
 	TypedBufferPayload,
 	VolumeCustomMessage,
@@ -57,6 +60,165 @@ function getNIFTIData(hdr: NIFTI1 | NIFTI2): Partial<NIFTI1> {
 	return data;
 }
 
+/**
+ * Check whether the kernel already decoded the same voxels from the source,
+ * in which case sending them back would only duplicate the data.
+ */
+function kernelHasImg(vmodel: VolumeModel, img: lib.TypedArray): boolean {
+	const expected = vmodel.get("_img_fingerprint");
+	if (!expected) {
+		return false;
+	}
+	const actual = lib.imgFingerprint(img);
+	return (
+		actual.type === expected.type &&
+		actual.length === expected.length &&
+		actual.checksum === expected.checksum
+	);
+}
+
+function sendImg(volume: niivue.NVImage, vmodel: VolumeModel) {
+	if (!volume.img) {
+		return;
+	}
+	const dataType = lib.getArrayType(volume.img);
+	lib.sendChunkedData(
+		vmodel,
+		"img",
+		volume.img.buffer as ArrayBuffer,
+		dataType,
+	);
+}
+
+/**
+ * Copy a box of voxels (half-open bounds, one frame) out of a volume.
+ */
+function sliceRegion(
+	volume: niivue.NVImage,
+	region: FetchRegionData,
+): lib.TypedArray {
+	if (!volume.img || !volume.hdr) {
+		throw new Error("Volume data is not loaded");
+	}
+	const dims = volume.hdr.dims;
+	const [nx, ny, nz] = [dims[1], dims[2], dims[3]];
+	const [x0, x1] = region.x;
+	const [y0, y1] = region.y;
+	const [z0, z1] = region.z;
+	const frameOffset = region.frame * nx * ny * nz;
+	if (frameOffset + nx * ny * nz > volume.img.length) {
+		throw new Error(`Frame ${region.frame} is not loaded`);
+	}
+
+	const rowLength = x1 - x0;
+	const TypedArrayConstructor = lib.getTypedArrayConstructor(
+		lib.getArrayType(volume.img),
+	);
+	const out = new TypedArrayConstructor(rowLength * (y1 - y0) * (z1 - z0));
+	let offset = 0;
+	for (let z = z0; z < z1; z++) {
+		for (let y = y0; y < y1; y++) {
+			const start = frameOffset + (z * ny + y) * nx + x0;
+			out.set(volume.img.subarray(start, start + rowLength), offset);
+			offset += rowLength;
+		}
+	}
+	return out;
+}
+
+/**
+ * The frames of a streamed 4D volume. The frontend shows a single-frame
+ * NVImage and holds at most `window` frames in an LRU, requesting the frame
+ * selected by `frame_4d` from the kernel and prefetching its neighbours.
+ */
+class FrameStream {
+	private frames = new Map<number, lib.TypedArray>();
+	private waiters = new Map<
+		number,
+		{ resolve: (frame: lib.TypedArray) => void; reject: (err: Error) => void }[]
+	>();
+
+	constructor(
+		private vmodel: VolumeModel,
+		readonly nFrames: number,
+		readonly window: number,
+	) {}
+
+	get(index: number): Promise<lib.TypedArray> {
+		const cached = this.frames.get(index);
+		if (cached) {
+			// refresh its position in the LRU order
+			this.frames.delete(index);
+			this.frames.set(index, cached);
+			return Promise.resolve(cached);
+		}
+		return new Promise((resolve, reject) => {
+			const waiting = this.waiters.get(index);
+			if (waiting) {
+				waiting.push({ resolve, reject });
+				return;
+			}
+			this.waiters.set(index, [{ resolve, reject }]);
+			this.vmodel.send({ event: "frame_request", data: { index } });
+		});
+	}
+
+	/**
+	 * Request the frames around `index` that are not held or on their way,
+	 * as many as fit in the window besides the displayed frame.
+	 */
+	prefetch(index: number) {
+		const reach = Math.floor((this.window - 1) / 2);
+		for (let offset = 1; offset <= reach; offset++) {
+			for (const neighbour of [index + offset, index - offset]) {
+				if (
+					neighbour >= 0 &&
+					neighbour < this.nFrames &&
+					!this.frames.has(neighbour) &&
+					!this.waiters.has(neighbour)
+				) {
+					this.get(neighbour).catch(() => {});
+				}
+			}
+		}
+	}
+
+	async receive(data: FrameData, buffers: DataView[]) {
+		const waiting = this.waiters.get(data.index) ?? [];
+		this.waiters.delete(data.index);
+		try {
+			if (data.error || !data.type) {
+				throw new Error(data.error ?? "missing frame data");
+			}
+			let view = buffers[0];
+			if (data.compression) {
+				view = await lib.decompressBuffer(view, data.compression);
+			}
+			const buffer = (view.buffer as ArrayBuffer).slice(
+				view.byteOffset,
+				view.byteOffset + view.byteLength,
+			);
+			const frame = lib.deserializeBufferToTypedArray(buffer, data.type);
+			this.frames.set(data.index, frame);
+			while (this.frames.size > this.window) {
+				const oldest = this.frames.keys().next().value as number;
+				this.frames.delete(oldest);
+			}
+			for (const { resolve } of waiting) {
+				resolve(frame);
+			}
+		} catch (err) {
+			for (const { reject } of waiting) {
+				reject(err as Error);
+			}
+		}
+	}
+
+	invalidate() {
+		this.frames.clear();
+	}
+}
+
 /**
  * Set up event listeners to handle changes to the volume properties.
  * Returns a function to clean up the event listeners.
@@ -65,50 +227,72 @@ function setup_volume_property_listeners(
 	volume: niivue.NVImage,
 	vmodel: VolumeModel,
 	nv: niivue.Niivue,
+	frames: FrameStream | null,
 ): () => void {
 	function colorbar_visible_changed() {
 		volume.colorbarVisible = vmodel.get("colorbar_visible");
-		nv.updateGLVolume();
+		lib.updateGLVolume(nv);
 	}
 
 	function cal_min_changed() {
 		volume.cal_min = vmodel.get("cal_min") ?? Number.NaN;
-		nv.updateGLVolume();
+		lib.updateGLVolume(nv);
 	}
 
 	function cal_max_changed() {
 		volume.cal_max = vmodel.get("cal_max") ?? Number.NaN;
-		nv.updateGLVolume();
+		lib.updateGLVolume(nv);
 	}
 
 	function cal_min_neg_changed() {
 		volume.cal_minNeg = vmodel.get("cal_min_neg") ?? Number.NaN;
-		nv.updateGLVolume();
+		lib.updateGLVolume(nv);
 	}
 
 	function cal_max_neg_changed() {
 		volume.cal_maxNeg = vmodel.get("cal_max_neg") ?? Number.NaN;
-		nv.updateGLVolume();
+		lib.updateGLVolume(nv);
 	}
 
 	function colormap_changed() {
 		volume.colormap = vmodel.get("colormap");
-		nv.updateGLVolume();
+		lib.updateGLVolume(nv);
 	}
 
 	function opacity_changed() {
 		volume.opacity = vmodel.get("opacity");
-		nv.updateGLVolume();
+		lib.updateGLVolume(nv);
+	}
+
+	async function show_streamed_frame(frames: FrameStream) {
+		const index = vmodel.get("frame_4d");
+		try {
+			const frame = await frames.get(index);
+			if (vmodel.get("frame_4d") !== index) {
+				// scrubbed on before the frame arrived
+				return;
+			}
+			volume.img = frame;
+			lib.updateGLVolume(nv);
+			nv.onFrameChange(volume, index);
+		} catch (err) {
+			console.error(`Frame ${index} of ${volume.name}:`, err);
+		}
+		frames.prefetch(index);
 	}
 
 	function frame_4d_changed() {
+		if (frames) {
+			show_streamed_frame(frames);
+			return;
+		}
 		volume.frame4D = vmodel.get("frame_4d");
-		nv.updateGLVolume();
+		lib.updateGLVolume(nv);
 	}
 
 	function colormap_negative_changed() {
 		volume.colormapNegative = vmodel.get("colormap_negative");
-		nv.updateGLVolume();
+		lib.updateGLVolume(nv);
 	}
 
 	// Accept either LUT or colormap as input
@@ -118,29 +302,36 @@ function setup_volume_property_listeners(
 			newColormapLabel.lut = new Uint8ClampedArray(newColormapLabel.lut);
 			volume.colormapLabel = newColormapLabel;
 		}
-		nv.updateGLVolume();
+		lib.updateGLVolume(nv);
 	}
 
 	function colormap_type_changed() {
 		console.log("colormap type changed", vmodel.get("colormap_type"));
 		volume.colormapType = vmodel.get("colormap_type");
-		nv.updateGLVolume();
+		lib.updateGLVolume(nv);
 	}
 
 	// other props
 	function colormap_invert_changed() {
 		volume.colormapInvert = vmodel.get("colormap_invert");
-		nv.updateGLVolume();
+		lib.updateGLVolume(nv);
 	}
 
 	function modulation_image_changed() {
 		volume.modulationImage = vmodel.get("modulation_image");
-		nv.updateGLVolume();
+		lib.updateGLVolume(nv);
 	}
 
 	function modulate_alpha_changed() {
 		volume.modulateAlpha = vmodel.get("modulate_alpha");
-		nv.updateGLVolume();
+		lib.updateGLVolume(nv);
+	}
+
+	// the kernel asked for img (lazy_img)
+	function img_requested_changed() {
+		if (vmodel.get("_img_requested")) {
+			sendImg(volume, vmodel);
+		}
 	}
 
 	// custom msgs
@@ -152,9 +343,14 @@ function setup_volume_property_listeners(
 			volume,
 			payload as TypedBufferPayload,
 			buffers,
-			() => {
+			({ data }) => {
+				// quantized transfers (transport) come with their scaling
+				if (data.scl_slope !== undefined && volume.hdr) {
+					volume.hdr.scl_slope = data.scl_slope;
+					volume.hdr.scl_inter = data.scl_inter ?? 0;
+				}
 				if (nv._gl) {
-					nv.updateGLVolume();
+					lib.updateGLVolume(nv);
 				}
 			},
 		);
@@ -164,11 +360,32 @@ function setup_volume_property_listeners(
 
 		const { type, data } = payload;
 		switch (type) {
+			case "frame": {
+				frames?.receive(data, buffers);
+				break;
+			}
+			case "frames_invalidated": {
+				if (frames) {
+					frames.invalidate();
+					show_streamed_frame(frames);
+				}
+				break;
+			}
 			case "save_to_disk": {
 				const [fileName] = data;
 				volume.saveToDisk(fileName);
 				break;
 			}
+			case "fetch_region": {
+				lib.reply(vmodel, data.request_id, () => {
+					const region = sliceRegion(volume, data);
+					return {
+						data: { type: lib.getArrayType(region) },
+						buffers: [region.buffer as ArrayBuffer],
+					};
+				});
+				break;
+			}
 		}
 	}
 
@@ -192,6 +409,7 @@ function setup_volume_property_listeners(
 	vmodel.on("change:colormap_invert", colormap_invert_changed);
 	vmodel.on("change:modulation_image", modulation_image_changed);
 	vmodel.on("change:modulate_alpha", modulate_alpha_changed);
+	vmodel.on("change:_img_requested", img_requested_changed);
 
 	vmodel.on("msg:custom", customMessageHandler);
 
@@ -211,11 +429,164 @@ function setup_volume_property_listeners(
 		vmodel.off("change:colormap_invert", colormap_invert_changed);
 		vmodel.off("change:modulation_image", modulation_image_changed);
 		vmodel.off("change:modulate_alpha", modulate_alpha_changed);
+		vmodel.off("change:_img_requested", img_requested_changed);
 
 		vmodel.off("msg:custom", customMessageHandler);
 	};
 }
 
+function syncVolumeState(
+	volume: niivue.NVImage,
+	vmodel: VolumeModel,
+	frameStream: FrameStreamInfo | null = null,
+) {
+	// a streamed volume shows one frame; the kernel describes the series
+	if (!frameStream) {
+		vmodel.set("n_frame_4d", volume.nFrame4D ?? null);
+	}
+	vmodel.set("colormap", volume.colormap);
+	if (typeof volume.cal_min !== "undefined") {
+		vmodel.set("cal_min", volume.cal_min);
+	}
+	if (typeof volume.cal_max !== "undefined") {
+		vmodel.set("cal_max", volume.cal_max);
+	}
+	if (volume.hdr !== null && !frameStream) {
+		vmodel.set("hdr", getNIFTIData(volume.hdr));
+	}
+	if (volume.extentsMinOrtho) {
+		vmodel.set("extents_min_ortho", volume.extentsMinOrtho);
+	}
+	if (volume.extentsMaxOrtho) {
+		vmodel.set("extents_max_ortho", volume.extentsMaxOrtho);
+	}
+	if (volume.frac2mm) {
+		vmodel.set("frac2mm", Array.from(volume.frac2mm));
+	}
+	if (volume.frac2mmOrtho) {
+		vmodel.set("frac2mm_ortho", Array.from(volume.frac2mmOrtho));
+	}
+	if (volume.dims) {
+		vmodel.set("dims", volume.dims);
+	}
+	if (volume.dimsRAS) {
+		vmodel.set("dims_ras", volume.dimsRAS);
+	}
+	if (volume.matRAS) {
+		vmodel.set("mat_ras", Array.from(volume.matRAS));
+	}
+	vmodel.save_changes();
+}
+
+// Name under which downsampled (NIfTI) levels are loaded
+const PREVIEW_NAME = "preview.nii";
+
+function loadVolumeBuffer(
+	vmodel: VolumeModel,
+	buffer: ArrayBuffer | null,
+	name: string,
+	pairedImgData: ArrayBuffer | null,
+	frame4D = vmodel.get("frame_4d"),
+): Promise<niivue.NVImage> {
+	return niivue.NVImage.new(
+		buffer as ArrayBuffer,
+		name,
+		vmodel.get("colormap"),
+		vmodel.get("opacity"),
+		pairedImgData,
+		vmodel.get("cal_min") ?? Number.NaN,
+		vmodel.get("cal_max") ?? Number.NaN,
+		true,
+		0.02,
+		false,
+		false,
+		vmodel.get("colormap_negative"),
+		frame4D,
+		0,
+		vmodel.get("cal_min_neg") ?? Number.NaN,
+		vmodel.get("cal_max_neg") ?? Number.NaN,
+		vmodel.get("colorbar_visible"),
+		null,
+		vmodel.get("colormap_type"),
+		null,
+	);
+}
+
+// Properties of a progressively loaded volume that stay as they are when a
+// finer level replaces its voxels
+const displayProperties = new Set([
+	"id",
+	"name",
+	"colormap",
+	"colormapNegative",
+	"colormapLabel",
+	"colormapInvert",
+	"colormapType",
+	"opacity",
+	"colorbarVisible",
+	"modulationImage",
+	"modulateAlpha",
+	"frame4D",
+]);
+
+// The display range stays only if it was set on the model; otherwise the
+// finer level's automatic range replaces the preview's, which pooling has
+// narrowed
+const calProperties = new Map<
+	string,
+	"cal_min" | "cal_max" | "cal_min_neg" | "cal_max_neg"
+>([
+	["cal_min", "cal_min"],
+	["cal_max", "cal_max"],
+	["cal_minNeg", "cal_min_neg"],
+	["cal_maxNeg", "cal_max_neg"],
+]);
+
+/**
+ * Load the finer pyramid levels, then the source, swapping each into the
+ * displayed volume as it arrives.
+ */
+async function refineVolume(
+	nv: niivue.Niivue,
+	volume: niivue.NVImage,
+	vmodel: VolumeModel,
+	pyramid: lib.BlobRef[],
+	source: lib.BlobRef,
+	pairedImgData: ArrayBuffer | null,
+	signal: AbortSignal,
+) {
+	const levels = [...pyramid.slice(1), source];
+	try {
+		for (const [i, level] of levels.entries()) {
+			const last = i === levels.length - 1;
+			const buffer = await lib.resolveBlobRef(vmodel, level);
+			const finer = await loadVolumeBuffer(
+				vmodel,
+				buffer,
+				last ? volume.name : PREVIEW_NAME,
+				last ? pairedImgData : null,
+			);
+			if (signal.aborted) {
+				return;
+			}
+			for (const [key, value] of Object.entries(finer)) {
+				const trait = calProperties.get(key);
+				if (trait ? vmodel.get(trait) == null : !displayProperties.has(key)) {
+					// biome-ignore lint/suspicious/noExplicitAny: copying NVImage state
+					(volume as any)[key] = value;
+				}
+			}
+			// the volume may not be added yet if other volumes are still loading
+			if (nv._gl && nv.getVolumeIndexByID(volume.id) !== -1) {
+				lib.updateGLVolume(nv);
+			}
+		}
+		syncVolumeState(volume, vmodel);
+	} catch (err) {
+		console.error(`Progressive loading of ${volume.name} failed:`, err);
+	}
+}
+
 /**
  * Create a new NVImage and attach the necessary event listeners
  * Returns the NVImage and a cleanup function that removes the event listeners.
@@ -230,54 +601,42 @@ async function create_volume(
 	const backendId = vmodel.get("id");
 	const existingIdx = nv.getVolumeIndexByID(backendId);
 
-	const path = vmodel.get("path").name ? vmodel.get("path") : null;
+	const path = vmodel.get("path")?.blob ? vmodel.get("path") : null;
 	const url = vmodel.get("url");
-	const data = vmodel.get("data")?.byteLength ? vmodel.get("data") : null;
+	const data = vmodel.get("data")?.blob ? vmodel.get("data") : null;
 
-	const paired_img_path = vmodel.get("paired_img_path").name
-		? vmodel.get("paired_img_path")
-		: null;
 	const paired_img_url = vmodel.get("paired_img_url") ?? "";
-	const paired_img_data = vmodel.get("paired_img_data")?.byteLength
-		? vmodel.get("paired_img_data")
-		: null;
-
-	// Paired image data
+	// Downsampled levels to show while the source loads, coarsest first
+	const frameStream = vmodel.get("_frame_stream") ?? null;
+	const pyramid =
+		existingIdx === -1 && (path || data) && !frameStream
+			? (vmodel.get("_pyramid") ?? [])
+			: [];
+	const refinement = new AbortController();
 	let pairedImgData: ArrayBuffer | null = null;
-	if (paired_img_data) {
-		pairedImgData = paired_img_data.buffer as ArrayBuffer;
-	} else if (paired_img_path) {
-		pairedImgData = paired_img_path.data.buffer as ArrayBuffer;
-	}
 
 	if (existingIdx !== -1) {
 		const idx = nv.getVolumeIndexByID(vmodel.get("id"));
 		volume = nv.volumes[idx];
 	} else if (path || data) {
-		const dataBuffer = path?.data?.buffer || data?.buffer;
+		// Paired image data
+		pairedImgData =
+			(await lib.resolveBlobRef(vmodel, vmodel.get("paired_img_data"))) ??
+			(await lib.resolveBlobRef(vmodel, vmodel.get("paired_img_path")));
 		const name = path?.name || vmodel.get("name");
-		volume = await niivue.NVImage.new(
-			dataBuffer as ArrayBuffer,
-			name,
-			vmodel.get("colormap"),
-			vmodel.get("opacity"),
-			pairedImgData,
-			vmodel.get("cal_min") ?? Number.NaN,
-			vmodel.get("cal_max") ?? Number.NaN,
-			true,
-			0.02,
-			false,
-			false,
-			vmodel.get("colormap_negative"),
-			vmodel.get("frame_4d"),
-			0,
-			vmodel.get("cal_min_neg") ?? Number.NaN,
-			vmodel.get("cal_max_neg") ?? Number.NaN,
-			vmodel.get("colorbar_visible"),
-			null,
-			vmodel.get("colormap_type"),
-			null,
-		);
+		if (frameStream) {
+			// start from the single frame the kernel encoded
+			const first = await lib.resolveBlob(vmodel, frameStream.blob);
+			volume = await loadVolumeBuffer(vmodel, first, PREVIEW_NAME, null, 0);
+			volume.name = name;
+		} else if (pyramid.length) {
+			const preview = await lib.resolveBlobRef(vmodel, pyramid[0]);
+			volume = await loadVolumeBuffer(vmodel, preview, PREVIEW_NAME, null);
+			volume.name = name;
+		} else {
+			const dataBuffer = await lib.resolveBlobRef(vmodel, path ?? data);
+			volume = await loadVolumeBuffer(vmodel, dataBuffer, name, pairedImgData);
+		}
 		volume.id = backendId;
 	} else if (url) {
 		volume = await niivue.NVImage.loadFromUrl({
@@ -312,47 +671,31 @@ async function create_volume(
 		volume.colormapLabel = newColormapLabel;
 	}
 
-	vmodel.set("n_frame_4d", volume.nFrame4D ?? null);
-	vmodel.set("colormap", volume.colormap);
-	if (typeof volume.cal_min !== "undefined") {
-		vmodel.set("cal_min", volume.cal_min);
-	}
-	if (typeof volume.cal_max !== "undefined") {
-		vmodel.set("cal_max", volume.cal_max);
-	}
-	if (volume.hdr !== null) {
-		vmodel.set("hdr", getNIFTIData(volume.hdr));
-	}
-	if (volume.extentsMinOrtho) {
-		vmodel.set("extents_min_ortho", volume.extentsMinOrtho);
-	}
-	if (volume.extentsMaxOrtho) {
-		vmodel.set("extents_max_ortho", volume.extentsMaxOrtho);
-	}
-	if (volume.frac2mm) {
-		vmodel.set("frac2mm", Array.from(volume.frac2mm));
-	}
-	if (volume.frac2mmOrtho) {
-		vmodel.set("frac2mm_ortho", Array.from(volume.frac2mmOrtho));
-	}
-	if (volume.dims) {
-		vmodel.set("dims", volume.dims);
-	}
-	if (volume.dimsRAS) {
-		vmodel.set("dims_ras", volume.dimsRAS);
-	}
-	if (volume.matRAS) {
-		vmodel.set("mat_ras", Array.from(volume.matRAS));
-	}
-	vmodel.save_changes();
-	if (volume.img) {
-		const dataType = lib.getArrayType(volume.img);
-		lib.sendChunkedData(
+	vmodel.set("_codecs", lib.supportedCodecs());
+	if (pyramid.length) {
+		vmodel.save_changes();
+		refineVolume(
+			nv,
+			volume,
 			vmodel,
-			"img",
-			volume.img.buffer as ArrayBuffer,
-			dataType,
+			pyramid,
+			path ?? data,
+			pairedImgData,
+			refinement.signal,
 		);
+	} else {
+		syncVolumeState(volume, vmodel, frameStream);
+	}
+	if (vmodel.get("_img_requested")) {
+		sendImg(volume, vmodel);
+	} else if (
+		!pyramid.length &&
+		!frameStream &&
+		!vmodel.get("lazy_img") &&
+		volume.img &&
+		!kernelHasImg(vmodel, volume.img)
+	) {
+		sendImg(volume, vmodel);
 	}
 
 	// Handle changes to the volume properties
@@ -360,11 +703,15 @@ async function create_volume(
 		volume,
 		vmodel,
 		nv,
+		frameStream
+			? new FrameStream(vmodel, frameStream.n_frames, frameStream.window)
+			: null,
 	);
 
 	return [
 		volume,
 		() => {
+			refinement.abort();
 			// Remove event listeners for volume properties
 			cleanup_volume_listeners();
 		},
@@ -467,5 +814,5 @@ export async function render_volumes(
 	}
 
 	nv.volumes = new_volumes_order;
-	nv.updateGLVolume();
+	lib.updateGLVolume(nv);
 }
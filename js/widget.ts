@@ -8,20 +8,19 @@ import { addPendingVolumeId, render_volumes } from "./volume.ts";
 
 import type {
 	AnyModel,
+	CaptureData,
 	CustomMessagePayload,
 	MeshModel,
 	Model,
 	NiivueObject3D,
-	Scene,
 	TypedBufferPayload,
-	UIData,
 	VolumeModel,
 } from "./types.ts";
 
 import type { Connectome as NiivueConnectome } from "@niivue/niivue";
 
 let nv: niivue.Niivue;
-let updateInterval: ReturnType<typeof setInterval> | null = null;
+let stopSubscriptions: (() => void) | null = null;
 
 async function sendDrawBitmap(nv: niivue.Niivue, model: Model) {
 	const thisModelId = model.get("this_model_id");
@@ -51,6 +50,115 @@ async function sendDrawBitmap(nv: niivue.Niivue, model: Model) {
 	}
 }
 
+type RpcMethod = (
+	// biome-ignore lint/suspicious/noExplicitAny: parameters come from Python
+	params: any[],
+	buffers: DataView[],
+) =>
+	| { result?: unknown; buffers?: ArrayBuffer[] }
+	| Promise<{ result?: unknown; buffers?: ArrayBuffer[] }>;
+
+// Methods Python can call with NiiVue.rpc(); the reply carries the result
+// and any buffers
+const rpcMethods: Record<string, RpcMethod> = {
+	async save_image([isSaveDrawing, volumeByIndex]) {
+		const bytes = await nv.saveImage({
+			filename: "",
+			isSaveDrawing,
+			volumeByIndex,
+		});
+		if (!(bytes instanceof Uint8Array)) {
+			throw new Error("No image to save");
+		}
+		return { buffers: [bytes.slice().buffer as ArrayBuffer] };
+	},
+	get_values([points]: [number[][]]) {
+		const result: Record<string, Array<number | null>> = {};
+		for (const volume of nv.volumes) {
+			const dims = volume.dimsRAS ?? [];
+			result[volume.id] = points.map((mm) => {
+				const vox = volume.mm2vox(mm);
+				if (vox.some((v, i) => v < 0 || v >= dims[i + 1])) {
+					return null;
+				}
+				return volume.getValue(vox[0], vox[1], vox[2], volume.frame4D);
+			});
+		}
+		return { result };
+	},
+	// Draw each view at the requested size and grab it as PNG or raw RGBA
+	async capture([{ width, height, views, format }]: [CaptureData]) {
+		const canvas = nv.canvas;
+		if (!canvas) {
+			throw new Error("The canvas is not attached");
+		}
+		const saved = {
+			width: canvas.width,
+			height: canvas.height,
+			sliceType: nv.opts.sliceType,
+			azimuth: nv.scene.renderAzimuth,
+			elevation: nv.scene.renderElevation,
+		};
+		const grabs: Promise<ArrayBuffer>[] = [];
+		try {
+			canvas.width = width ?? saved.width;
+			canvas.height = height ?? saved.height;
+			for (const view of views) {
+				nv.opts.sliceType = view.slice_type ?? saved.sliceType;
+				nv.scene.renderAzimuth = view.azimuth ?? saved.azimuth;
+				nv.scene.renderElevation = view.elevation ?? saved.elevation;
+				nv.drawScene();
+				// Both read the drawing buffer now, before anything else draws
+				grabs.push(
+					format === "rgba" ? grabPixels(canvas) : grabPng(canvas),
+				);
+			}
+		} finally {
+			nv.opts.sliceType = saved.sliceType;
+			nv.scene.renderAzimuth = saved.azimuth;
+			nv.scene.renderElevation = saved.elevation;
+			canvas.width = saved.width;
+			canvas.height = saved.height;
+			nv.drawScene();
+		}
+		return {
+			result: { width: width ?? saved.width, height: height ?? saved.height },
+			buffers: await Promise.all(grabs),
+		};
+	},
+	// Read scene fields whether or not Python subscribed to them
+	get_scene([fields]: [string[]]) {
+		const result: Record<string, unknown> = {};
+		for (const field of fields) {
+			result[field] = readSubscribedField(nv, "scene", field);
+		}
+		return { result };
+	},
+};
+
+function grabPng(canvas: HTMLCanvasElement): Promise<ArrayBuffer> {
+	const blob = new Promise<Blob>((resolve, reject) =>
+		canvas.toBlob(
+			(b) => (b ? resolve(b) : reject(new Error("Capture failed"))),
+			"image/png",
+		),
+	);
+	return blob.then((b) => b.arrayBuffer());
+}
+
+function grabPixels(canvas: HTMLCanvasElement): Promise<ArrayBuffer> {
+	const copy = document.createElement("canvas");
+	copy.width = canvas.width;
+	copy.height = canvas.height;
+	const ctx = copy.getContext("2d");
+	if (!ctx) {
+		return Promise.reject(new Error("Capture failed"));
+	}
+	ctx.drawImage(canvas, 0, 0);
+	const pixels = ctx.getImageData(0, 0, copy.width, copy.height);
+	return Promise.resolve(pixels.data.buffer as ArrayBuffer);
+}
+
 // Attach model event handlers
 function attachModelEventHandlers(
 	nv: niivue.Niivue,
@@ -78,7 +186,7 @@ function attachModelEventHandlers(
 	function background_masks_overlays_changed() {
 		nv.backgroundMasksOverlays = model.get("background_masks_overlays");
 		if (nv._gl) {
-			nv.updateGLVolume();
+			lib.updateGLVolume(nv);
 		}
 	}
 
@@ -89,14 +197,14 @@ function attachModelEventHandlers(
 			nv.drawLut = drawLut;
 		}
 		if (nv._gl) {
-			nv.updateGLVolume();
+			lib.updateGLVolume(nv);
 		}
 	}
 
 	function draw_opacity_changed() {
 		nv.drawOpacity = model.get("draw_opacity");
 		if (nv._gl) {
-			nv.drawScene();
+			lib.drawScene(nv);
 		}
 	}
 
@@ -134,14 +242,14 @@ function attachModelEventHandlers(
 	function overlay_outline_width_changed() {
 		nv.overlayOutlineWidth = model.get("overlay_outline_width");
 		if (nv._gl) {
-			nv.updateGLVolume();
+			lib.updateGLVolume(nv);
 		}
 	}
 
 	function overlay_alpha_shader_changed() {
 		nv.overlayAlphaShader = model.get("overlay_alpha_shader");
 		if (nv._gl) {
-			nv.updateGLVolume();
+			lib.updateGLVolume(nv);
 		}
 	}
 
@@ -231,11 +339,30 @@ function attachModelEventHandlers(
 					break;
 				}
 				case "draw_scene": {
-					nv.drawScene();
+					lib.drawScene(nv);
 					break;
 				}
 				case "update_gl_volume": {
-					nv.updateGLVolume();
+					lib.updateGLVolume(nv);
+					break;
+				}
+				case "rpc": {
+					const { request_id, method, params } = data;
+					await lib.reply(model, request_id, async () => {
+						const call = rpcMethods[method];
+						if (!call) {
+							throw new Error(`Unknown RPC method: ${method}`);
+						}
+						const { result = null, buffers: replyBuffers } = await call(
+							params,
+							buffers,
+						);
+						return { data: { result }, buffers: replyBuffers };
+					});
+					break;
+				}
+				case "batch": {
+					await lib.applyBatch(nv, model, data, buffers);
 					break;
 				}
 				case "set_volume_render_illumination": {
@@ -562,7 +689,7 @@ function attachNiivueEventHandlers(nv: niivue.Niivue, model: Model) {
 			event: "frame_change",
 			data: {
 				id: volume.id,
-				index,
+				frame_index: index,
 			},
 		});
 	};
@@ -676,7 +803,8 @@ function attachCanvasEventHandlers(nv: niivue.Niivue, model: Model) {
 	let isThrottling = false;
 	if (nv.canvas) {
 		nv.canvas.addEventListener("mousemove", (e) => {
-			if (isThrottling) return;
+			const hoverMode = model.get("_hover_mode");
+			if (hoverMode === "off" || isThrottling) return;
 			isThrottling = true;
 			setTimeout(() => {
 				isThrottling = false;
@@ -691,6 +819,14 @@ function attachCanvasEventHandlers(nv: niivue.Niivue, model: Model) {
 
 				if (frac[0] >= 0) {
 					const mm = nv.frac2mm(frac);
+					if (hoverMode === "kernel") {
+						// the kernel looks the values up itself
+						model.send({
+							event: "hover_idx_change",
+							data: { mm: [mm[0], mm[1], mm[2]] },
+						});
+						return;
+					}
 					const idxValues = nv.volumes.map((volume) => {
 						const vox = volume.mm2vox(mm as number[]);
 						const idx = volume.getValue(vox[0], vox[1], vox[2], volume.frame4D);
@@ -712,110 +848,131 @@ function attachCanvasEventHandlers(nv: niivue.Niivue, model: Model) {
 	}
 }
 
-function setupUpdateInterval(nv: niivue.Niivue, model: Model) {
-	if (updateInterval !== null) {
-		clearInterval(updateInterval);
-		updateInterval = null;
-	}
-
-	let lastSentUidata: UIData | null = model.get("ui_data");
-	let lastSentScene: Scene | null = model.get("scene");
-	let shouldSendScene = false;
-	const sendUpdate = async () => {
-		const thisAnyModel = await lib.getAnyModel(model);
-		if (!thisAnyModel) {
-			return;
-		}
+type SubscriptionGroup = "scene" | "ui_data";
 
-		const updates: {
-			ui_data?: Partial<UIData>;
-			scene?: Partial<Scene>;
-		} = {};
-
-		const currentUidata: UIData = {
-			mousedown: nv.uiData.mousedown,
-			touchdown: nv.uiData.touchdown,
-			mouseButtonLeftDown: nv.uiData.mouseButtonLeftDown,
-			mouseButtonCenterDown: nv.uiData.mouseButtonCenterDown,
-			mouseButtonRightDown: nv.uiData.mouseButtonRightDown,
-			mouseDepthPicker: nv.uiData.mouseDepthPicker,
-			clickedTile: nv.uiData.clickedTile,
-			pan2DxyzmmAtMouseDown: [...nv.uiData.pan2DxyzmmAtMouseDown],
-			prevX: nv.uiData.prevX,
-			prevY: nv.uiData.prevY,
-			currX: nv.uiData.currX,
-			currY: nv.uiData.currY,
-			currentTouchTime: nv.uiData.currentTouchTime,
-			lastTouchTime: nv.uiData.lastTouchTime,
-			doubleTouch: nv.uiData.doubleTouch,
-			isDragging: nv.uiData.isDragging,
-			dragStart: [...nv.uiData.dragStart],
-			dragEnd: [...nv.uiData.dragEnd],
-			dragClipPlaneStartDepthAziElev: [
-				...nv.uiData.dragClipPlaneStartDepthAziElev,
-			],
-			lastTwoTouchDistance: nv.uiData.lastTwoTouchDistance,
-			multiTouchGesture: nv.uiData.multiTouchGesture,
-			dpr: nv.uiData.dpr,
-			max2D: nv.uiData.max2D,
-			max3D: nv.uiData.max3D,
-			windowX: nv.uiData.windowX,
-			windowY: nv.uiData.windowY,
-			activeDragMode: nv.uiData.activeDragMode,
-			activeDragButton: nv.uiData.activeDragButton,
-			angleFirstLine: [...nv.uiData.angleFirstLine],
-			angleState: nv.uiData.angleState,
-			activeClipPlaneIndex: nv.uiData.activeClipPlaneIndex,
-		};
+function readSubscribedField(
+	nv: niivue.Niivue,
+	group: SubscriptionGroup,
+	field: string,
+): unknown {
+	// biome-ignore lint/suspicious/noExplicitAny: fields are named by Python
+	const source: any = group === "scene" ? nv.scene : nv.uiData;
+	if (group === "scene" && field === "gamma") {
+		return source.gamma || 1.0;
+	}
+	return source[field] ?? null;
+}
 
-		const uiDataDelta = lib.uiDataDiff(lastSentUidata, currentUidata);
-		if (Object.keys(uiDataDelta).length > 0) {
-			updates.ui_data = uiDataDelta;
-			lastSentUidata = currentUidata;
+/**
+ * Send the scene and ui_data fields Python subscribed to (`_subscriptions`)
+ * when niivue events may have changed them, at most `rate` times per second
+ * per field, with the latest value always sent.
+ */
+function setupSubscriptions(nv: niivue.Niivue, model: Model) {
+	stopSubscriptions?.();
+
+	const lastSent = new Map<string, { json: string; time: number }>();
+	for (const group of ["scene", "ui_data"] as const) {
+		for (const [field, value] of Object.entries(model.get(group) ?? {})) {
+			lastSent.set(`${group}.${field}`, {
+				json: JSON.stringify(value),
+				time: 0,
+			});
 		}
+	}
 
-		if (shouldSendScene) {
-			const currentScene: Scene = {
-				renderAzimuth: nv.scene.renderAzimuth,
-				renderElevation: nv.scene.renderElevation,
-				volScaleMultiplier: nv.scene.volScaleMultiplier,
-				crosshairPos: [...nv.scene.crosshairPos],
-				clipPlanes: nv.scene.clipPlanes.map((innerArr) => [...innerArr]),
-				clipPlaneDepthAziElevs: nv.scene.clipPlaneDepthAziElevs.map(
-					(innerArr) => [...innerArr],
-				),
-				pan2Dxyzmm: [...nv.scene.pan2Dxyzmm],
-				gamma: nv.scene.gamma || 1.0,
-			};
-			const sceneDelta = lib.sceneDiff(lastSentScene, currentScene);
-			if (Object.keys(sceneDelta).length > 0) {
-				updates.scene = sceneDelta;
-				lastSentScene = currentScene;
+	const pending = new Set<SubscriptionGroup>();
+	let timer: ReturnType<typeof setTimeout> | null = null;
+
+	const flush = async () => {
+		timer = null;
+		const subscriptions = model.get("_subscriptions") ?? {};
+		const groups = [...pending];
+		pending.clear();
+
+		const updates: Partial<Record<SubscriptionGroup, Record<string, unknown>>> =
+			{};
+		const now = performance.now();
+		let retry = Number.POSITIVE_INFINITY;
+		for (const group of groups) {
+			for (const [field, rate] of Object.entries(subscriptions[group] ?? {})) {
+				const key = `${group}.${field}`;
+				const json = JSON.stringify(readSubscribedField(nv, group, field));
+				const last = lastSent.get(key);
+				if (last?.json === json) {
+					continue;
+				}
+				const wait = rate && last ? last.time + 1000 / rate - now : 0;
+				if (wait > 0) {
+					// too soon; send whatever the value is then
+					pending.add(group);
+					retry = Math.min(retry, wait);
+					continue;
+				}
+				lastSent.set(key, { json, time: now });
+				updates[group] = { ...updates[group], [field]: JSON.parse(json) };
 			}
 		}
+		if (retry < Number.POSITIVE_INFINITY) {
+			timer = setTimeout(flush, retry);
+		}
 
 		if (Object.keys(updates).length > 0) {
-			lib.forceSendState(thisAnyModel, updates);
+			const thisAnyModel = await lib.getAnyModel(model);
+			if (thisAnyModel) {
+				lib.forceSendState(thisAnyModel, updates);
+			}
 		}
 	};
 
-	updateInterval = setInterval(sendUpdate, 30);
+	const schedule = (group: SubscriptionGroup) => {
+		const subscriptions = model.get("_subscriptions") ?? {};
+		if (!subscriptions[group]) {
+			return;
+		}
+		pending.add(group);
+		// let niivue handle the event first
+		timer ??= setTimeout(flush, 0);
+	};
 
+	// niivue calls sync() whenever the user changes the scene
 	const originalSync = nv.sync;
 	nv.sync = new Proxy(originalSync, {
 		apply: (target, thisArg, argumentsList) => {
 			Reflect.apply(target, thisArg, argumentsList);
-			if (!nv.gl) {
-				shouldSendScene = false;
-				return;
-			}
-			if (!(nv.gl.canvas as HTMLCanvasElement).matches(":focus")) {
-				shouldSendScene = false;
-				return;
+			if (nv.gl && (nv.gl.canvas as HTMLCanvasElement).matches(":focus")) {
+				schedule("scene");
 			}
-			shouldSendScene = true;
 		},
 	});
+
+	const uiEvents = [
+		"pointerdown",
+		"pointermove",
+		"pointerup",
+		"wheel",
+		"touchstart",
+		"touchmove",
+		"touchend",
+		"keydown",
+		"keyup",
+	];
+	const onUiEvent = () => schedule("ui_data");
+	const canvas = nv.canvas;
+	for (const event of uiEvents) {
+		canvas?.addEventListener(event, onUiEvent, { passive: true });
+	}
+
+	stopSubscriptions = () => {
+		nv.sync = originalSync;
+		for (const event of uiEvents) {
+			canvas?.removeEventListener(event, onUiEvent);
+		}
+		if (timer !== null) {
+			clearTimeout(timer);
+		}
+		stopSubscriptions = null;
+	};
 }
 
 export default {
@@ -853,9 +1010,7 @@ export default {
 			model.off("change:scene");
 			model.off("change:overlay_outline_width");
 			model.off("change:overlay_alpha_shader");
-			if (updateInterval) {
-				clearInterval(updateInterval);
-			}
+			stopSubscriptions?.();
 		};
 	},
 	async render({ model, el }: { model: Model; el: HTMLElement }) {
@@ -898,6 +1053,7 @@ export default {
 			// Attach nv to canvas
 			nv.attachToCanvas(canvas, nv.opts.isAntiAlias);
 			model.set("_canvas_attached", true);
+			model.set("_codecs", lib.supportedCodecs());
 			model.save_changes();
 
 			// Load initial volumes and meshes
@@ -908,7 +1064,7 @@ export default {
 
 			attachCanvasEventHandlers(nv, model);
 
-			setupUpdateInterval(nv, model);
+			setupSubscriptions(nv, model);
 		} else {
 			console.log("moving render around");
 
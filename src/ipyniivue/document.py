@@ -0,0 +1,213 @@
+"""
+Python-side reading and writing of NiiVue documents (``.nvd`` files).
+
+A document is a JSON object, usually gzipped, holding the options, the scene,
+the display options of each volume with its image as a base64-encoded NIfTI
+file, the meshes and the drawing. Writing it here lets sessions be generated
+and reloaded in the kernel without a browser; the file is streamed as it is
+encoded, so only one block of it is in memory at a time.
+"""
+
+import base64
+import gzip
+import io
+import json
+import os
+import pathlib
+import typing
+
+import numpy as np
+
+from .traits import CAMEL_TO_SNAKE_SCENE
+from .utils import atomic_write, write_gzip
+
+# Uncompressed bytes per block when writing gzipped documents
+DOCUMENT_BLOCK_SIZE = 1 << 20
+
+# Keys of a document's sceneData and imageOptionsArray entries, mapped to
+# the Scene and Volume traits they hold
+SCENE_DATA_TO_SNAKE = {
+    **CAMEL_TO_SNAKE_SCENE,
+    "azimuth": "render_azimuth",
+    "elevation": "render_elevation",
+}
+SNAKE_TO_SCENE_DATA = {
+    "render_azimuth": "azimuth",
+    "render_elevation": "elevation",
+    **{v: k for k, v in CAMEL_TO_SNAKE_SCENE.items() if not k.startswith("render")},
+}
+IMAGE_OPTIONS_TO_SNAKE = {
+    "colormap": "colormap",
+    "colormapNegative": "colormap_negative",
+    "opacity": "opacity",
+    "cal_min": "cal_min",
+    "cal_max": "cal_max",
+    "cal_minNeg": "cal_min_neg",
+    "cal_maxNeg": "cal_max_neg",
+    "colorbarVisible": "colorbar_visible",
+    "frame4D": "frame_4d",
+}
+
+
+class Base64Blob:
+    """
+    Binary data written to a document as a base64 string.
+
+    Parameters
+    ----------
+    blocks : iterable of bytes
+        The data, in pieces of any size. It is consumed once, when the
+        document is written.
+    """
+
+    def __init__(self, blocks: typing.Iterable[bytes]):
+        self.blocks = blocks
+
+    def pieces(self) -> typing.Iterator[bytes]:
+        """Yield the base64 encoding of the data, piece by piece."""
+        rest = b""
+        for block in self.blocks:
+            data = rest + bytes(block)
+            cut = len(data) - len(data) % 3
+            if cut:
+                yield base64.b64encode(data[:cut])
+            rest = data[cut:]
+        if rest:
+            yield base64.b64encode(rest)
+
+
+def _json_pieces(value) -> typing.Iterator[bytes]:
+    """Yield the JSON encoding of ``value``, streaming any ``Base64Blob``."""
+    if isinstance(value, Base64Blob):
+        yield b'"'
+        yield from value.pieces()
+        yield b'"'
+    elif isinstance(value, dict):
+        yield b"{"
+        for i, (key, item) in enumerate(value.items()):
+            if i:
+                yield b", "
+            yield json.dumps(str(key)).encode() + b": "
+            yield from _json_pieces(item)
+        yield b"}"
+    elif isinstance(value, (list, tuple)):
+        yield b"["
+        for i, item in enumerate(value):
+            if i:
+                yield b", "
+            yield from _json_pieces(item)
+        yield b"]"
+    elif isinstance(value, np.ndarray):
+        yield json.dumps(value.tolist()).encode()
+    elif isinstance(value, np.generic):
+        yield json.dumps(value.item()).encode()
+    else:
+        yield json.dumps(value).encode()
+
+
+def _blocks(pieces: typing.Iterable[bytes], size: int) -> typing.Iterator[bytes]:
+    """Join small pieces into blocks of at least ``size`` bytes."""
+    buffer = bytearray()
+    for piece in pieces:
+        buffer += piece
+        if len(buffer) >= size:
+            yield bytes(buffer)
+            buffer.clear()
+    if buffer:
+        yield bytes(buffer)
+
+
+def write_document(
+    target: typing.Union[str, pathlib.Path, typing.BinaryIO],
+    document: dict,
+    compresslevel: typing.Optional[int] = 6,
+    threads: typing.Optional[int] = None,
+):
+    """
+    Write a document as JSON, gzipped unless ``compresslevel`` is None.
+
+    Parameters
+    ----------
+    target : str, pathlib.Path or binary file object
+        Where to write the document. A path is written through a temporary
+        file, so a failed write leaves any existing file untouched.
+    document : dict
+        The document. Values may be JSON-serializable objects, numpy arrays
+        or :class:`Base64Blob`, which is encoded as it is written.
+    compresslevel : int or None, optional
+        The gzip compression level (0-9), or None for plain JSON. Default
+        is 6.
+    threads : int or None, optional
+        The number of threads compressing blocks. Default is the number of
+        CPUs.
+
+    Raises
+    ------
+    ValueError
+        If ``compresslevel`` is not between 0 and 9.
+    """
+    if compresslevel is not None and not 0 <= compresslevel <= 9:
+        raise ValueError("compresslevel must be between 0 and 9.")
+    if isinstance(target, (str, os.PathLike)):
+        with atomic_write(target) as f:
+            write_document(f, document, compresslevel, threads)
+        return
+
+    blocks = _blocks(_json_pieces(document), DOCUMENT_BLOCK_SIZE)
+    if compresslevel is None:
+        for block in blocks:
+            target.write(block)
+    else:
+        write_gzip(target, blocks, compresslevel, threads)
+
+
+def read_document(source: typing.Union[bytes, str, pathlib.Path]) -> dict:
+    """
+    Read a document, gzipped or not.
+
+    Parameters
+    ----------
+    source : bytes-like, str or pathlib.Path
+        The file contents, or the path to the file.
+
+    Returns
+    -------
+    dict
+        The document. Base64 strings are left encoded; see
+        :func:`decode_blob`.
+
+    Raises
+    ------
+    ValueError
+        If the data is not a JSON object.
+    """
+    if isinstance(source, (str, os.PathLike)):
+        raw = open(source, "rb")
+    else:
+        raw = io.BytesIO(source)
+    with raw:
+        gzipped = raw.read(2) == b"\x1f\x8b"
+        raw.seek(0)
+        document = json.load(gzip.GzipFile(fileobj=raw) if gzipped else raw)
+    if not isinstance(document, dict):
+        raise ValueError("Not a NiiVue document.")
+    return document
+
+
+def decode_blob(value: str) -> bytes:
+    """
+    Decode a base64 string from a document.
+
+    Parameters
+    ----------
+    value : str
+        The string, optionally a ``data:`` URL.
+
+    Returns
+    -------
+    bytes
+        The decoded data.
+    """
+    if value.startswith("data:"):
+        value = value.partition(",")[2]
+    return base64.b64decode(value)
@@ -0,0 +1,679 @@
+"""
+Python-side reading and writing of NIfTI-1 and NIfTI-2 files.
+
+Decoding volumes in the kernel means ``Volume.hdr`` and ``Volume.img`` are
+available as soon as a ``Volume`` is created, without waiting for the browser
+to decode the file and send the voxels back. Downsampled copies encoded here
+let the frontend render a preview before the full-resolution file arrives.
+"""
+
+import gzip
+import math
+import os
+import pathlib
+import struct
+import typing
+
+import numpy as np
+
+from .traits import NIFTI1Hdr
+from .utils import atomic_write, file_cache, write_gzip
+
+NIFTI1_HEADER_SIZE = 348
+NIFTI2_HEADER_SIZE = 540
+
+# intent_code of images whose values are labels, such as drawings
+NIFTI_INTENT_LABEL = 1002
+
+# Datatypes that NiiVue keeps as-is when it decodes a NIfTI image.
+# Other datatypes (int8, RGB, int64, ...) are converted by the frontend,
+# so their voxels are left for the frontend to send back.
+DATATYPE_TO_DTYPE = {
+    NIFTI1Hdr.TYPE_UINT8: np.dtype(np.uint8),
+    NIFTI1Hdr.TYPE_INT16: np.dtype(np.int16),
+    NIFTI1Hdr.TYPE_INT32: np.dtype(np.int32),
+    NIFTI1Hdr.TYPE_FLOAT32: np.dtype(np.float32),
+    NIFTI1Hdr.TYPE_FLOAT64: np.dtype(np.float64),
+    NIFTI1Hdr.TYPE_UINT16: np.dtype(np.uint16),
+    NIFTI1Hdr.TYPE_UINT32: np.dtype(np.uint32),
+}
+DTYPE_TO_DATATYPE = {dtype: code for code, dtype in DATATYPE_TO_DTYPE.items()}
+
+
+def is_nifti_name(name: typing.Optional[str]) -> bool:
+    """
+    Check whether a file name looks like a single-file NIfTI image.
+
+    Parameters
+    ----------
+    name : str or None
+        The file name.
+
+    Returns
+    -------
+    bool
+        True for ``.nii`` and ``.nii.gz`` names.
+    """
+    if not name:
+        return False
+    lower = str(name).lower()
+    return lower.endswith(".nii") or lower.endswith(".nii.gz")
+
+
+def _decode_string(raw: bytes) -> str:
+    return raw.split(b"\x00", 1)[0].decode("latin-1")
+
+
+def _quatern_to_affine(hdr: dict) -> list:
+    """Compute the qform affine, following nifti1_io's quatern_to_mat44."""
+    b = hdr["quatern_b"]
+    c = hdr["quatern_c"]
+    d = hdr["quatern_d"]
+    a = 1.0 - (b * b + c * c + d * d)
+    if a < 1.0e-7:
+        a = 1.0 / math.sqrt(b * b + c * c + d * d)
+        b *= a
+        c *= a
+        d *= a
+        a = 0.0
+    else:
+        a = math.sqrt(a)
+
+    pix = hdr["pixDims"]
+    xd = pix[1] if pix[1] > 0 else 1.0
+    yd = pix[2] if pix[2] > 0 else 1.0
+    zd = pix[3] if pix[3] > 0 else 1.0
+    if pix[0] < 0:
+        zd = -zd
+
+    return [
+        [
+            (a * a + b * b - c * c - d * d) * xd,
+            2.0 * (b * c - a * d) * yd,
+            2.0 * (b * d + a * c) * zd,
+            hdr["qoffset_x"],
+        ],
+        [
+            2.0 * (b * c + a * d) * xd,
+            (a * a + c * c - b * b - d * d) * yd,
+            2.0 * (c * d - a * b) * zd,
+            hdr["qoffset_y"],
+        ],
+        [
+            2.0 * (b * d - a * c) * xd,
+            2.0 * (c * d + a * b) * yd,
+            (a * a + d * d - c * c - b * b) * zd,
+            hdr["qoffset_z"],
+        ],
+        [0.0, 0.0, 0.0, 1.0],
+    ]
+
+
+def _header_endianness(raw: bytes) -> tuple[str, int]:
+    """Return the struct byte order prefix and header size of a NIfTI header."""
+    if len(raw) < 4:
+        raise ValueError("Data is too short to be a NIfTI image.")
+    for order in ("<", ">"):
+        size = struct.unpack_from(f"{order}i", raw, 0)[0]
+        if size in (NIFTI1_HEADER_SIZE, NIFTI2_HEADER_SIZE):
+            return order, size
+    raise ValueError("Data is not a NIfTI-1 or NIfTI-2 image.")
+
+
+def _read_nifti1_header(raw: bytes, o: str) -> dict:
+    def unpack(fmt, offset):
+        return struct.unpack_from(o + fmt, raw, offset)
+
+    hdr = {
+        "dim_info": raw[39],
+        "dims": list(unpack("8h", 40)),
+        "intent_p1": unpack("f", 56)[0],
+        "intent_p2": unpack("f", 60)[0],
+        "intent_p3": unpack("f", 64)[0],
+        "intent_code": unpack("h", 68)[0],
+        "datatypeCode": unpack("h", 70)[0],
+        "numBitsPerVoxel": unpack("h", 72)[0],
+        "slice_start": unpack("h", 74)[0],
+        "pixDims": list(unpack("8f", 76)),
+        "vox_offset": unpack("f", 108)[0],
+        "scl_slope": unpack("f", 112)[0],
+        "scl_inter": unpack("f", 116)[0],
+        "slice_end": unpack("h", 120)[0],
+        "slice_code": raw[122],
+        "xyzt_units": raw[123],
+        "cal_max": unpack("f", 124)[0],
+        "cal_min": unpack("f", 128)[0],
+        "slice_duration": unpack("f", 132)[0],
+        "toffset": unpack("f", 136)[0],
+        "description": _decode_string(raw[148:228]),
+        "aux_file": _decode_string(raw[228:252]),
+        "qform_code": unpack("h", 252)[0],
+        "sform_code": unpack("h", 254)[0],
+        "quatern_b": unpack("f", 256)[0],
+        "quatern_c": unpack("f", 260)[0],
+        "quatern_d": unpack("f", 264)[0],
+        "qoffset_x": unpack("f", 268)[0],
+        "qoffset_y": unpack("f", 272)[0],
+        "qoffset_z": unpack("f", 276)[0],
+        "affine": [list(unpack("4f", 280 + 16 * row)) for row in range(3)],
+        "intent_name": _decode_string(raw[328:344]),
+        "magic": _decode_string(raw[344:348]),
+    }
+    hdr["extensionFlag"] = list(raw[348:352]) if len(raw) >= 352 else [0, 0, 0, 0]
+    return hdr
+
+
+def _read_nifti2_header(raw: bytes, o: str) -> dict:
+    def unpack(fmt, offset):
+        return struct.unpack_from(o + fmt, raw, offset)
+
+    hdr = {
+        "magic": _decode_string(raw[4:12]),
+        "datatypeCode": unpack("h", 12)[0],
+        "numBitsPerVoxel": unpack("h", 14)[0],
+        "dims": list(unpack("8q", 16)),
+        "intent_p1": unpack("d", 80)[0],
+        "intent_p2": unpack("d", 88)[0],
+        "intent_p3": unpack("d", 96)[0],
+        "pixDims": list(unpack("8d", 104)),
+        "vox_offset": float(unpack("q", 168)[0]),
+        "scl_slope": unpack("d", 176)[0],
+        "scl_inter": unpack("d", 184)[0],
+        "cal_max": unpack("d", 192)[0],
+        "cal_min": unpack("d", 200)[0],
+        "slice_duration": unpack("d", 208)[0],
+        "toffset": unpack("d", 216)[0],
+        "slice_start": unpack("q", 224)[0],
+        "slice_end": unpack("q", 232)[0],
+        "description": _decode_string(raw[240:320]),
+        "aux_file": _decode_string(raw[320:344]),
+        "qform_code": unpack("i", 344)[0],
+        "sform_code": unpack("i", 348)[0],
+        "quatern_b": unpack("d", 352)[0],
+        "quatern_c": unpack("d", 360)[0],
+        "quatern_d": unpack("d", 368)[0],
+        "qoffset_x": unpack("d", 376)[0],
+        "qoffset_y": unpack("d", 384)[0],
+        "qoffset_z": unpack("d", 392)[0],
+        "affine": [list(unpack("4d", 400 + 32 * row)) for row in range(3)],
+        "slice_code": unpack("i", 496)[0],
+        "xyzt_units": unpack("i", 500)[0],
+        "intent_code": unpack("i", 504)[0],
+        "intent_name": _decode_string(raw[508:524]),
+        "dim_info": raw[524],
+    }
+    hdr["extensionFlag"] = list(raw[540:544]) if len(raw) >= 544 else [0, 0, 0, 0]
+    return hdr
+
+
+def read_header(raw: bytes) -> NIFTI1Hdr:
+    """
+    Parse the header of an uncompressed NIfTI-1 or NIfTI-2 image.
+
+    Parameters
+    ----------
+    raw : bytes-like
+        The start of the file, at least 348 (NIfTI-1) or 540 (NIfTI-2) bytes.
+
+    Returns
+    -------
+    NIFTI1Hdr
+        The parsed header, with the same field names NIFTI-Reader-JS uses.
+
+    Raises
+    ------
+    ValueError
+        If the data is not a NIfTI image.
+    """
+    order, size = _header_endianness(raw)
+    if len(raw) < size:
+        raise ValueError("Data is too short to hold a NIfTI header.")
+    raw = bytes(raw[: size + 4])
+    if size == NIFTI1_HEADER_SIZE:
+        hdr = _read_nifti1_header(raw, order)
+    else:
+        hdr = _read_nifti2_header(raw, order)
+
+    hdr["littleEndian"] = order == "<"
+    hdr["affine"].append([0.0, 0.0, 0.0, 1.0])
+    if hdr["qform_code"] > 0 and hdr["sform_code"] < hdr["qform_code"]:
+        hdr["affine"] = _quatern_to_affine(hdr)
+    elif hdr["qform_code"] < 1 and hdr["sform_code"] < 1:
+        pix = hdr["pixDims"]
+        hdr["affine"] = [
+            [pix[1], 0.0, 0.0, 0.0],
+            [0.0, pix[2], 0.0, 0.0],
+            [0.0, 0.0, pix[3], 0.0],
+            [0.0, 0.0, 0.0, 1.0],
+        ]
+
+    return NIFTI1Hdr(**hdr)
+
+
+def voxel_dtype(hdr: NIFTI1Hdr) -> typing.Optional[np.dtype]:
+    """
+    Return the on-disk dtype of the voxels described by a header.
+
+    Parameters
+    ----------
+    hdr : NIFTI1Hdr
+        The image header.
+
+    Returns
+    -------
+    np.dtype or None
+        The dtype with the header's byte order, or None if the datatype is one
+        the frontend converts on load.
+    """
+    dtype = DATATYPE_TO_DTYPE.get(hdr.datatypeCode)
+    if dtype is None:
+        return None
+    return dtype.newbyteorder("<" if hdr.littleEndian else ">")
+
+
+def voxel_count(hdr: NIFTI1Hdr) -> int:
+    """
+    Return the number of voxels (across all frames) described by a header.
+
+    Parameters
+    ----------
+    hdr : NIFTI1Hdr
+        The image header.
+
+    Returns
+    -------
+    int
+        The product of the used dimensions.
+    """
+    ndim = max(1, min(int(hdr.dims[0]), 7))
+    return math.prod(max(1, int(d)) for d in hdr.dims[1 : ndim + 1])
+
+
+def _memmap_nifti(
+    path: typing.Union[str, pathlib.Path],
+) -> typing.Optional[tuple[NIFTI1Hdr, typing.Optional[np.ndarray]]]:
+    """Map the voxels of an uncompressed file, or return None if compressed."""
+    with open(path, "rb") as f:
+        head = f.read(NIFTI2_HEADER_SIZE + 4)
+    if head[:2] == b"\x1f\x8b":
+        return None
+
+    hdr = read_header(head)
+    dtype = voxel_dtype(hdr)
+    if dtype is None:
+        return hdr, None
+
+    offset = int(hdr.vox_offset)
+    count = voxel_count(hdr)
+    if offset + count * dtype.itemsize > os.path.getsize(path):
+        raise ValueError("NIfTI image data is truncated.")
+
+    # Copy-on-write, so writes to the array never reach the file.
+    img = np.memmap(path, dtype=dtype, mode="c", offset=offset, shape=(count,))
+    return hdr, img
+
+
+def read_nifti(
+    source: typing.Union[bytes, str, pathlib.Path],
+    memmap: bool = False,
+) -> tuple[NIFTI1Hdr, typing.Optional[np.ndarray]]:
+    """
+    Decode a ``.nii`` or ``.nii.gz`` image.
+
+    Parameters
+    ----------
+    source : bytes-like, str or pathlib.Path
+        The file contents, or the path to the file (read through
+        ``utils.file_cache``).
+    memmap : bool, optional
+        If True and ``source`` is the path of an uncompressed file, return the
+        voxels as a copy-on-write ``np.memmap`` in the file's byte order
+        instead of reading them into memory. Default is False.
+
+    Returns
+    -------
+    tuple of (NIFTI1Hdr, np.ndarray or None)
+        The header and the flat voxel array, in little-endian byte order
+        unless it is memory-mapped. The array is None when the datatype is
+        one the frontend converts on load.
+
+    Raises
+    ------
+    ValueError
+        If the data is not a NIfTI image or is truncated.
+
+    Examples
+    --------
+    ::
+
+        hdr, img = read_nifti("mni152.nii.gz")
+    """
+    if memmap and isinstance(source, (str, pathlib.Path)):
+        mapped = _memmap_nifti(source)
+        if mapped is not None:
+            return mapped
+
+    if isinstance(source, (str, pathlib.Path)):
+        raw = file_cache.read(source)
+    else:
+        raw = source
+    if raw[:2] == b"\x1f\x8b":
+        raw = gzip.decompress(raw)
+
+    hdr = read_header(raw)
+    dtype = voxel_dtype(hdr)
+    if dtype is None:
+        return hdr, None
+
+    offset = int(hdr.vox_offset)
+    count = voxel_count(hdr)
+    if offset + count * dtype.itemsize > len(raw):
+        raise ValueError("NIfTI image data is truncated.")
+
+    # A view onto the decoded file, read-only like arrays sent by the frontend.
+    img = np.frombuffer(raw, dtype=dtype, count=count, offset=offset)
+    if not hdr.littleEndian:
+        img = img.astype(dtype.newbyteorder("<"))
+    return hdr, img
+
+
+def _encode_header(hdr: NIFTI1Hdr, dtype: np.dtype) -> bytes:
+    """Encode a NIfTI-1 header and empty extension for voxels of ``dtype``."""
+    code = DTYPE_TO_DATATYPE.get(dtype.newbyteorder("="))
+    if code is None:
+        raise ValueError(f"Cannot encode {dtype} voxels as NIfTI.")
+    dims = [int(d) for d in hdr.dims[:8]]
+    if any(not -32768 <= d <= 32767 for d in dims):
+        # e.g. images read from NIfTI-2 files, whose dims are 64-bit
+        raise ValueError(
+            f"NIfTI-1 stores dimensions as 16-bit integers and cannot "
+            f"represent dims {dims[: dims[0] + 1]}."
+        )
+
+    raw = bytearray(NIFTI1_HEADER_SIZE + 4)
+
+    def pack(fmt, offset, *values):
+        struct.pack_into("<" + fmt, raw, offset, *values)
+
+    def pack_string(value, offset, size):
+        encoded = value.encode("latin-1")[:size]
+        raw[offset : offset + len(encoded)] = encoded
+
+    pack("i", 0, NIFTI1_HEADER_SIZE)
+    raw[39] = hdr.dim_info
+    pack("8h", 40, *dims)
+    pack("3f", 56, hdr.intent_p1, hdr.intent_p2, hdr.intent_p3)
+    pack("4h", 68, hdr.intent_code, code, dtype.itemsize * 8, hdr.slice_start)
+    pack("8f", 76, *hdr.pixDims[:8])
+    pack("3f", 108, NIFTI1_HEADER_SIZE + 4, hdr.scl_slope, hdr.scl_inter)
+    pack("h", 120, hdr.slice_end)
+    raw[122] = hdr.slice_code
+    raw[123] = hdr.xyzt_units
+    pack("4f", 124, hdr.cal_max, hdr.cal_min, hdr.slice_duration, hdr.toffset)
+    pack_string(hdr.description, 148, 80)
+    pack_string(hdr.aux_file, 228, 24)
+    pack("2h", 252, hdr.qform_code, max(hdr.sform_code, hdr.qform_code, 1))
+    pack("3f", 256, hdr.quatern_b, hdr.quatern_c, hdr.quatern_d)
+    pack("3f", 268, hdr.qoffset_x, hdr.qoffset_y, hdr.qoffset_z)
+    for row in range(3):
+        pack("4f", 280 + 16 * row, *hdr.affine[row])
+    pack_string(hdr.intent_name, 328, 16)
+    pack_string("n+1", 344, 4)
+    return bytes(raw)
+
+
+def encode_nifti(hdr: NIFTI1Hdr, img: np.ndarray) -> bytes:
+    """
+    Encode an image as an uncompressed, little-endian NIfTI-1 file.
+
+    Parameters
+    ----------
+    hdr : NIFTI1Hdr
+        The header. ``affine`` is written as the sform; the datatype and
+        ``vox_offset`` are derived from ``img``.
+    img : np.ndarray
+        The voxels, flat in Fortran order, of a datatype in
+        ``DATATYPE_TO_DTYPE``.
+
+    Returns
+    -------
+    bytes
+        The file contents.
+
+    Raises
+    ------
+    ValueError
+        If ``img`` has an unsupported datatype, or a dimension does not fit
+        in NIfTI-1's 16-bit ``dim`` field.
+    """
+    header = _encode_header(hdr, img.dtype)
+    return header + img.astype(img.dtype.newbyteorder("<"), copy=False).tobytes()
+
+
+# Uncompressed bytes per deflate block when writing .nii.gz files
+GZIP_BLOCK_SIZE = 1 << 20
+
+
+def _file_blocks(header: bytes, img: np.ndarray, size: int):
+    """Yield the header and voxels of a file in blocks of about ``size`` bytes."""
+    dtype = img.dtype.newbyteorder("<")
+    step = max(1, size // dtype.itemsize)
+    # The header rides with the first block, so later blocks start on a voxel
+    first = max(0, step - len(header) // dtype.itemsize)
+    yield header + img[:first].astype(dtype, copy=False).tobytes()
+    for start in range(first, img.size, step):
+        yield img[start : start + step].astype(dtype, copy=False).tobytes()
+
+
+def iter_nifti(
+    hdr: NIFTI1Hdr, img: np.ndarray, block_size: int = GZIP_BLOCK_SIZE
+) -> typing.Iterator[bytes]:
+    """
+    Encode an image like :func:`encode_nifti`, but in blocks.
+
+    Parameters
+    ----------
+    hdr : NIFTI1Hdr
+        The header, as for :func:`encode_nifti`.
+    img : np.ndarray
+        The voxels, as for :func:`encode_nifti`.
+    block_size : int, optional
+        The approximate size of each block in bytes.
+
+    Returns
+    -------
+    iterator of bytes
+        The file contents, in order.
+
+    Raises
+    ------
+    ValueError
+        If ``img`` has an unsupported datatype, or a dimension does not fit
+        in NIfTI-1's 16-bit ``dim`` field.
+    """
+    return _file_blocks(_encode_header(hdr, img.dtype), img, block_size)
+
+
+def write_nifti(
+    target: typing.Union[str, pathlib.Path, typing.BinaryIO],
+    hdr: NIFTI1Hdr,
+    img: np.ndarray,
+    compresslevel: typing.Optional[int] = None,
+    threads: typing.Optional[int] = None,
+):
+    """
+    Write an image as a little-endian NIfTI-1 file, optionally gzipped.
+
+    The file is produced block by block, so neither the whole encoded file
+    nor its compressed copy is held in memory. A path is written through a
+    temporary file in the same directory, so a failed write leaves any
+    existing file untouched.
+
+    Parameters
+    ----------
+    target : str, pathlib.Path or binary file object
+        Where to write the file.
+    hdr : NIFTI1Hdr
+        The header, as for :func:`encode_nifti`.
+    img : np.ndarray
+        The voxels, as for :func:`encode_nifti`.
+    compresslevel : int or None, optional
+        The gzip compression level (0-9), or None to write an uncompressed
+        ``.nii`` file. Default is None.
+    threads : int or None, optional
+        The number of threads compressing blocks. Default is the number of
+        CPUs.
+
+    Raises
+    ------
+    ValueError
+        If ``img`` has an unsupported datatype, a dimension does not fit in
+        NIfTI-1's 16-bit ``dim`` field, or ``compresslevel`` is not between
+        0 and 9.
+
+    Examples
+    --------
+    ::
+
+        write_nifti("mask.nii.gz", hdr, img, compresslevel=6)
+    """
+    if compresslevel is not None and not 0 <= compresslevel <= 9:
+        raise ValueError("compresslevel must be between 0 and 9.")
+    blocks = iter_nifti(hdr, img)
+    if isinstance(target, (str, os.PathLike)):
+        with atomic_write(target) as f:
+            write_nifti(f, hdr, img, compresslevel, threads)
+        return
+
+    if compresslevel is None:
+        for block in blocks:
+            target.write(block)
+    else:
+        write_gzip(target, blocks, compresslevel, threads)
+
+
+def _ras_axes(affine) -> tuple[list, list]:
+    """
+    Return, for each RAS axis, the voxel axis closest to it and whether it is flipped.
+
+    This is the reorientation NiiVue applies when it loads an image.
+    """
+    rotation = np.asarray(affine, dtype=np.float64)[:3, :3]
+    order = [int(np.argmax(np.abs(rotation[:, c]))) for c in range(3)]
+    if sorted(order) != [0, 1, 2]:
+        # Oblique beyond recognition; keep the voxel order
+        order = [0, 1, 2]
+    order = [order.index(r) for r in range(3)]
+    flips = [bool(rotation[r, order[r]] < 0) for r in range(3)]
+    return order, flips
+
+
+def to_ras(hdr: NIFTI1Hdr, img: np.ndarray) -> np.ndarray:
+    """
+    Reorder the voxels of a 3D image the way NiiVue does, to RAS.
+
+    Parameters
+    ----------
+    hdr : NIFTI1Hdr
+        The header of the image, with ``dims`` and ``affine``.
+    img : np.ndarray
+        The voxels, flat in Fortran order.
+
+    Returns
+    -------
+    np.ndarray
+        The voxels in RAS order, flat in Fortran order, like ``draw_bitmap``.
+    """
+    order, flips = _ras_axes(hdr.affine)
+    data = np.asarray(img).reshape([int(d) for d in hdr.dims[1:4]], order="F")
+    data = data.transpose(order)
+    for axis, flip in enumerate(flips):
+        if flip:
+            data = np.flip(data, axis)
+    return data.ravel(order="F")
+
+
+def from_ras(hdr: NIFTI1Hdr, img: np.ndarray) -> np.ndarray:
+    """
+    Undo :func:`to_ras`, returning the voxels in the order of ``hdr``.
+
+    Parameters
+    ----------
+    hdr : NIFTI1Hdr
+        The header of the image the voxels are aligned with.
+    img : np.ndarray
+        The voxels in RAS order, flat in Fortran order.
+
+    Returns
+    -------
+    np.ndarray
+        The voxels in the order of ``hdr``, flat in Fortran order.
+    """
+    order, flips = _ras_axes(hdr.affine)
+    dims = [int(d) for d in hdr.dims[1:4]]
+    data = np.asarray(img).reshape([dims[axis] for axis in order], order="F")
+    for axis, flip in enumerate(flips):
+        if flip:
+            data = np.flip(data, axis)
+    return data.transpose(np.argsort(order)).ravel(order="F")
+
+
+def _block_mean(data: np.ndarray, factor: int, axis: int) -> np.ndarray:
+    """Average blocks of ``factor`` elements along an axis (the last may be short)."""
+    n = data.shape[axis]
+    starts = np.arange(0, n, factor)
+    counts = np.diff(np.append(starts, n))
+    dtype = np.result_type(data.dtype, np.float32)
+    sums = np.add.reduceat(data, starts, axis=axis, dtype=dtype)
+    shape = [1] * data.ndim
+    shape[axis] = -1
+    return sums / counts.reshape(shape).astype(dtype)
+
+
+def downsample(
+    hdr: NIFTI1Hdr, img: np.ndarray, factor: int
+) -> tuple[NIFTI1Hdr, np.ndarray]:
+    """
+    Mean-pool the spatial axes of an image by an integer factor.
+
+    Parameters
+    ----------
+    hdr : NIFTI1Hdr
+        The header of the image.
+    img : np.ndarray
+        The voxels, flat in Fortran order.
+    factor : int
+        The number of voxels averaged along each spatial axis.
+
+    Returns
+    -------
+    tuple of (NIFTI1Hdr, np.ndarray)
+        The header, with ``dims``, ``pixDims`` and the (sform) ``affine``
+        adjusted so the pooled voxels cover the same space, and the flat
+        voxels in the dtype of ``img``.
+    """
+    ndim = max(1, min(int(hdr.dims[0]), 7))
+    shape = [max(1, int(d)) for d in hdr.dims[1 : ndim + 1]]
+    data = np.asarray(img).reshape(shape, order="F")
+    for axis in range(min(3, ndim)):
+        data = _block_mean(data, factor, axis)
+    if np.issubdtype(img.dtype, np.integer):
+        data = np.rint(data)
+    pooled = data.astype(img.dtype.newbyteorder("="))
+
+    affine = np.array(hdr.affine, dtype=np.float64)
+    # The centre of pooled voxel 0 is the centre of its block of voxels
+    offset = affine @ np.array([(factor - 1) / 2] * 3 + [1.0])
+    affine[:3, :3] *= factor
+    affine[:3, 3] = offset[:3]
+
+    values = hdr.trait_values()
+    values["dims"] = [hdr.dims[0], *data.shape, *hdr.dims[ndim + 1 :]][:8]
+    values["pixDims"] = [
+        p * factor if 1 <= i <= 3 else p for i, p in enumerate(hdr.pixDims)
+    ]
+    values["affine"] = affine.tolist()
+    values["qform_code"] = 0
+    values["sform_code"] = max(hdr.sform_code, 1)
+    values["littleEndian"] = True
+    return NIFTI1Hdr(**values), pooled.ravel(order="F")
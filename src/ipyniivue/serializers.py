@@ -26,13 +26,16 @@ from .traits import (
     UIData,
     VolumeObject3DData,
 )
-from .utils import is_negative_zero
+from .utils import as_little_endian, blob_store, is_negative_zero
 
 
 def serialize_file(instance: typing.Union[pathlib.Path, str], widget: object):
     """
     Serialize a file to be transferred and read by the JS side.
 
+    Only the name and the key of the file in ``blob_store`` are sent; the
+    frontend requests the contents if it doesn't already have them.
+
     Parameters
     ----------
     instance : typing.Union[pathLib.Path, str]
@@ -41,10 +44,43 @@ def serialize_file(instance: typing.Union[pathlib.Path, str], widget: object):
         The NiiVue widget the instance is a part of.
     """
     if instance is None:
-        return {"name": None, "data": None}
+        return {"name": None, "blob": None}
     if isinstance(instance, str):
         instance = pathlib.Path(instance)
-    return {"name": instance.name, "data": instance.read_bytes()}
+    return {"name": instance.name, "blob": blob_store.add_file(instance, widget)}
+
+
+def serialize_blob(instance: bytes, widget: object):
+    """
+    Serialize bytes as their key in ``blob_store``.
+
+    Parameters
+    ----------
+    instance : bytes
+        The bytes to be serialized.
+    widget : object
+        The widget the instance is a part of.
+    """
+    if instance is None:
+        return None
+    return {"blob": blob_store.add_bytes(instance, widget)}
+
+
+def serialize_array_blob(instance: np.ndarray, widget: object):
+    """
+    Serialize an ndarray as its dtype and the key of its bytes in ``blob_store``.
+
+    Parameters
+    ----------
+    instance : np.ndarray
+        The array to serialize.
+    widget : object
+        The widget the instance is a part of.
+    """
+    if instance is None:
+        return None
+    data = as_little_endian(instance).tobytes()
+    return {"type": instance.dtype.name, "blob": blob_store.add_bytes(data, widget)}
 
 
 def serialize_colormap_label(instance: LUT, widget: object):
@@ -284,8 +320,8 @@ def serialize_ndarray(instance: np.ndarray, widget: object):
     """
     if instance is None:
         return None
-    data_bytes = instance.tobytes()
-    dtype_str = str(instance.dtype)
+    data_bytes = as_little_endian(instance).tobytes()
+    dtype_str = instance.dtype.name
     return {"type": dtype_str, "data": data_bytes}
 
 
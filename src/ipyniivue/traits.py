@@ -588,6 +588,14 @@ class Scene(t.HasTraits):
         The 2D pan in 3D mm as a list of 4 floats.
     gamma : float
         The gamma value for rendering.
+
+    Notes
+    -----
+    On a :class:`NiiVue` widget, these values are only updated from the
+    frontend for the fields subscribed to with :meth:`NiiVue.subscribe`
+    (e.g. ``nv.subscribe("scene")``). Other fields keep the values last set
+    from Python and don't follow the crosshair, rotation or pan the user
+    changes in the browser.
     """
 
     render_azimuth = t.Float(110.0).tag(sync=True)
@@ -770,6 +778,12 @@ class UIData(t.HasTraits):
         Current state of angle measurement.
     active_clip_plane_index : int
         Index of the currently active clipping plane.
+
+    Notes
+    -----
+    Only the fields subscribed to with :meth:`NiiVue.subscribe` (e.g.
+    ``nv.subscribe("ui_data")``) are updated from the frontend; the others
+    keep their initial values.
     """
 
     mousedown = t.Bool(False, read_only=True).tag(sync=False)
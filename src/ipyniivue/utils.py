@@ -5,7 +5,21 @@ It includes a class to convert from snake to camel case as well as multiple
 classes the serialize data to work with JS.
 """
 
+import asyncio
+import collections
+import concurrent.futures
+import contextlib
+import hashlib
 import math
+import mmap
+import os
+import pathlib
+import stat
+import struct
+import time
+import typing
+import weakref
+import zlib
 
 import numpy as np
 
@@ -15,6 +29,249 @@ from .traits import (
 )
 
 
+class AwaitableFuture(concurrent.futures.Future):
+    """
+    A future for a reply from the frontend.
+
+    It can be awaited, or waited on with ``result()`` from another thread.
+    The kernel only handles messages from the frontend once the running cell
+    has finished, so the reply can't arrive in the cell that made the
+    request: await the future in a later cell or from a background task
+    (e.g. ``asyncio.ensure_future``), and never block on ``result()`` in the
+    kernel's main thread.
+    """
+
+    def __await__(self):
+        """Wait for the result without blocking the event loop."""
+        return asyncio.wrap_future(self).__await__()
+
+
+def expire_after(future, timeout):
+    """
+    Fail ``future`` with ``TimeoutError`` if it isn't done in ``timeout`` seconds.
+
+    Needs a running event loop, as in a kernel; without one, or with a
+    ``timeout`` of None, the future is returned unchanged.
+    """
+    if timeout is None or future.done():
+        return future
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        return future
+
+    def expire():
+        if not future.done():
+            future.set_exception(TimeoutError(f"Not done after {timeout} seconds."))
+
+    handle = loop.call_later(timeout, expire)
+    future.add_done_callback(lambda _: handle.cancel())
+    return future
+
+
+def gather_futures(futures, result=None, timeout=None):
+    """
+    Combine futures into an :class:`AwaitableFuture` resolving to ``result``.
+
+    The combined future fails with the first exception raised by one of
+    ``futures``, or with ``TimeoutError`` if they are not all done within
+    ``timeout`` seconds (see :func:`expire_after`). Once it fails or is
+    cancelled, the futures still pending are cancelled.
+    """
+    combined = AwaitableFuture()
+    pending = set(futures)
+
+    def child_done(future):
+        pending.discard(future)
+        if combined.done():
+            return
+        if future.cancelled():
+            combined.set_exception(concurrent.futures.CancelledError())
+        elif future.exception() is not None:
+            combined.set_exception(future.exception())
+        elif not pending:
+            combined.set_result(result)
+
+    def combined_done(_):
+        for future in list(pending):
+            future.cancel()
+
+    if not pending:
+        combined.set_result(result)
+        return combined
+
+    for future in list(pending):
+        future.add_done_callback(child_done)
+    combined.add_done_callback(combined_done)
+
+    return expire_after(combined, timeout)
+
+
+EVENT_POLICIES = ("latest", "drop_oldest", "unbounded")
+
+
+class EventStream:
+    """
+    An async iterator over the events passed to a callback.
+
+    Events are queued by :meth:`push`, which never blocks, so the kernel keeps
+    handling messages however slowly the events are consumed. ``policy``
+    decides what happens when ``maxsize`` events are already waiting:
+    ``"latest"`` replaces them with the new event, ``"drop_oldest"`` discards
+    the oldest one, and ``"unbounded"`` keeps every event, letting the queue
+    grow past ``maxsize`` without limit. (Callbacks run on the event loop,
+    which cannot wait for the consumer without stalling the kernel, so no
+    policy blocks.) Use ``"unbounded"`` only for rare events, as a slow
+    consumer of a busy one holds every event in memory.
+    ``dropped`` counts the discarded events. As with :class:`AwaitableFuture`,
+    consume the stream from a background task rather than the cell that
+    created it.
+    """
+
+    def __init__(self, maxsize=1, policy="latest", on_close=None):
+        if policy not in EVENT_POLICIES:
+            raise ValueError(f"policy must be one of {EVENT_POLICIES}.")
+        if maxsize < 1:
+            raise ValueError("maxsize must be at least 1.")
+        self.maxsize = maxsize
+        self.policy = policy
+        self.dropped = 0
+        self.closed = False
+        self._events = collections.deque()
+        self._waiters = []
+        self._on_close = on_close
+
+    def push(self, *args):
+        """Queue an event; several callback arguments are queued as a tuple."""
+        if self.closed:
+            return
+        if len(self._events) >= self.maxsize:
+            if self.policy == "latest":
+                self.dropped += len(self._events)
+                self._events.clear()
+            elif self.policy == "drop_oldest":
+                self.dropped += 1
+                self._events.popleft()
+        self._events.append(args[0] if len(args) == 1 else args)
+        self._wake()
+
+    def close(self):
+        """Stop the stream; waiting consumers finish after the queued events."""
+        if self.closed:
+            return
+        self.closed = True
+        if self._on_close is not None:
+            self._on_close()
+        self._wake()
+
+    def _wake(self):
+        for waiter in self._waiters:
+            if not waiter.done():
+                waiter.set_result(None)
+        self._waiters.clear()
+
+    def __aiter__(self):
+        """Return the stream itself."""
+        return self
+
+    async def __anext__(self):
+        """Return the next event, waiting for one if none is queued."""
+        while not self._events:
+            if self.closed:
+                raise StopAsyncIteration
+            waiter = asyncio.get_running_loop().create_future()
+            self._waiters.append(waiter)
+            await waiter
+        return self._events.popleft()
+
+    async def __aenter__(self):
+        """Return the stream, to be closed when the block exits."""
+        return self
+
+    async def __aexit__(self, *exc_info):
+        """Close the stream."""
+        self.close()
+
+
+# Bytes of preceding data each block is primed with in write_gzip
+_DEFLATE_WINDOW = 1 << 15
+
+
+def _deflate_block(block: bytes, level: int, window: bytes) -> bytes:
+    """Compress a block as raw deflate that continues the previous block."""
+    if window:
+        compressor = zlib.compressobj(level, zlib.DEFLATED, -15, zdict=window)
+    else:
+        compressor = zlib.compressobj(level, zlib.DEFLATED, -15)
+    return compressor.compress(block) + compressor.flush(zlib.Z_SYNC_FLUSH)
+
+
+def write_gzip(
+    f: typing.BinaryIO, blocks, level: int = 6, threads: typing.Optional[int] = None
+):
+    """
+    Write ``blocks`` to ``f`` as one gzip member, compressing them in parallel.
+
+    Each block is deflated on its own, primed with the end of the block
+    before it and ended with a sync flush, so the pieces join into a single
+    deflate stream (the approach of ``pigz``). ``zlib`` releases the GIL
+    while compressing, and at most ``2 * threads`` blocks are held at a time.
+    ``threads`` defaults to the number of CPUs.
+    """
+    threads = threads or os.cpu_count() or 1
+    f.write(b"\x1f\x8b\x08\x00\x00\x00\x00\x00\x00\xff")
+    crc = 0
+    size = 0
+    window = b""
+    pending = collections.deque()
+    with concurrent.futures.ThreadPoolExecutor(threads) as pool:
+        for block in blocks:
+            crc = zlib.crc32(block, crc)
+            size += len(block)
+            pending.append(pool.submit(_deflate_block, block, level, window))
+            window = block[-_DEFLATE_WINDOW:]
+            if len(pending) >= 2 * threads:
+                f.write(pending.popleft().result())
+        while pending:
+            f.write(pending.popleft().result())
+    f.write(zlib.compressobj(level, zlib.DEFLATED, -15).flush())
+    f.write(struct.pack("<II", crc, size & 0xFFFFFFFF))
+
+
+@contextlib.contextmanager
+def atomic_write(path: typing.Union[str, os.PathLike]):
+    """
+    Open a temporary file that replaces ``path`` once it is fully written.
+
+    The file is created in the same directory as ``path`` and moved into
+    place with ``os.replace`` when the block exits normally. If the block
+    raises, it is deleted, so ``path`` is left as it was rather than
+    truncated. A replaced file keeps its permissions; a new one gets those
+    ``open()`` would give it.
+    """
+    path = os.fspath(path)
+    directory, name = os.path.split(path)
+    while True:
+        tmp = os.path.join(directory, f".{name}.{os.urandom(4).hex()}.tmp")
+        try:
+            # mode 0o666 is narrowed by the umask, as with open()
+            flags = os.O_WRONLY | os.O_CREAT | os.O_EXCL | getattr(os, "O_BINARY", 0)
+            fd = os.open(tmp, flags, 0o666)
+            break
+        except FileExistsError:
+            continue
+    try:
+        with os.fdopen(fd, "wb") as f:
+            with contextlib.suppress(FileNotFoundError):
+                os.chmod(tmp, stat.S_IMODE(os.stat(path).st_mode))
+            yield f
+        os.replace(tmp, path)
+    except BaseException:
+        with contextlib.suppress(OSError):
+            os.unlink(tmp)
+        raise
+
+
 def clamp(value: float, min_value: int, max_value: int) -> int:
     """
     Clamp the integer part of a value between a minimum and maximum value.
@@ -163,49 +420,541 @@ def is_negative_zero(x):
     return x == 0.0 and math.copysign(1.0, x) == -1.0
 
 
+FINGERPRINT_SAMPLES = 4096
+
+
+def img_fingerprint(img: np.ndarray) -> dict:
+    """
+    Compute a cheap fingerprint of a voxel array.
+
+    The frontend computes the same fingerprint (``lib.imgFingerprint``) on the
+    voxels it decoded, so it can skip sending them back when the kernel already
+    holds identical data. Only a strided sample of the array is read.
+
+    Parameters
+    ----------
+    img : np.ndarray
+        The voxel array.
+
+    Returns
+    -------
+    dict
+        The dtype name, the number of elements and a checksum of the sample.
+    """
+    flat = img.reshape(-1)
+    n = flat.size
+    step = max(1, n // FINGERPRINT_SAMPLES)
+    sample = np.ascontiguousarray(
+        flat[::step][:FINGERPRINT_SAMPLES], dtype=img.dtype.newbyteorder("<")
+    ).view(np.uint8)
+    weights = np.arange(1, sample.size + 1, dtype=np.uint64)
+    checksum = int((sample.astype(np.uint64) * weights).sum() % (1 << 32))
+    return {"type": img.dtype.name, "length": int(n), "checksum": checksum}
+
+
+def as_little_endian(arr: np.ndarray) -> np.ndarray:
+    """
+    Return an array in little-endian byte order, as the frontend expects.
+
+    Parameters
+    ----------
+    arr : np.ndarray
+        The array, e.g. a memory-mapped big-endian image.
+
+    Returns
+    -------
+    np.ndarray
+        ``arr`` itself if it is already little-endian, otherwise a converted
+        copy.
+    """
+    dtype = arr.dtype.newbyteorder("<")
+    if arr.dtype == dtype:
+        return arr
+    return arr.astype(dtype)
+
+
+def encode_array_update(old: np.ndarray, new: np.ndarray) -> typing.Optional[tuple]:
+    """
+    Choose the smallest encoding of the change from ``old`` to ``new``.
+
+    Three encodings are considered, by their size on the wire:
+
+    * ``"full"``: the whole new buffer (``buffer_change``).
+    * ``"sparse"``: uint32 indices plus the changed values (``buffer_update``).
+    * ``"ranges"``: uint32 ``(start, length)`` pairs for each run of changed
+      elements plus their values (``buffer_ranges``).
+
+    Parameters
+    ----------
+    old : np.ndarray
+        The array the frontend currently holds.
+    new : np.ndarray
+        The new array.
+
+    Returns
+    -------
+    tuple of (str, dict, list) or None
+        The message type, the extra message data (including ``encoding`` and
+        ``bytes_saved`` relative to sending the full buffer) and the buffers.
+        None if nothing changed.
+    """
+    new_array = as_little_endian(new.ravel())
+    itemsize = new_array.dtype.itemsize
+    full_bytes = new_array.size * itemsize
+
+    def full():
+        data = {"encoding": "full", "bytes_saved": 0}
+        return "buffer_change", data, [new_array.tobytes()]
+
+    if old.dtype.name != new.dtype.name or old.size != new.size:
+        return full()
+
+    diff_indices = np.flatnonzero(new_array != old.ravel())
+    n_changed = diff_indices.size
+    if n_changed == 0:
+        return None
+
+    # Runs of consecutive changed indices
+    breaks = np.flatnonzero(np.diff(diff_indices) != 1) + 1
+    starts = diff_indices[np.concatenate(([0], breaks))]
+    ends = diff_indices[np.concatenate((breaks - 1, [n_changed - 1]))] + 1
+
+    sparse_bytes = n_changed * (4 + itemsize)
+    ranges_bytes = starts.size * 8 + n_changed * itemsize
+
+    if full_bytes <= min(sparse_bytes, ranges_bytes):
+        return full()
+
+    values_bytes = new_array[diff_indices].tobytes()
+    if ranges_bytes < sparse_bytes:
+        ranges = np.column_stack((starts, ends - starts)).astype(np.uint32)
+        data = {
+            "encoding": "ranges",
+            "bytes_saved": full_bytes - ranges_bytes,
+            "ranges_type": "uint32",
+        }
+        return "buffer_ranges", data, [ranges.tobytes(), values_bytes]
+
+    data = {
+        "encoding": "sparse",
+        "bytes_saved": full_bytes - sparse_bytes,
+        "indices_type": "uint32",
+    }
+    return (
+        "buffer_update",
+        data,
+        [diff_indices.astype(np.uint32).tobytes(), values_bytes],
+    )
+
+
+TRANSPORT_DTYPES = ("float32", "float16", "uint8", "int16")
+
+
+def narrow_array(array: np.ndarray, dtype: str) -> tuple:
+    """
+    Convert a floating-point array to a narrower dtype for transfer.
+
+    Parameters
+    ----------
+    array : np.ndarray
+        The array. Integer arrays, and arrays no wider than a float ``dtype``,
+        are returned unchanged.
+    dtype : str
+        One of ``TRANSPORT_DTYPES``. ``"float32"`` and ``"float16"`` cast the
+        values; ``"uint8"`` and ``"int16"`` quantize them linearly over the
+        range of finite values.
+
+    Returns
+    -------
+    tuple of (np.ndarray, tuple or None, float)
+        The narrowed array, the ``(scl_slope, scl_inter)`` that map quantized
+        values back (``value = q * scl_slope + scl_inter``) or None, and the
+        largest absolute error over finite values (inf if a value overflows
+        float16).
+    """
+    if dtype not in TRANSPORT_DTYPES:
+        raise ValueError(f"Unsupported transport dtype: {dtype}")
+    dtype = np.dtype(dtype)
+    if not np.issubdtype(array.dtype, np.floating) or (
+        dtype.kind == "f" and array.dtype.itemsize <= dtype.itemsize
+    ):
+        return array, None, 0.0
+
+    finite = np.isfinite(array)
+    if dtype.kind == "f":
+        wire = array.astype(dtype)
+        errors = np.abs(wire.astype(array.dtype) - array)[finite]
+        return wire, None, float(errors.max()) if errors.size else 0.0
+
+    info = np.iinfo(dtype)
+    values = array[finite]
+    lo, hi = (float(values.min()), float(values.max())) if values.size else (0, 0)
+    slope = (hi - lo) / (info.max - info.min) if hi > lo else 1.0
+    inter = lo - info.min * slope
+    clean = np.nan_to_num(array, nan=lo, posinf=hi, neginf=lo)
+    wire = np.clip(np.rint((clean - inter) / slope), info.min, info.max)
+    wire = wire.astype(dtype)
+    errors = np.abs(wire * slope + inter - array)[finite]
+    return wire, (slope, inter), float(errors.max()) if errors.size else 0.0
+
+
+class FileCache:
+    """
+    Least-recently-used cache of file contents, keyed by path, mtime and size.
+
+    Files of at least ``mmap_threshold`` bytes are not read at all: they are
+    returned as a read-only ``memoryview`` of a memory map, so the operating
+    system pages them in as they are sent to the frontend and keeps them in
+    its own page cache between reads.
+
+    Parameters
+    ----------
+    max_bytes : int, optional
+        Total size of the cached (smaller) files. Default is 512 MiB.
+    mmap_threshold : int or None, optional
+        Size from which files are memory-mapped instead of read. None always
+        reads files. Default is 32 MiB.
+    """
+
+    def __init__(self, max_bytes=512 * 2**20, mmap_threshold=32 * 2**20):
+        self.max_bytes = max_bytes
+        self.mmap_threshold = mmap_threshold
+        self.hits = 0
+        self.misses = 0
+        self._entries = collections.OrderedDict()
+        self._size = 0
+
+    def read(self, path) -> typing.Union[bytes, memoryview]:
+        """
+        Return the contents of a file, from the cache if it hasn't changed.
+
+        Parameters
+        ----------
+        path : str or pathlib.Path
+            The file to read.
+
+        Returns
+        -------
+        bytes or memoryview
+            The file contents. A memoryview of a memory map for large files.
+        """
+        path = pathlib.Path(path).resolve()
+        stat = path.stat()
+        # (empty files can't be mapped)
+        if self.mmap_threshold is not None and stat.st_size >= max(
+            self.mmap_threshold, 1
+        ):
+            with open(path, "rb") as f:
+                mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            return memoryview(mapped)
+
+        key = (str(path), stat.st_mtime_ns, stat.st_size)
+        data = self._entries.get(key)
+        if data is not None:
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return data
+
+        self.misses += 1
+        data = path.read_bytes()
+        # Outdated versions of the same file can never be hit again
+        for stale in [k for k in self._entries if k[0] == key[0]]:
+            self._size -= len(self._entries.pop(stale))
+        if len(data) > self.max_bytes:
+            return data
+
+        self._entries[key] = data
+        self._size += len(data)
+        while self._size > self.max_bytes:
+            _, evicted = self._entries.popitem(last=False)
+            self._size -= len(evicted)
+        return data
+
+    def clear(self):
+        """Drop all cached files."""
+        self._entries.clear()
+        self._size = 0
+
+
+# Shared by every widget, so re-serializing a path doesn't re-read the file
+file_cache = FileCache()
+
+
+class BlobStore:
+    """
+    Kernel-wide, content-addressed store of the payloads widgets send.
+
+    ``path`` and ``data`` traits are serialized as the hash of their contents
+    (``{"blob": key}``) instead of the bytes. The frontend keeps the blobs it
+    has received in a page-wide cache and only asks the kernel (with a
+    ``blob_request`` message) for the ones it doesn't have, so a file shown
+    in many widgets is transferred once.
+
+    Arrays decoded from a source (e.g. ``Volume.img``) are also shared, keyed
+    by the source's hash, so identical sources hold a single read-only copy.
+    Shared values are held weakly and disappear with the last widget using
+    them.
+    """
+
+    def __init__(self):
+        self._blobs = {}
+        self._file_hashes = {}
+        self._shared = weakref.WeakValueDictionary()
+        self.bytes_referenced = 0
+        self.bytes_sent = 0
+        self.values_shared = 0
+        self.memory_saved = 0
+
+    @staticmethod
+    def hash_bytes(data) -> str:
+        """Return the content hash of a bytes-like object."""
+        return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+    def hash_file(self, path) -> str:
+        """Return the content hash of a file, memoized by path, mtime and size."""
+        path = pathlib.Path(path).resolve()
+        stat = path.stat()
+        version = (stat.st_mtime_ns, stat.st_size)
+        # One entry per path, so rewriting a file replaces its old hash
+        memo = self._file_hashes.get(str(path))
+        if memo is not None and memo[0] == version:
+            return memo[1]
+        key = self.hash_bytes(file_cache.read(path))
+        self._file_hashes[str(path)] = (version, key)
+        return key
+
+    def add_file(self, path, owner) -> str:
+        """Register a file used by a widget and return its blob key."""
+        key = self.hash_file(path)
+        entry = self._add(key, owner, pathlib.Path(path).stat().st_size)
+        entry["path"] = pathlib.Path(path).resolve()
+        return key
+
+    def add_bytes(self, data, owner) -> str:
+        """Register bytes used by a widget and return their blob key."""
+        key = self.hash_bytes(data)
+        entry = self._add(key, owner, len(data))
+        entry.setdefault("data", data)
+        return key
+
+    def _add(self, key, owner, size):
+        entry = self._blobs.setdefault(key, {"size": size, "owners": set()})
+        if id(owner) not in entry["owners"]:
+            entry["owners"].add(id(owner))
+            weakref.finalize(owner, self._release, key, id(owner))
+            self.bytes_referenced += size
+        return entry
+
+    def _release(self, key, owner_id):
+        entry = self._blobs.get(key)
+        if entry is None:
+            return
+        entry["owners"].discard(owner_id)
+        if not entry["owners"]:
+            del self._blobs[key]
+
+    def get(self, key) -> typing.Union[bytes, memoryview, None]:
+        """
+        Return the contents of a blob, or None if it is unknown or changed.
+
+        Parameters
+        ----------
+        key : str
+            The blob key.
+
+        Returns
+        -------
+        bytes, memoryview or None
+            The contents.
+        """
+        entry = self._blobs.get(key)
+        if entry is None:
+            return None
+        if "data" in entry:
+            return entry["data"]
+        try:
+            if self.hash_file(entry["path"]) != key:
+                return None
+            return file_cache.read(entry["path"])
+        except OSError:
+            return None
+
+    def share(self, key, value):
+        """
+        Return the value already shared under ``key``, or share ``value``.
+
+        Parameters
+        ----------
+        key : str
+            The key, usually derived from a blob key.
+        value : object
+            A weak-referenceable value, e.g. a read-only np.ndarray.
+
+        Returns
+        -------
+        object
+            The shared value.
+        """
+        shared = self._shared.get(key)
+        if shared is None:
+            self._shared[key] = value
+            return value
+        if shared is not value:
+            self.values_shared += 1
+            self.memory_saved += getattr(value, "nbytes", 0)
+        return shared
+
+    def shared(self, key):
+        """Return the value shared under ``key``, or None."""
+        shared = self._shared.get(key)
+        if shared is not None:
+            self.values_shared += 1
+            self.memory_saved += getattr(shared, "nbytes", 0)
+        return shared
+
+    def stats(self) -> dict:
+        """
+        Report how much the store has saved.
+
+        Returns
+        -------
+        dict
+            ``blobs`` and ``blob_bytes`` currently referenced by widgets,
+            ``bytes_referenced`` (what would have been sent without the store),
+            ``bytes_sent``, ``bandwidth_saved``, ``values_shared`` and
+            ``memory_saved`` by sharing decoded arrays.
+        """
+        return {
+            "blobs": len(self._blobs),
+            "blob_bytes": sum(entry["size"] for entry in self._blobs.values()),
+            "bytes_referenced": self.bytes_referenced,
+            "bytes_sent": self.bytes_sent,
+            "bandwidth_saved": self.bytes_referenced - self.bytes_sent,
+            "values_shared": self.values_shared,
+            "memory_saved": self.memory_saved,
+        }
+
+
+blob_store = BlobStore()
+
+
 class ChunkedDataHandler:
-    """For incoming chunked data."""
+    """
+    For incoming chunked data.
+
+    The output buffer is allocated once from ``total_size`` and each chunk is
+    copied straight into its slot, so an upload costs a single copy.
+    """
 
-    def __init__(self, total_chunks, data_type):
+    dtype_map: typing.ClassVar[dict] = {
+        "float32": np.float32,
+        "uint32": np.uint32,
+        "uint8": np.uint8,
+        "int16": np.int16,
+        "int32": np.int32,
+        "float64": np.float64,
+        "uint16": np.uint16,
+    }
+
+    def __init__(
+        self,
+        total_chunks,
+        data_type,
+        total_size,
+        chunk_size,
+        compression=None,
+        raw_size=None,
+    ):
+        if data_type not in self.dtype_map:
+            raise ValueError(f"Unsupported data type: {data_type}")
+        if compression not in (None, "deflate"):
+            raise ValueError(f"Unsupported compression: {compression}")
         self.total_chunks = total_chunks
-        self.chunks = {}
         self.data_type = data_type
+        self.chunk_size = chunk_size
+        self.compression = compression
+        self.raw_size = raw_size
+        self.buffer = np.empty(total_size, dtype=np.uint8)
+        self.received = set()
+        self.last_update = time.monotonic()
 
     def add_chunk(self, chunk_index, chunk_data):
-        """Add chunk."""
-        self.chunks[chunk_index] = chunk_data
+        """Copy a chunk (any bytes-like object) into its slot."""
+        chunk = np.frombuffer(chunk_data, dtype=np.uint8)
+        start = chunk_index * self.chunk_size
+        end = start + chunk.size
+        if end > self.buffer.size:
+            raise ValueError(
+                f"Chunk {chunk_index} overruns the {self.buffer.size}-byte buffer."
+            )
+        self.buffer[start:end] = chunk
+        self.received.add(chunk_index)
+        self.last_update = time.monotonic()
 
     def is_complete(self):
         """Is complete check."""
-        return len(self.chunks) == self.total_chunks
+        return len(self.received) == self.total_chunks
 
-    def get_data(self):
-        """Get full data bytes."""
-        data = b"".join(self.chunks[i] for i in range(self.total_chunks))
-        return data
+    def is_stale(self, timeout):
+        """Check whether no chunk has arrived for ``timeout`` seconds."""
+        return time.monotonic() - self.last_update > timeout
 
     def get_numpy_array(self):
-        """Convert the assembled data into a NumPy array based on data type."""
-        data = self.get_data()
-
-        dtype_map = {
-            "float32": np.float32,
-            "uint32": np.uint32,
-            "uint8": np.uint8,
-            "int16": np.int16,
-            "int32": np.int32,
-            "float64": np.float64,
-            "uint16": np.uint16,
-        }
+        """View the assembled data as a NumPy array based on data type."""
+        np_dtype = self.dtype_map[self.data_type]
+        if self.compression == "deflate":
+            data = zlib.decompress(self.buffer, bufsize=self.raw_size or 0)
+            return np.frombuffer(data, dtype=np_dtype)
+
+        numpy_array = self.buffer.view(np_dtype)
+        numpy_array.flags.writeable = False
+        return numpy_array
 
-        if self.data_type not in dtype_map:
-            raise ValueError(f"Unsupported data type: {self.data_type}")
 
-        np_dtype = dtype_map[self.data_type]
+class ChunkedUpload:
+    """
+    For outgoing chunked data.
 
-        numpy_array = np.frombuffer(data, dtype=np_dtype)
+    Chunks are zero-copy slices of the data. At most ``window`` chunks are
+    sent ahead of the frontend's acknowledgements, so a large upload never
+    builds one huge message or floods the websocket.
+    """
 
-        return numpy_array
+    def __init__(self, data, chunk_size, window):
+        self.data = memoryview(data).cast("B")
+        self.chunk_size = chunk_size
+        self.window = window
+        self.total_chunks = max(1, -(-len(self.data) // chunk_size))
+        self.next_chunk = 0
+        self.acked = set()
+        self.last_update = time.monotonic()
+
+    def chunk(self, chunk_index):
+        """Return a chunk's bytes as a memoryview."""
+        start = chunk_index * self.chunk_size
+        return self.data[start : start + self.chunk_size]
+
+    def sendable(self):
+        """Return the indices of the chunks the window allows to send now."""
+        in_flight = self.next_chunk - len(self.acked)
+        count = min(self.window - in_flight, self.total_chunks - self.next_chunk)
+        indices = range(self.next_chunk, self.next_chunk + max(0, count))
+        self.next_chunk = indices.stop
+        return indices
+
+    def ack(self, chunk_index):
+        """Record that the frontend has received a chunk."""
+        if 0 <= chunk_index < self.next_chunk:
+            self.acked.add(chunk_index)
+        self.last_update = time.monotonic()
+
+    def is_complete(self):
+        """Check whether every chunk has been acknowledged."""
+        return len(self.acked) == self.total_chunks
+
+    def is_stale(self, timeout):
+        """Check whether no acknowledgement has arrived for ``timeout`` seconds."""
+        return time.monotonic() - self.last_update > timeout
 
 
 def find_otsu(volume, mlevel=2):
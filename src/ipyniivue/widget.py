@@ -6,14 +6,20 @@ contains many of the classes needed to make NiiVue instances work, such as class
 to load objects in, change attributes of this instance, and more.
 """
 
+import asyncio
 import base64
+import collections
+import contextlib
 import glob
+import io
 import json
 import math
 import pathlib
+import time
 import typing
 import uuid
 import warnings
+import zlib
 from urllib.parse import urlparse
 
 import anywidget
@@ -23,11 +29,31 @@ import requests
 import traitlets as t
 from ipywidgets import CallbackDispatcher
 
-from .config_options import ConfigOptions
+from .config_options import CAMEL_TO_SNAKE, ConfigOptions
 from .constants import (
     ColormapType,
     SliceType,
 )
+from .document import (
+    IMAGE_OPTIONS_TO_SNAKE,
+    SCENE_DATA_TO_SNAKE,
+    SNAKE_TO_SCENE_DATA,
+    Base64Blob,
+    decode_blob,
+    read_document,
+    write_document,
+)
+from .nifti import (
+    NIFTI_INTENT_LABEL,
+    downsample,
+    encode_nifti,
+    from_ras,
+    is_nifti_name,
+    iter_nifti,
+    read_nifti,
+    to_ras,
+    write_nifti,
+)
 from .serializers import (
     deserialize_colormap_label,
     deserialize_graph,
@@ -37,6 +63,8 @@ from .serializers import (
     deserialize_volume_object_3d_data,
     parse_scene,
     parse_uidata,
+    serialize_array_blob,
+    serialize_blob,
     serialize_colormap_label,
     serialize_enum,
     serialize_file,
@@ -50,6 +78,8 @@ from .serializers import (
 )
 from .traits import (
     LUT,
+    SNAKE_TO_CAMEL_SCENE,
+    SNAKE_TO_CAMEL_UIDATA,
     ColorMap,
     Graph,
     NIFTI1Hdr,
@@ -58,10 +88,21 @@ from .traits import (
     VolumeObject3DData,
 )
 from .utils import (
+    TRANSPORT_DTYPES,
+    AwaitableFuture,
     ChunkedDataHandler,
+    ChunkedUpload,
+    EventStream,
+    as_little_endian,
+    blob_store,
+    encode_array_update,
+    expire_after,
+    gather_futures,
+    img_fingerprint,
     lerp,
     make_draw_lut,
     make_label_lut,
+    narrow_array,
     requires_canvas,
     sph2cart_deg,
 )
@@ -70,16 +111,105 @@ __all__ = ["NiiVue"]
 
 
 class BaseAnyWidget(anywidget.AnyWidget):
-    """Base widget class that overrides set_state to handle chunked data."""
-
-    _data_handlers: typing.ClassVar[dict] = {}
-    _event_handlers: typing.ClassVar[dict] = {}
+    """
+    Base widget class that overrides set_state to handle chunked data.
+
+    Binary transfers can be deflate-compressed by setting ``compression``, a
+    dict mapping a message type (``"buffer_change"``, ``"buffer_update"``,
+    ``"buffer_ranges"`` and ``"blob"`` chunks from Python, ``"chunk"`` for
+    uploads from the frontend) to the minimum payload size in bytes worth
+    compressing. Types
+    that are missing or None are never compressed, and a payload is only
+    sent compressed if that makes it smaller. The initial value is a copy of
+    the class attribute ``default_compression``, e.g.::
+
+        Volume.default_compression = {"buffer_change": 1 << 16, "chunk": 1 << 16}
+
+    Arrays can also be narrowed before they are sent, with ``transport``, a
+    dict mapping a binary trait to one of ``utils.TRANSPORT_DTYPES``:
+    floating-point values are cast to ``"float32"`` or ``"float16"``, or
+    quantized to ``"uint8"`` or ``"int16"`` with a computed ``scl_slope`` and
+    ``scl_inter``. The largest absolute error of the last transfer of each
+    trait is kept in ``transport_errors``. The initial value is a copy of
+    ``default_transport``, e.g.::
+
+        Volume.default_transport = {"img": "float32"}
+
+    Rapid changes to synced traits can be throttled with ``throttle``, a dict
+    mapping a trait name (or ``"*"`` for every trait) to the maximum number of
+    updates per second sent for it. Changes made sooner are held back and
+    only the latest value is sent once the interval has passed, so the final
+    value always arrives; the number of values that were never sent is kept
+    per trait in ``throttle_dropped``. The initial value is a copy of
+    ``default_throttle``, e.g.::
+
+        NiiVue.default_throttle = {"scene": 30}
+    """
 
     _binary_trait_to_js_names: typing.ClassVar[dict] = {}
 
+    # Seconds without a new chunk (or ack) before a partial transfer is released
+    _chunk_timeout: typing.ClassVar[float] = 60.0
+
+    # Blobs are sent to the frontend in chunks of this many bytes, with at
+    # most _blob_window chunks awaiting acknowledgement at a time
+    _blob_chunk_size: typing.ClassVar[int] = 4 * 1024 * 1024
+    _blob_window: typing.ClassVar[int] = 4
+
+    # Requests to the frontend (e.g. Volume.fetch_region, NiiVue.rpc) awaiting
+    # a reply at a time, and the default seconds before they time out
+    max_concurrent_requests: typing.ClassVar[int] = 4
+    request_timeout: typing.ClassVar[typing.Optional[float]] = None
+
+    default_compression: typing.ClassVar[dict] = {}
+    default_transport: typing.ClassVar[dict] = {}
+    default_throttle: typing.ClassVar[dict] = {}
+
+    # Custom messages that must follow the state of a throttled trait
+    _throttle_followups: typing.ClassVar[dict] = {}
+
+    compression = t.Dict(value_trait=t.Int(allow_none=True)).tag(sync=True)
+    # Codecs the frontend can decode, reported once the object is created there
+    _codecs = t.List(t.Unicode()).tag(sync=True)
+
+    transport = t.Dict(value_trait=t.Enum(TRANSPORT_DTYPES, allow_none=True))
+
+    throttle = t.Dict(value_trait=t.Float(allow_none=True))
+
+    # The NiiVue.batch collecting this widget's updates, if any
+    _batch = None
+    # Set once a NiiVue frontend reports the volume or mesh loaded
+    _frontend_loaded = False
+
+    @t.default("compression")
+    def _default_compression(self):
+        return dict(self.default_compression)
+
+    @t.default("transport")
+    def _default_transport(self):
+        return dict(self.default_transport)
+
+    @t.default("throttle")
+    def _default_throttle(self):
+        return dict(self.default_throttle)
+
     def __init__(self, *args, **kwargs):
-        super().__init__(*args, **kwargs)
+        # When each throttled trait was last sent, and those held back since
+        self._throttle_sent = {}
+        self._throttle_pending = set()
+        self._throttle_timer = None
+        self.throttle_dropped = {}
+        # Partial chunked transfers and event callbacks, per widget
+        self._data_handlers = {}
         self._event_handlers = {}
+        super().__init__(*args, **kwargs)
+        self._blob_uploads = {}
+        self._pending_requests = {}
+        self._queued_requests = collections.deque()
+        self._stale_check = None
+        # The narrowed arrays last sent, per trait, to diff the next ones against
+        self._transported = {}
+        self.transport_errors = {}
         self._setup_binary_change_handlers()
 
     def set_state(self, state):
@@ -93,30 +223,42 @@ class BaseAnyWidget(anywidget.AnyWidget):
                 data_property = base[6:]
                 chunk_index = int(chunk_index)
                 chunk_info = attr_value
+                transfer_key = (data_property, chunk_info["transfer_id"])
                 chunk_index_received = chunk_info["chunk_index"]
                 total_chunks = chunk_info["total_chunks"]
                 data_type = chunk_info["data_type"]
                 chunk_data = chunk_info["chunk"]
 
-                if isinstance(chunk_data, memoryview):
-                    chunk_data = chunk_data.tobytes()
-                elif isinstance(chunk_data, str):
+                if isinstance(chunk_data, str):
                     chunk_data = base64.b64decode(chunk_data)
-                else:
+                elif not isinstance(chunk_data, (memoryview, bytes)):
                     raise ValueError(f"Unsupported chunk data type: {type(chunk_data)}")
 
-                if data_property not in self._data_handlers:
-                    self._data_handlers[data_property] = ChunkedDataHandler(
-                        total_chunks, data_type
+                self._release_stale_transfers()
+
+                if transfer_key not in self._data_handlers:
+                    self._data_handlers[transfer_key] = ChunkedDataHandler(
+                        total_chunks,
+                        data_type,
+                        chunk_info["total_size"],
+                        chunk_info["chunk_size"],
+                        compression=chunk_info["compression"],
+                        raw_size=chunk_info["raw_size"],
                     )
+                    self._schedule_stale_check()
 
-                handler = self._data_handlers[data_property]
+                handler = self._data_handlers[transfer_key]
                 handler.add_chunk(chunk_index_received, chunk_data)
 
                 if handler.is_complete():
+                    del self._data_handlers[transfer_key]
                     numpy_array = handler.get_numpy_array()
+                    key = self._source_key()
+                    if key is not None:
+                        numpy_array = blob_store.share(
+                            f"{key}:{data_property}", numpy_array
+                        )
                     self.set_trait(data_property, numpy_array)
-                    del self._data_handlers[data_property]
 
                 keys_to_remove.append(attr_name)
 
@@ -125,6 +267,257 @@ class BaseAnyWidget(anywidget.AnyWidget):
 
         super().set_state(state_copy)
 
+    def _source_key(self):
+        """
+        Identify the source the frontend decodes arrays from, if any.
+
+        Arrays uploaded from the same source are shared through ``blob_store``.
+        """
+        return None
+
+    def _request(self, msg_type, data, parse_reply, buffers=None, timeout=None):
+        """
+        Send a custom message that the frontend answers with a ``reply`` event.
+
+        ``parse_reply(data, buffers)`` turns the reply into the future's result.
+        At most ``max_concurrent_requests`` requests await a reply at a time;
+        later ones are sent in order as earlier ones finish. The future fails
+        with ``TimeoutError`` after ``timeout`` seconds (by default
+        ``request_timeout``), and cancelling it or timing out frees its slot.
+        """
+        request_id = uuid.uuid4().hex
+        future = AwaitableFuture()
+        message = {"type": msg_type, "data": {"request_id": request_id, **data}}
+        self._queued_requests.append(
+            (request_id, future, parse_reply, message, buffers)
+        )
+        future.add_done_callback(lambda _: self._request_done(request_id))
+        self._send_queued_requests()
+        if timeout is None:
+            timeout = self.request_timeout
+        return expire_after(future, timeout)
+
+    def _send_queued_requests(self):
+        queue = self._queued_requests
+        while queue and len(self._pending_requests) < self.max_concurrent_requests:
+            request_id, future, parse_reply, message, buffers = queue.popleft()
+            if future.done():
+                continue
+            self._pending_requests[request_id] = (future, parse_reply)
+            self.send(message, buffers)
+
+    def _request_done(self, request_id):
+        if self._pending_requests.pop(request_id, None) is None:
+            # Cancelled or timed out before it was sent
+            self._queued_requests = collections.deque(
+                request for request in self._queued_requests if request[0] != request_id
+            )
+        self._send_queued_requests()
+
+    def _handle_custom_msg(self, content, buffers):
+        event = content.get("event")
+        if event == "reply":
+            self._handle_reply(content, buffers)
+            return
+        if event == "blob_request":
+            self._send_blob(content.get("data", {}).get("hash"))
+            return
+        if event == "blob_ack":
+            data = content.get("data", {})
+            self._ack_blob_chunk(data.get("hash"), data.get("chunk_index"))
+            return
+        super()._handle_custom_msg(content, buffers)
+
+    def send_state(self, key=None):
+        """Send the widget state, or defer it while a batch is open."""
+        if self._batch is not None:
+            self._batch.add_state(self, key)
+            return
+        if self.throttle and key is not None:
+            key = self._throttle_keys(key)
+            if not key:
+                return
+        super().send_state(key)
+
+    def _throttle_keys(self, key):
+        """Return the keys that may be sent now, holding back the others."""
+        keys = [key] if isinstance(key, str) else list(key)
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            # Nothing could send held-back values later
+            return keys
+
+        now = time.monotonic()
+        ready = []
+        for name in keys:
+            if name in self._throttle_pending:
+                self._throttle_pending.discard(name)
+                self.throttle_dropped[name] = self.throttle_dropped.get(name, 0) + 1
+            interval = self._throttle_interval(name)
+            if interval and now - self._throttle_sent.get(name, -math.inf) < interval:
+                self._throttle_pending.add(name)
+                continue
+            if interval:
+                self._throttle_sent[name] = now
+            ready.append(name)
+
+        if self._throttle_pending:
+            self._schedule_throttle_flush()
+        return ready
+
+    def _throttle_interval(self, name):
+        rate = self.throttle.get(name, self.throttle.get("*"))
+        return 1.0 / rate if rate and rate > 0 else None
+
+    def _schedule_throttle_flush(self):
+        """Send the latest held-back values once their interval has passed."""
+        if self._throttle_timer is not None:
+            return
+        loop = asyncio.get_running_loop()
+        due = min(
+            self._throttle_sent[name] + (self._throttle_interval(name) or 0)
+            for name in self._throttle_pending
+        )
+
+        def flush():
+            self._throttle_timer = None
+            keys = sorted(self._throttle_pending)
+            self._throttle_pending.clear()
+            self.send_state(keys)
+            followups = []
+            for name in keys:
+                msg = self._throttle_followups.get(name)
+                if (
+                    msg is not None
+                    and name not in self._throttle_pending
+                    and msg not in followups
+                ):
+                    followups.append(msg)
+            for msg in followups:
+                self.send(msg)
+
+        self._throttle_timer = loop.call_later(max(0.0, due - time.monotonic()), flush)
+
+    def send(self, content, buffers=None):
+        """Send a custom message, or defer it while a batch is open."""
+        if self._batch is not None:
+            self._batch.add_message(self, content, buffers)
+            return
+        super().send(content, buffers)
+
+    def _send_blob(self, key):
+        """Start sending the contents of a blob the frontend doesn't have yet."""
+        blob = blob_store.get(key)
+        if blob is None:
+            self.send({"type": "blob_chunk", "data": {"hash": key, "error": "unknown"}})
+            return
+        self._release_stale_transfers()
+        self._blob_uploads[key] = ChunkedUpload(
+            blob, self._blob_chunk_size, self._blob_window
+        )
+        self._schedule_stale_check()
+        self._send_blob_chunks(key)
+
+    def _send_blob_chunks(self, key):
+        """Send as many chunks of a blob as the upload window allows."""
+        upload = self._blob_uploads[key]
+        for chunk_index in upload.sendable():
+            buffers, compression = self._compress_buffers(
+                "blob", [upload.chunk(chunk_index)]
+            )
+            blob_store.bytes_sent += len(buffers[0])
+            self.send(
+                {
+                    "type": "blob_chunk",
+                    "data": {
+                        "hash": key,
+                        "chunk_index": chunk_index,
+                        "total_chunks": upload.total_chunks,
+                        "total_size": len(upload.data),
+                        "chunk_size": upload.chunk_size,
+                        "compression": compression,
+                    },
+                },
+                buffers=buffers,
+            )
+
+    def _ack_blob_chunk(self, key, chunk_index):
+        upload = self._blob_uploads.get(key)
+        if upload is None:
+            return
+        upload.ack(chunk_index)
+        if upload.is_complete():
+            del self._blob_uploads[key]
+        else:
+            self._send_blob_chunks(key)
+
+    def _handle_reply(self, content, buffers):
+        data = content.get("data", {})
+        pending = self._pending_requests.pop(data.get("request_id"), None)
+        if pending is None:
+            return
+
+        future, parse_reply = pending
+        if data.get("error"):
+            future.set_exception(RuntimeError(data["error"]))
+            return
+        try:
+            future.set_result(parse_reply(data, buffers))
+        except Exception as e:
+            future.set_exception(e)
+
+    def _release_stale_transfers(self):
+        """Drop partial transfers that have not progressed in a while."""
+        for transfers in (self._data_handlers, self._blob_uploads):
+            stale = [
+                key
+                for key, transfer in transfers.items()
+                if transfer.is_stale(self._chunk_timeout)
+            ]
+            for key in stale:
+                del transfers[key]
+                if transfers is self._blob_uploads:
+                    # the frontend would otherwise wait for it forever
+                    self.send(
+                        {
+                            "type": "blob_chunk",
+                            "data": {"hash": key, "error": "timed out"},
+                        }
+                    )
+
+    def _schedule_stale_check(self):
+        """Release stale transfers even if no further chunks ever arrive."""
+        if self._stale_check is not None:
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return
+
+        def check():
+            self._stale_check = None
+            self._release_stale_transfers()
+            if self._data_handlers or self._blob_uploads:
+                self._schedule_stale_check()
+
+        self._stale_check = loop.call_later(self._chunk_timeout, check)
+
+    def _compress_buffers(self, msg_type, buffers):
+        """Deflate outgoing buffers if negotiated for msg_type and smaller."""
+        threshold = self.compression.get(msg_type)
+        if threshold is None or "deflate" not in self._codecs:
+            return buffers, None
+
+        raw_size = sum(len(b) for b in buffers)
+        if raw_size < threshold:
+            return buffers, None
+
+        compressed = [zlib.compress(b, 1) for b in buffers]
+        if sum(len(b) for b in compressed) >= raw_size:
+            return buffers, None
+        return compressed, "deflate"
+
     def _setup_binary_change_handlers(self):
         for trait_name in self._get_binary_traits():
             self.observe(self._handle_binary_trait_change, names=trait_name)
@@ -140,44 +533,246 @@ class BaseAnyWidget(anywidget.AnyWidget):
         trait_name = self._get_js_name(change["name"])
         old_value = change["old"]
         new_value = change["new"]
-        if old_value is not None:
-            if old_value.dtype != new_value.dtype:
-                self.send(
-                    {
-                        "type": "buffer_change",
-                        "data": {"attr": trait_name, "type": str(new_value.dtype)},
-                    },
-                    buffers=[new_value.tobytes()],
-                )
-            else:
-                old_array = old_value.ravel()
-                new_array = new_value.ravel()
+        # old_value is a traitlets sentinel if a dynamic default was never read
+        if isinstance(old_value, np.ndarray) and new_value is not None:
+            if not self._send_binary_update(trait_name, old_value, new_value):
+                return
+
+        handler = self._event_handlers.get(f"{trait_name}_changed")
+        if handler:
+            handler(self)
+
+    def _transport_array(self, trait_name, array):
+        """Narrow an array as set in ``transport``; return it and message data."""
+        dtype = self.transport.get(trait_name)
+        if dtype is None:
+            return array, {}
+        wire, scaling, max_error = narrow_array(array, dtype)
+        self.transport_errors[trait_name] = max_error
+        data = {"max_error": max_error}
+        if scaling is not None:
+            data["scl_slope"], data["scl_inter"] = scaling
+        return wire, data
+
+    def _send_binary_update(self, trait_name, old_value, new_value):
+        """Send a binary trait change to the frontend; False if nothing changed."""
+        new_value, transport_data = self._transport_array(trait_name, new_value)
+        if transport_data:
+            scaling = (
+                transport_data.get("scl_slope"),
+                transport_data.get("scl_inter"),
+            )
+            old_wire, old_scaling = self._transported.get(trait_name, (None, None))
+            self._transported[trait_name] = (new_value, scaling)
+            # The frontend holds the full-width or differently scaled values
+            # until a first narrowed transfer, which must send everything
+            if old_wire is None or old_scaling != scaling:
+                old_wire = new_value[:0]
+            old_value = old_wire
+        else:
+            self._transported.pop(trait_name, None)
+
+        encoded = encode_array_update(old_value, new_value)
+        if encoded is None:
+            return False
+
+        msg_type, data, buffers = encoded
+        data.update(transport_data)
+        raw_size = sum(len(b) for b in buffers)
+        buffers, compression = self._compress_buffers(msg_type, buffers)
+        if compression:
+            data["compression"] = compression
+            data["bytes_saved"] += raw_size - sum(len(b) for b in buffers)
+        self.send(
+            {
+                "type": msg_type,
+                "data": {
+                    "attr": trait_name,
+                    "type": new_value.dtype.name,
+                    **data,
+                },
+            },
+            buffers=buffers,
+        )
+        return True
+
+
+def _region_bounds(axis, n):
+    """Normalize a slice, (start, stop) tuple or index to bounds within n."""
+    if isinstance(axis, (int, np.integer)):
+        index = int(axis) + n if axis < 0 else int(axis)
+        if not 0 <= index < n:
+            raise IndexError(f"index {axis} is out of range for size {n}.")
+        return index, index + 1
+    if isinstance(axis, tuple):
+        axis = slice(*axis)
+    start, stop, step = axis.indices(n)
+    if step != 1:
+        raise ValueError("fetch_region does not support slice steps.")
+    return start, max(start, stop)
+
+
+def _blob_source_key(path, url, data):
+    """Return the blob store key of a widget's path, url or data source."""
+    if path is not None:
+        return blob_store.hash_file(path)
+    if data is not None:
+        return blob_store.hash_bytes(data)
+    if url is not None:
+        return f"url:{url}"
+    return None
+
+
+def _lut_label(lut, value):
+    """Return the label of an integer value in a colormap label, if any."""
+    if lut is None or not lut.labels:
+        return None
+    index = value - int(lut.min or 0)
+    if 0 <= index < len(lut.labels):
+        return lut.labels[index]
+    return None
+
+
+def _traits_ready(widget, names, ready=None):
+    """
+    Return a future resolving to ``widget`` once the traits ``names`` are ready.
+
+    A trait is ready once ``ready(value)`` is true, by default once it is not
+    None.
+    """
+    future = AwaitableFuture()
+    if ready is None:
+
+        def ready(value):
+            return value is not None
+
+    def check(change=None):
+        if future.done():
+            widget.unobserve(check, names=names)
+        elif all(ready(widget._trait_values.get(name)) for name in names):
+            widget.unobserve(check, names=names)
+            future.set_result(widget)
+
+    widget.observe(check, names=names)
+    check()
+    return future
+
+
+def _split_buffers(state):
+    """
+    Move the binary values out of a widget state, to send them as buffers.
+
+    Returns the state with each binary value replaced by None, the path of
+    each value (dict keys and list indices) and the values.
+    """
+    paths = []
+    buffers = []
+
+    def split(value, path):
+        if isinstance(value, (bytes, bytearray, memoryview)):
+            paths.append(path)
+            buffers.append(value)
+            return None
+        if isinstance(value, dict):
+            return {key: split(item, [*path, key]) for key, item in value.items()}
+        if isinstance(value, (list, tuple)):
+            return [split(item, [*path, i]) for i, item in enumerate(value)]
+        return value
 
-                diff_indices = np.flatnonzero(new_array != old_array)
+    return split(state, []), paths, buffers
 
-                if len(diff_indices) == 0:
-                    return
 
-                diff_values = new_array[diff_indices]
+class _UpdateBatch:
+    """
+    Trait changes and custom messages deferred by :meth:`NiiVue.batch`.
+
+    Changes to the same widget's traits are merged until a custom message is
+    deferred after them, so the frontend sees the updates in the order they
+    were made. Redraw requests from the NiiVue widget are collapsed into one.
+    """
 
-                indices_bytes = diff_indices.astype(np.uint32).tobytes()
-                values_bytes = diff_values.tobytes()
+    _redraws = ("update_gl_volume", "draw_scene")
+
+    def __init__(self, owner):
+        self.owner = owner
+        self.widgets = []
+        self.ops = []
+        self.redraw = None
+        # Pending state updates that later trait changes can still merge into
+        self._open = {}
+
+    def enroll(self, widget):
+        if widget._batch is None:
+            widget._batch = self
+            self.widgets.append(widget)
+
+    def release(self):
+        for widget in self.widgets:
+            widget._batch = None
+
+    def add_state(self, widget, key):
+        if key is None:
+            keys = widget.keys
+        elif isinstance(key, str):
+            keys = [key]
+        else:
+            keys = key
+        op = self._open.get(id(widget))
+        if op is None:
+            op = {"widget": widget, "keys": set()}
+            self.ops.append(op)
+            self._open[id(widget)] = op
+        op["keys"].update(keys)
+
+    def add_message(self, widget, content, buffers):
+        msg_type = content.get("type")
+        if widget is self.owner and msg_type in self._redraws:
+            if self.redraw is None or msg_type == "update_gl_volume":
+                self.redraw = msg_type
+            return
+        self._open.clear()
+        self.ops.append(
+            {"widget": widget, "content": content, "buffers": list(buffers or [])}
+        )
 
-                self.send(
+    def envelope(self):
+        """Return the ``batch`` message data and buffers, or None if empty."""
+        ops = []
+        buffers = []
+        for op in self.ops:
+            widget = op["widget"]
+            if widget.comm is None:
+                continue
+            if "content" in op:
+                ops.append(
                     {
-                        "type": "buffer_update",
-                        "data": {
-                            "attr": trait_name,
-                            "type": str(new_value.dtype),
-                            "indices_type": "uint32",
-                        },
-                    },
-                    buffers=[indices_bytes, values_bytes],
+                        "model_id": widget.model_id,
+                        "content": op["content"],
+                        "buffers": len(op["buffers"]),
+                    }
                 )
-
-        handler = self._event_handlers.get(f"{trait_name}_changed")
-        if handler:
-            handler(self)
+                buffers.extend(op["buffers"])
+                continue
+            state = widget.get_state(key=sorted(op["keys"]))
+            if not state:
+                continue
+            if widget._property_lock:
+                for name, value in state.items():
+                    if name in widget._property_lock:
+                        widget._property_lock[name] = value
+            state, buffer_paths, state_buffers = _split_buffers(state)
+            ops.append(
+                {
+                    "model_id": widget.model_id,
+                    "state": state,
+                    "buffer_paths": buffer_paths,
+                    "buffers": len(state_buffers),
+                }
+            )
+            buffers.extend(state_buffers)
+        if not ops and self.redraw is None:
+            return None
+        return {"ops": ops, "redraw": self.redraw}, buffers
 
 
 class MeshLayer(BaseAnyWidget):
@@ -221,7 +816,9 @@ class MeshLayer(BaseAnyWidget):
         [t.Instance(pathlib.Path), t.Unicode()], default_value=None, allow_none=True
     ).tag(sync=True, to_json=serialize_file)
     url = t.Unicode(default_value=None, allow_none=True).tag(sync=True)
-    data = t.Bytes(default_value=None, allow_none=True).tag(sync=True)
+    data = t.Bytes(default_value=None, allow_none=True).tag(
+        sync=True, to_json=serialize_blob
+    )
 
     id = t.Unicode(default_value="").tag(sync=True)
     name = t.Unicode(default_value="").tag(sync=True)
@@ -338,13 +935,31 @@ class Mesh(BaseAnyWidget):
     layers : list of dict or MeshLayer objects, optional
         List of layer data dictionaries or MeshLayer objects.
         See :class:`MeshLayer` for attribute options.
+    pts : np.ndarray, optional
+        Vertex coordinates, of shape ``(n, 3)`` or flat. Together with
+        ``tris``, builds the mesh from arrays instead of a file. Assigning
+        ``pts`` later deforms the mesh in place.
+    tris : np.ndarray, optional
+        Vertex indices of the triangles, of shape ``(m, 3)`` or flat.
+
+    Examples
+    --------
+    ::
+
+        from skimage.measure import marching_cubes
+
+        verts, faces, _, _ = marching_cubes(mask, 0.5)
+        mesh = Mesh(pts=verts, tris=faces, name="surface")
+        nv.add_mesh(mesh)
     """
 
     path = t.Union(
         [t.Instance(pathlib.Path), t.Unicode()], default_value=None, allow_none=True
     ).tag(sync=True, to_json=serialize_file)
     url = t.Unicode(default_value=None, allow_none=True).tag(sync=True)
-    data = t.Bytes(default_value=None, allow_none=True).tag(sync=True)
+    data = t.Bytes(default_value=None, allow_none=True).tag(
+        sync=True, to_json=serialize_blob
+    )
 
     id = t.Unicode(default_value="").tag(sync=True)
     name = t.Unicode(default_value="").tag(sync=True)
@@ -372,9 +987,13 @@ class Mesh(BaseAnyWidget):
     fiber_decimation_stride = t.Int(1).tag(sync=True)
     colormap = t.Unicode(None, allow_none=True).tag(sync=True)
 
-    # Set after bidirectional comms with frontend
-    pts = t.Instance(np.ndarray, allow_none=True).tag(sync=True)
-    tris = t.Instance(np.ndarray, allow_none=True).tag(sync=True)
+    # Given to build the mesh from arrays, or set after comms with frontend
+    pts = t.Instance(np.ndarray, allow_none=True).tag(
+        sync=True, to_json=serialize_array_blob
+    )
+    tris = t.Instance(np.ndarray, allow_none=True).tag(
+        sync=True, to_json=serialize_array_blob
+    )
     extents_min = t.List(t.Float()).tag(sync=True)
     extents_max = t.List(t.Float()).tag(sync=True)
 
@@ -388,6 +1007,8 @@ class Mesh(BaseAnyWidget):
             "rgba255",
             "opacity",
             "visible",
+            "pts",
+            "tris",
         }
         layers_data = kwargs.pop("layers", [])
 
@@ -402,18 +1023,30 @@ class Mesh(BaseAnyWidget):
         filtered_kwargs = {k: v for k, v in kwargs.items() if k in include_keys}
         super().__init__(**filtered_kwargs)
 
-        # Validate that one and only one of path, url, data is provided
+        # Validate that one and only one of path, url, data or arrays is provided
         if not self.id:
             provided = [
                 k for k in ("path", "url", "data") if getattr(self, k) is not None
             ]
-            if len(provided) != 1:
-                raise ValueError("Must provide only one of 'path', 'url', or 'data'.")
+            arrays = [k for k in ("pts", "tris") if k in filtered_kwargs]
+            if arrays:
+                if provided or len(arrays) != 2:
+                    raise ValueError(
+                        "Must provide both 'pts' and 'tris', "
+                        "and none of 'path', 'url', or 'data'."
+                    )
+            elif len(provided) != 1:
+                raise ValueError(
+                    "Must provide only one of 'path', 'url', 'data', "
+                    "or 'pts' and 'tris'."
+                )
 
         # Set name if not provided
         # (here we assume that if ID is provided it's already been "loaded" somewhere)
         if not self.name and not self.id:
-            if self.path:
+            if self.pts is not None:
+                self.name = "mesh"
+            elif self.path:
                 self.name = pathlib.Path(self.path).name
             elif self.url:
                 self.name = pathlib.Path(urlparse(self.url).path).name
@@ -437,17 +1070,47 @@ class Mesh(BaseAnyWidget):
 
     def get_state(self, key=None, drop_defaults=False):
         """Exclude certain attributes from state on save."""
-        state = super().get_state(key=key, drop_defaults=drop_defaults)
-        if self.path or self.url or self.data:
-            if "pts" in state:
-                del state["pts"]
-            if "tris" in state:
-                del state["tris"]
-        return state
+        if self.path or self.url or self.data or key is not None:
+            # pts and tris only build array meshes; changes are sent as
+            # binary updates (_handle_binary_trait_change)
+            if key is None:
+                keys = self.keys
+            elif isinstance(key, str):
+                keys = [key]
+            else:
+                keys = key
+            key = [k for k in keys if k not in ("pts", "tris")]
+        return super().get_state(key=key, drop_defaults=drop_defaults)
+
+    @t.validate("pts")
+    def _validate_pts(self, proposal):
+        if proposal["value"] is None:
+            return None
+        return np.ascontiguousarray(proposal["value"], dtype=np.float32).reshape(-1)
+
+    @t.validate("tris")
+    def _validate_tris(self, proposal):
+        if proposal["value"] is None:
+            return None
+        return np.ascontiguousarray(proposal["value"], dtype=np.uint32).reshape(-1)
 
     def _get_binary_traits(self):
         return ["pts", "tris"]
 
+    @t.validate("transport")
+    def _validate_transport(self, proposal):
+        for trait_name, dtype in proposal["value"].items():
+            if dtype in ("uint8", "int16"):
+                raise t.TraitError(
+                    f"Mesh {trait_name} can only be narrowed to float32 or float16."
+                )
+        return proposal["value"]
+
+    def _source_key(self):
+        if self.layers:
+            return None
+        return _blob_source_key(self.path, self.url, self.data)
+
     @t.validate(
         "path",
         "url",
@@ -511,19 +1174,48 @@ class Volume(BaseAnyWidget):
         Colormap label data.
     colormap_type : :class:`ColormapType`, optional
         Colormap type used for the volume. Default is ``ColormapType.MIN_TO_MAX``.
+    memmap : bool, optional
+        If True and ``path`` is an uncompressed ``.nii`` file, ``img`` is a
+        copy-on-write ``np.memmap`` of the voxels in the file, so they are only
+        read from disk when accessed. Default is False.
+    lazy_img : bool, optional
+        If True, the frontend doesn't send the decoded voxels to Python when
+        the volume loads. ``img`` stays None until it is requested with
+        :meth:`fetch_img`, which also waits for it. Default is
+        ``Volume.default_lazy_img`` (False).
+    progressive : bool, optional
+        If True and the source is decoded in Python, mean-pooled copies
+        downsampled by each of ``Volume.pyramid_factors`` are sent first, so
+        a preview renders while finer levels (and finally the source) load
+        and replace it. Default is False.
+    frame_window : int, optional
+        Stream a 4D series decoded in Python frame by frame: the frontend
+        shows one frame at a time and holds at most ``frame_window`` frames,
+        fetching the frame selected by ``frame_4d`` and prefetching its
+        neighbours on demand. Combine with ``memmap=True`` so the kernel
+        only reads the frames it serves. Default is None (the whole series
+        is loaded).
     """
 
+    default_lazy_img: typing.ClassVar[bool] = False
+    # Downsampling factors of the progressive-loading levels, coarsest first
+    pyramid_factors: typing.ClassVar[tuple] = (4, 2)
+
     # Input-only traits (not accessible after initialization)
     path = t.Union(
         [t.Instance(pathlib.Path), t.Unicode()], default_value=None, allow_none=True
     ).tag(sync=True, to_json=serialize_file)
     url = t.Unicode(default_value=None, allow_none=True).tag(sync=True)
-    data = t.Bytes(default_value=None, allow_none=True).tag(sync=True)
+    data = t.Bytes(default_value=None, allow_none=True).tag(
+        sync=True, to_json=serialize_blob
+    )
     paired_img_path = t.Union(
         [t.Instance(pathlib.Path), t.Unicode()], default_value=None, allow_none=True
     ).tag(sync=True, to_json=serialize_file)
     paired_img_url = t.Unicode(default_value=None, allow_none=True).tag(sync=True)
-    paired_img_data = t.Bytes(default_value=None, allow_none=True).tag(sync=True)
+    paired_img_data = t.Bytes(default_value=None, allow_none=True).tag(
+        sync=True, to_json=serialize_blob
+    )
 
     # Main traits
     id = t.Unicode(default_value="").tag(sync=True)
@@ -573,7 +1265,35 @@ class Volume(BaseAnyWidget):
         sync=True, to_json=serialize_to_none, from_json=deserialize_mat4
     )
 
+    # Fingerprint of img when it was decoded in the kernel, so the frontend
+    # can skip sending back voxels the kernel already holds.
+    _img_fingerprint = t.Dict(default_value=None, allow_none=True).tag(sync=True)
+
+    # Set when frames are streamed: the frame count, the frontend window
+    # and the blob of the single-frame image the frontend starts from
+    _frame_stream = t.Dict(default_value=None, allow_none=True).tag(sync=True)
+
+    # Blobs of the progressive-loading levels, coarsest first
+    _pyramid = t.List(t.Dict()).tag(sync=True)
+
+    lazy_img = t.Bool().tag(sync=True)
+    # Set while waiting for the frontend to send img
+    _img_requested = t.Bool(False).tag(sync=True)
+
+    @t.default("lazy_img")
+    def _default_lazy_img(self):
+        return self.default_lazy_img
+
     def __init__(self, **kwargs):
+        memmap = kwargs.pop("memmap", False)
+        progressive = kwargs.pop("progressive", False)
+        frame_window = kwargs.pop("frame_window", None)
+        self._img_futures = []
+        self._pyramid_levels = {}
+        self._frame_cache = collections.OrderedDict()
+        # (hdr, inverse affine) for kernel-side voxel lookups
+        self._lookup_affine = None
+
         include_keys = {
             "path",
             "url",
@@ -594,6 +1314,7 @@ class Volume(BaseAnyWidget):
             "colormap_negative",
             "colormap_label",
             "colormap_type",
+            "lazy_img",
         }
 
         unknown_keys = set(kwargs.keys()) - include_keys
@@ -643,17 +1364,313 @@ class Volume(BaseAnyWidget):
         if not self.id:
             self.id = str(uuid.uuid4()) + "_py"
 
+        self._read_nifti_source(memmap=memmap)
+        if frame_window:
+            self._start_frame_stream(frame_window)
+        elif progressive:
+            self._build_pyramid()
+
+    def _source_key(self):
+        if self.paired_img_path or self.paired_img_url or self.paired_img_data:
+            return None
+        return _blob_source_key(self.path, self.url, self.data)
+
+    def _read_nifti_source(self, memmap=False):
+        """Decode local NIfTI sources so hdr and img exist before display."""
+        key = None if memmap else self._source_key()
+        if key is not None:
+            # Reuse what another volume already decoded from the same source
+            img = blob_store.shared(f"{key}:img")
+            if img is not None:
+                hdr = blob_store.shared(f"{key}:hdr")
+                if hdr is not None:
+                    self.hdr = hdr
+                self.img = img
+                self._img_fingerprint = img_fingerprint(img)
+                return
+
+        if self.path is not None and is_nifti_name(str(self.path)):
+            source = self.path
+        elif self.data is not None and is_nifti_name(self.name):
+            source = self.data
+        else:
+            return
+
+        try:
+            hdr, img = read_nifti(source, memmap=memmap)
+        except (OSError, ValueError) as e:
+            warnings.warn(
+                f"Could not decode {self.name} in Python, "
+                f"leaving it to the frontend: {e}",
+                stacklevel=3,
+            )
+            return
+
+        if key is not None:
+            hdr = blob_store.share(f"{key}:hdr", hdr)
+        self.hdr = hdr
+        if img is not None:
+            if key is not None:
+                img = blob_store.share(f"{key}:img", img)
+            self.img = img
+            self._img_fingerprint = img_fingerprint(img)
+
+    def _build_pyramid(self):
+        """Encode the downsampled levels sent before the source."""
+        if self.hdr is None or self.img is None:
+            warnings.warn(
+                f"Cannot load {self.name} progressively: only NIfTI sources "
+                "decoded in Python can be downsampled.",
+                stacklevel=3,
+            )
+            return
+
+        shape = self.hdr.dims[1:4]
+        levels = []
+        for factor in sorted(self.pyramid_factors, reverse=True):
+            if factor < 2 or max(shape) < 2 * factor:
+                continue
+            if factor not in self._pyramid_levels:
+                hdr, img = downsample(self.hdr, self.img, factor)
+                self._pyramid_levels[factor] = encode_nifti(hdr, img)
+            data = self._pyramid_levels[factor]
+            levels.append({"factor": factor, "blob": blob_store.add_bytes(data, self)})
+        self._pyramid = levels
+
+    def _start_frame_stream(self, window):
+        """Set up streaming of a 4D series, starting from frame ``frame_4d``."""
+        if self.hdr is None or self.img is None:
+            warnings.warn(
+                f"Cannot stream the frames of {self.name}: only NIfTI sources "
+                "decoded in Python can be streamed.",
+                stacklevel=3,
+            )
+            return
+        n_frames = self.hdr.dims[4] if self.hdr.dims[0] >= 4 else 1
+        if n_frames <= 1:
+            return
+
+        values = self.hdr.trait_values()
+        values["dims"] = [3, *self.hdr.dims[1:4], 1, 1, 1, 1]
+        first = encode_nifti(NIFTI1Hdr(**values), self._frame(self.frame_4d))
+        self.n_frame_4d = n_frames
+        self._frame_stream = {
+            "n_frames": n_frames,
+            "window": max(1, int(window)),
+            "blob": blob_store.add_bytes(first, self),
+        }
+
+    def _frame(self, index):
+        """Return a frame of the series, through a cache of ``window`` frames."""
+        frame = self._frame_cache.get(index)
+        if frame is not None:
+            self._frame_cache.move_to_end(index)
+            return frame
+
+        n_frames = self.hdr.dims[4] if self.hdr.dims[0] >= 4 else 1
+        if not 0 <= index < n_frames:
+            raise IndexError(f"frame {index} is out of range for {n_frames} frames.")
+        size = self.img.size // n_frames
+        # Copy, so memory-mapped frames are read from disk only once
+        frame = np.array(as_little_endian(self.img[index * size : (index + 1) * size]))
+        self._frame_cache[index] = frame
+        window = (self._frame_stream or {}).get("window", 1)
+        while len(self._frame_cache) > window:
+            self._frame_cache.popitem(last=False)
+        return frame
+
+    def _handle_custom_msg(self, content, buffers):
+        if content.get("event") == "frame_request":
+            self._send_frame(content.get("data", {}).get("index"))
+            return
+        super()._handle_custom_msg(content, buffers)
+
+    def _send_frame(self, index):
+        try:
+            frame = self._frame(index)
+        except (IndexError, TypeError) as e:
+            self.send({"type": "frame", "data": {"index": index, "error": str(e)}})
+            return
+        buffers, compression = self._compress_buffers("frame", [frame.tobytes()])
+        self.send(
+            {
+                "type": "frame",
+                "data": {
+                    "index": index,
+                    "type": frame.dtype.name,
+                    "compression": compression,
+                },
+            },
+            buffers=buffers,
+        )
+
+    def _transport_array(self, trait_name, array):
+        wire, data = super()._transport_array(trait_name, array)
+        if data and trait_name == "img" and self.hdr is not None:
+            # img holds raw values, which the header's scaling still applies to
+            slope = self.hdr.scl_slope or 1.0
+            inter = self.hdr.scl_inter if self.hdr.scl_slope else 0.0
+            data["scl_slope"] = slope * data.get("scl_slope", 1.0)
+            data["scl_inter"] = slope * data.get("scl_inter", 0.0) + inter
+        return wire, data
+
+    def _send_binary_update(self, trait_name, old_value, new_value):
+        if self._frame_stream:
+            # The frontend only holds some frames, so it refetches them
+            self._frame_cache.clear()
+            self.send({"type": "frames_invalidated", "data": {}})
+            return True
+        return super()._send_binary_update(trait_name, old_value, new_value)
+
     def get_state(self, key=None, drop_defaults=False):
         """Exclude certain attributes from state on save."""
-        state = super().get_state(key=key, drop_defaults=drop_defaults)
-        if self.path or self.url or self.data:
-            if "img" in state:
-                del state["img"]
-        return state
+        if self.path or self.url or self.data or self.lazy_img:
+            # img comes from the source, so don't serialize it at all
+            if key is None:
+                keys = self.keys
+            elif isinstance(key, str):
+                keys = [key]
+            else:
+                keys = key
+            key = [k for k in keys if k != "img"]
+        return super().get_state(key=key, drop_defaults=drop_defaults)
 
     def _get_binary_traits(self):
         return ["img"]
 
+    @t.observe("img")
+    def _resolve_img_futures(self, change):
+        if change["new"] is None:
+            return
+        self._img_requested = False
+        futures, self._img_futures = self._img_futures, []
+        for future in futures:
+            if not future.done():
+                future.set_result(change["new"])
+
+    def _lookup_table(self):
+        """
+        Return the img, dims and inverse affine used to look up voxels, or None.
+
+        Only arrays already held by the kernel are used; a lazy ``img`` is not
+        requested.
+        """
+        img = self._trait_values.get("img")
+        hdr = self.hdr
+        if img is None or hdr is None or not hdr.affine:
+            return None
+        if self._lookup_affine is None or self._lookup_affine[0] is not hdr:
+            inverse = np.linalg.inv(np.asarray(hdr.affine, dtype=np.float64))
+            self._lookup_affine = (hdr, inverse)
+        return img, hdr.dims[1:4], self._lookup_affine[1]
+
+    def fetch_region(self, x, y, z, frame=None):
+        """
+        Fetch a box of voxels without transferring the whole image.
+
+        If Python already holds ``img`` the box is sliced locally, otherwise
+        the frontend slices it out of the loaded image and sends back only
+        those voxels.
+
+        Parameters
+        ----------
+        x, y, z : slice, tuple of int or int
+            The voxel range along each axis, as ``slice(start, stop)``, a
+            ``(start, stop)`` tuple or a single index. Negative and ``None``
+            bounds work as in numpy slicing; steps are not supported.
+        frame : int, optional
+            The 4D frame. Defaults to ``frame_4d``.
+
+        Returns
+        -------
+        AwaitableFuture
+            Resolves to an array of shape ``(nx, ny, nz)``. A frontend reply
+            is only processed after the current cell finishes, so await it in
+            a later cell or a background task.
+
+        Raises
+        ------
+        RuntimeError
+            If the volume header is not loaded yet.
+
+        Examples
+        --------
+        ::
+
+            # the 32 x 32 x 1 patch around voxel (100, 120, 60)
+            future = volume.fetch_region((84, 116), (104, 136), 60)
+        """
+        if self.hdr is None:
+            raise RuntimeError("fetch_region needs the volume to be loaded.")
+
+        dims = [max(1, int(d)) for d in self.hdr.dims[1:5]]
+        if frame is None:
+            frame = self.frame_4d
+        if not 0 <= frame < dims[3]:
+            raise IndexError(f"frame {frame} is out of range for {dims[3]} frames.")
+        bounds = [_region_bounds(axis, n) for axis, n in zip((x, y, z), dims[:3])]
+
+        future = AwaitableFuture()
+        img = self._trait_values.get("img")
+        if img is not None and img.size == math.prod(dims):
+            box = img.reshape(dims, order="F")[
+                bounds[0][0] : bounds[0][1],
+                bounds[1][0] : bounds[1][1],
+                bounds[2][0] : bounds[2][1],
+                frame,
+            ]
+            future.set_result(np.array(box))
+            return future
+
+        def parse_reply(data, buffers):
+            shape = [stop - start for start, stop in bounds]
+            region = np.frombuffer(buffers[0], dtype=data["type"])
+            return region.reshape(shape, order="F")
+
+        return self._request(
+            "fetch_region",
+            {
+                "x": list(bounds[0]),
+                "y": list(bounds[1]),
+                "z": list(bounds[2]),
+                "frame": frame,
+            },
+            parse_reply,
+        )
+
+    def fetch_img(self):
+        """
+        Request the voxels from the frontend if Python doesn't have them yet.
+
+        Mostly useful with ``lazy_img``, where ``img`` is only sent on demand.
+
+        Returns
+        -------
+        AwaitableFuture
+            Resolves to ``img`` once the frontend has sent it, or immediately
+            if ``img`` is already set. The reply is only processed after the
+            current cell finishes, so await it in a later cell or a
+            background task.
+
+        Examples
+        --------
+        ::
+
+            future = volume.fetch_img()
+
+            # in a later cell
+            img = await future
+        """
+        future = AwaitableFuture()
+        img = self._trait_values.get("img")
+        if img is not None:
+            future.set_result(img)
+            return future
+
+        self._img_futures.append(future)
+        self._img_requested = True
+        return future
+
     @t.validate(
         "path",
         "url",
@@ -757,46 +1774,139 @@ class Volume(BaseAnyWidget):
         """
         self.send({"type": "save_to_disk", "data": [filename]})
 
-    def convert_frac2mm(self, frac: list, is_force_slice_mm: bool = False) -> list:
+    def _nifti_image(self):
+        """Return the header and voxels to write, held by the kernel."""
+        img = self._trait_values.get("img")
+        if img is None or self.hdr is None:
+            raise RuntimeError(
+                "The volume's img is not available in Python. "
+                "Await volume.fetch_img() first."
+            )
+        return self.hdr, img
+
+    def to_nifti_bytes(
+        self,
+        compresslevel: typing.Optional[int] = None,
+        threads: typing.Optional[int] = None,
+    ) -> bytes:
         """
-        Convert fractional volume coordinates to millimeter space.
+        Encode ``hdr`` and ``img`` as a NIfTI-1 file in Python.
 
         Parameters
         ----------
-        frac : list of float
-            Fractional coordinates [X, Y, Z] in the range [0, 1].
-        is_force_slice_mm : bool, optional
-            If True, use world space coordinates. If False, use orthogonal space.
-            Default is False.
+        compresslevel : int or None, optional
+            The gzip compression level (0-9), or None for an uncompressed
+            ``.nii`` file. Default is None.
+        threads : int or None, optional
+            The number of threads compressing blocks. Default is the number of
+            CPUs.
 
         Returns
         -------
-        list of float
-            Position in millimeters [X, Y, Z, W] where W is always 1.
+        bytes
+            The file contents.
 
         Raises
         ------
         RuntimeError
-            If the volume data is not fully loaded.
+            If Python doesn't hold ``img`` and ``hdr``.
+        ValueError
+            If ``img`` has a datatype or ``hdr`` dimensions NIfTI-1 can't
+            store.
 
         Examples
         --------
         ::
 
-            mm_pos = volume.convert_frac2mm([0.5, 0.5, 0.5])
+            data = volume.to_nifti_bytes(compresslevel=6)
         """
-        if self.frac2mm is None or self.frac2mm_ortho is None:
-            raise RuntimeError(
-                "Volume coordinate transformation matrices are not available. "
-                "Ensure canvas is attached."
-            )
+        buffer = io.BytesIO()
+        write_nifti(buffer, *self._nifti_image(), compresslevel, threads)
+        return buffer.getvalue()
 
-        pos = [frac[0], frac[1], frac[2], 1.0]
+    def save(
+        self,
+        path: typing.Union[str, pathlib.Path],
+        compresslevel: int = 6,
+        threads: typing.Optional[int] = None,
+    ):
+        """
+        Write ``hdr`` and ``img`` to a NIfTI-1 file from the kernel.
 
-        if is_force_slice_mm:
-            matrix = self.frac2mm.T
-        else:
-            matrix = self.frac2mm_ortho.T
+        Unlike :meth:`save_to_disk`, the file is written by Python, so this
+        works without a browser. Files ending in ``.gz`` are gzipped in
+        blocks compressed in parallel, and streamed to disk as they are
+        compressed.
+
+        Parameters
+        ----------
+        path : str or pathlib.Path
+            The file to write, e.g. ``"image.nii.gz"``.
+        compresslevel : int, optional
+            The gzip compression level (0-9) for ``.gz`` files. Default is 6.
+        threads : int or None, optional
+            The number of threads compressing blocks. Default is the number of
+            CPUs.
+
+        Raises
+        ------
+        RuntimeError
+            If Python doesn't hold ``img`` and ``hdr``.
+        ValueError
+            If ``img`` has a datatype or ``hdr`` dimensions NIfTI-1 can't
+            store.
+
+        Examples
+        --------
+        ::
+
+            volume.save("image.nii.gz", compresslevel=9)
+        """
+        gzipped = str(path).endswith(".gz")
+        write_nifti(
+            path, *self._nifti_image(), compresslevel if gzipped else None, threads
+        )
+
+    def convert_frac2mm(self, frac: list, is_force_slice_mm: bool = False) -> list:
+        """
+        Convert fractional volume coordinates to millimeter space.
+
+        Parameters
+        ----------
+        frac : list of float
+            Fractional coordinates [X, Y, Z] in the range [0, 1].
+        is_force_slice_mm : bool, optional
+            If True, use world space coordinates. If False, use orthogonal space.
+            Default is False.
+
+        Returns
+        -------
+        list of float
+            Position in millimeters [X, Y, Z, W] where W is always 1.
+
+        Raises
+        ------
+        RuntimeError
+            If the volume data is not fully loaded.
+
+        Examples
+        --------
+        ::
+
+            mm_pos = volume.convert_frac2mm([0.5, 0.5, 0.5])
+        """
+        if self.frac2mm is None or self.frac2mm_ortho is None:
+            raise RuntimeError(
+                "Volume coordinate transformation matrices are not available. "
+                "Ensure canvas is attached."
+            )
+
+        pos = [frac[0], frac[1], frac[2], 1.0]
+
+        if is_force_slice_mm:
+            matrix = self.frac2mm.T
+        else:
+            matrix = self.frac2mm_ortho.T
 
         result = np.dot(matrix, pos)
         return result.tolist()
@@ -945,6 +2055,12 @@ class NiiVue(BaseAnyWidget):
 
     _binary_trait_to_js_names: typing.ClassVar[dict] = {"draw_bitmap": "drawBitmap"}
 
+    _throttle_followups: typing.ClassVar[dict] = {
+        "opts": {"type": "update_gl_volume", "data": []},
+        "graph": {"type": "update_gl_volume", "data": []},
+        "scene": {"type": "draw_scene", "data": []},
+    }
+
     height = t.Int().tag(sync=True)
     opts = t.Instance(ConfigOptions).tag(
         sync=True, to_json=serialize_options, from_json=deserialize_options
@@ -979,6 +2095,8 @@ class NiiVue(BaseAnyWidget):
         to_json=serialize_graph,
         from_json=deserialize_graph,
     )
+    # scene and ui_data are only updated from the frontend for the fields
+    # subscribed to with subscribe(); see the Scene and UIData notes
     scene = t.Instance(Scene, allow_none=True).tag(
         sync=True,
         to_json=serialize_scene,
@@ -987,9 +2105,18 @@ class NiiVue(BaseAnyWidget):
         sync=True,
         to_json=serialize_uidata,
     )
+    # Scene and ui_data fields the frontend sends back, see subscribe()
+    _subscriptions = t.Dict().tag(sync=True)
     overlay_outline_width = t.Float(0.0).tag(sync=True)  # 0 for none
     overlay_alpha_shader = t.Float(1.0).tag(sync=True)  # 1 for opaque
 
+    hover_lookup = t.Enum(["frontend", "kernel"], default_value="frontend")
+    # What the frontend sends on mouse moves: nothing without a hover
+    # callback, the values under the cursor, or only its position
+    _hover_mode = t.Enum(["off", "frontend", "kernel"], default_value="off").tag(
+        sync=True
+    )
+
     other_nv = t.List(t.Instance(object, allow_none=False), default_value=[]).tag(
         sync=False
     )
@@ -1029,6 +2156,9 @@ class NiiVue(BaseAnyWidget):
             Additional keyword arguments to configure the NiiVue widget.
             See :class:`ipyniivue.config_options.ConfigOptions` for all options.
         """
+        # Fields subscribed to with subscribe(), mapped to their rate
+        self._subscribed = {}
+
         # Get options
         opts = ConfigOptions(parent=self, **options)
         super().__init__(height=height, opts=opts, volumes=[], meshes=[])
@@ -1052,6 +2182,9 @@ class NiiVue(BaseAnyWidget):
             "crosshair": False,
         }
 
+        # Futures waiting for load events, by (event, object id)
+        self._load_waiters = {}
+
         # Handle messages coming from frontend
         self.on_msg(self._handle_custom_msg)
 
@@ -1081,13 +2214,56 @@ class NiiVue(BaseAnyWidget):
                 "type": "change",
             }
         )
-        self.send({"type": "update_gl_volume", "data": []})
+        if "opts" not in self._throttle_pending:
+            self.send({"type": "update_gl_volume", "data": []})
 
         if change:
             handler = self._event_handlers.get("opts_change")
             if handler:
                 handler(change["name"], change["new"], change["old"])
 
+    @contextlib.contextmanager
+    def batch(self):
+        """
+        Send the updates made inside the block as one message.
+
+        Trait changes on this widget and on the volumes, meshes and mesh layers
+        it holds when the block starts are merged, and custom messages are
+        queued, until the block exits. They are then sent together and applied
+        by the frontend with a single redraw; repeated ``update_gl_volume`` and
+        ``draw_scene`` requests are dropped. Nested blocks join the outer one.
+
+        Examples
+        --------
+        ::
+
+            with nv.batch():
+                for vol in nv.volumes[1:]:
+                    vol.cal_min = 2
+                    vol.cal_max = 5
+                    vol.opacity = 0.5
+                nv.opts.show_3d_crosshair = True
+        """
+        if self._batch is not None:
+            yield
+            return
+        batch = _UpdateBatch(self)
+        batch.enroll(self)
+        for volume in self.volumes:
+            batch.enroll(volume)
+        for mesh in self.meshes:
+            batch.enroll(mesh)
+            for layer in mesh.layers:
+                batch.enroll(layer)
+        try:
+            yield
+        finally:
+            batch.release()
+            envelope = batch.envelope()
+            if envelope is not None:
+                data, buffers = envelope
+                self.send({"type": "batch", "data": data}, buffers=buffers)
+
     def _notify_graph_changed(self):
         self.notify_change(
             {
@@ -1098,7 +2274,8 @@ class NiiVue(BaseAnyWidget):
                 "type": "change",
             }
         )
-        self.send({"type": "update_gl_volume", "data": []})
+        if "graph" not in self._throttle_pending:
+            self.send({"type": "update_gl_volume", "data": []})
 
     def _notify_scene_changed(self):
         self.notify_change(
@@ -1110,7 +2287,8 @@ class NiiVue(BaseAnyWidget):
                 "type": "change",
             }
         )
-        self.send({"type": "draw_scene", "data": []})
+        if "scene" not in self._throttle_pending:
+            self.send({"type": "draw_scene", "data": []})
 
     def _notify_ui_data_changed(self):
         self.notify_change(
@@ -1133,6 +2311,10 @@ class NiiVue(BaseAnyWidget):
         event = content.get("event", "")
         data = content.get("data", {})
 
+        if event == "reply":
+            super()._handle_custom_msg(content, buffers)
+            return
+
         # handle add_volume and add_mesh events separately
         if event == "add_volume":
             self._add_volume_from_frontend(data)
@@ -1141,6 +2323,13 @@ class NiiVue(BaseAnyWidget):
             self._add_mesh_from_frontend(data)
             return
 
+        if event == "image_loaded":
+            self._object_loaded(self.volumes, event, data["id"])
+        elif event == "mesh_loaded":
+            self._object_loaded(self.meshes, event, data["id"])
+        elif event == "document_loaded":
+            self._resolve_waiters(event, None, data)
+
         # check if the event has a registered handler
         handler = self._event_handlers.get(event)
         if not handler:
@@ -1176,13 +2365,19 @@ class NiiVue(BaseAnyWidget):
                     ):
                         volume.set_trait(key, value)
 
-                # only fire loaded event once certain traits are defined
-                if volume.img is not None and volume.hdr is not None:
+                # only fire loaded event once certain traits are defined;
+                # a lazy img is not waited for, nor requested
+                def is_ready():
+                    return volume.hdr is not None and (
+                        volume.lazy_img or volume._trait_values.get("img") is not None
+                    )
+
+                if is_ready():
                     handler(volume)
                 else:
 
                     def check_ready(change):
-                        if volume.img is not None and volume.hdr is not None:
+                        if is_ready():
                             volume.unobserve(check_ready, names=["img", "hdr"])
                             handler(volume)
 
@@ -1216,6 +2411,8 @@ class NiiVue(BaseAnyWidget):
                     mesh.observe(check_ready, names=["pts", "tris"])
             else:
                 handler(data)
+        elif event == "hover_idx_change" and "mm" in data:
+            handler(self._lookup_hover(data["mm"]))
         elif event == "mesh_added_from_url":
             mesh_options = {"url": data["url"], "headers": data["headers"]}
             handler(mesh_options, data["mesh"])
@@ -1225,6 +2422,84 @@ class NiiVue(BaseAnyWidget):
         else:
             handler(data)
 
+    def _lookup_hover(self, mm):
+        """Resolve the voxel under ``mm`` in every volume held by the kernel."""
+        tables = [volume._lookup_table() for volume in self.volumes]
+        held = [i for i, table in enumerate(tables) if table is not None]
+        idx_values = [
+            {"id": volume.id, "idx": None, "value": None, "label": None}
+            for volume in self.volumes
+        ]
+        if held:
+            # Voxel coordinates in all volumes at once
+            inverses = np.stack([tables[i][2] for i in held])
+            point = np.array([mm[0], mm[1], mm[2], 1.0])
+            voxels = np.rint(inverses @ point)[:, :3].astype(np.int64)
+            for i, vox in zip(held, voxels):
+                img, dims, _ = tables[i]
+                volume = self.volumes[i]
+                if not all(0 <= v < d for v, d in zip(vox, dims)):
+                    continue
+                nx, ny, nz = (int(d) for d in dims)
+                index = int(
+                    vox[0] + nx * (vox[1] + ny * (vox[2] + nz * volume.frame_4d))
+                )
+                if index >= img.size:
+                    continue
+                hdr = volume.hdr
+                # a zero slope means the values are not scaled
+                if hdr.scl_slope:
+                    value = float(img[index]) * hdr.scl_slope + hdr.scl_inter
+                else:
+                    value = float(img[index])
+                entry = idx_values[i]
+                entry["value"] = value
+                if value.is_integer():
+                    entry["idx"] = int(value)
+                    entry["label"] = _lut_label(volume.colormap_label, int(value))
+        return {"mm": list(mm[:3]), "idx_values": idx_values}
+
+    @t.observe("hover_lookup")
+    def _update_hover_mode(self, change=None):
+        handler = self._event_handlers.get("hover_idx_change")
+        if handler is None or not handler.callbacks:
+            self._hover_mode = "off"
+        else:
+            self._hover_mode = self.hover_lookup
+
+    def _object_loaded(self, objects, event, object_id):
+        for obj in objects:
+            if obj.id == object_id:
+                obj._frontend_loaded = True
+                self._resolve_waiters(event, object_id, obj)
+
+    def _wait_for_event(self, event, key=None):
+        """Return a future resolved by the next ``event`` for ``key``."""
+        future = AwaitableFuture()
+        self._load_waiters.setdefault((event, key), []).append(future)
+        return future
+
+    def _resolve_waiters(self, event, key, result):
+        for future in self._load_waiters.pop((event, key), []):
+            if not future.done():
+                future.set_result(result)
+
+    def _loaded_futures(self, obj, arrays):
+        """Return futures for an object being loaded and, optionally, synced."""
+        event = "image_loaded" if isinstance(obj, Volume) else "mesh_loaded"
+        if obj._frontend_loaded:
+            futures = []
+        else:
+            futures = [self._wait_for_event(event, obj.id)]
+        if not arrays:
+            return futures
+        if isinstance(obj, Volume):
+            if obj.lazy_img:
+                return [*futures, obj.fetch_img(), _traits_ready(obj, ["hdr"])]
+            # the frontend sends img by itself; requesting it would send it twice
+            return [*futures, _traits_ready(obj, ["img", "hdr"])]
+        return [*futures, _traits_ready(obj, ["pts", "tris"])]
+
     def _handle_image_loaded(self, volume_id):
         handler = self._event_handlers.get("image_loaded")
         if not handler:
@@ -1259,111 +2534,735 @@ class NiiVue(BaseAnyWidget):
         """
         Close the NiiVue widget and free up resources.
 
-        This method disposes of the widget on both the frontend and backend.
-        After calling this method, the widget will no longer be usable.
+        This method disposes of the widget on both the frontend and backend.
+        After calling this method, the widget will no longer be usable.
+
+        Examples
+        --------
+        ::
+
+            nv = NiiVue()
+            # use nv ...
+            nv.close()
+        """
+        super().close()
+
+    def get_volume_index_by_id(self, volume_id: str) -> int:
+        """Return the index of the volume with the given id.
+
+        Parameters
+        ----------
+        volume_id : str
+            The id of the volume.
+        """
+        for idx, vol in enumerate(self.volumes):
+            if vol.id == volume_id:
+                return idx
+        return -1
+
+    def get_mesh_index_by_id(self, mesh_id: str) -> int:
+        """Return the index of the mesh with the given id.
+
+        Parameters
+        ----------
+        mesh_id : str
+            The id of the mesh.
+        """
+        for idx, mesh in enumerate(self.meshes):
+            if mesh.id == mesh_id:
+                return idx
+        return -1
+
+    def load_volumes(self, volumes: list):
+        """
+        Load a list of volume objects.
+
+        Parameters
+        ----------
+        volumes : list
+            A list of dictionaries or Volume objects.
+
+        Returns
+        -------
+        None
+
+        Examples
+        --------
+        ::
+
+            nv = NiiVue()
+            nv.load_volumes([{"path": "mni152.nii.gz"}])
+
+        """
+        volume_objects = []
+        for item in volumes:
+            if isinstance(item, Volume):
+                volume_objects.append(item)
+            elif isinstance(item, dict):
+                volume_objects.append(Volume(**item))
+        self.volumes = volume_objects
+
+    def add_volume(self, volume: typing.Union[dict, Volume]):
+        """
+        Add a new volume to the widget.
+
+        Parameters
+        ----------
+        volume : dict or Volume object
+            The volume information.
+
+        Returns
+        -------
+        None
+
+        Examples
+        --------
+        ::
+
+            nv = NiiVue()
+            nv.add_volume({"path": "mni152.nii.gz"})
+
+        """
+        if isinstance(volume, Volume):
+            new_volume = volume
+        elif isinstance(volume, dict):
+            new_volume = Volume(**volume)
+        else:
+            return
+        self.volumes = [*self.volumes, new_volume]
+
+    def load_meshes(self, meshes: list):
+        """
+        Load a list of meshes objects.
+
+        Parameters
+        ----------
+        meshes : list
+            A list of dictionaries containing the mesh information.
+
+        Returns
+        -------
+        None
+
+        Examples
+        --------
+        ::
+
+            nv = NiiVue()
+            nv.load_meshes([{"path": "BrainMesh_ICBM152.lh.mz3"}])
+
+        """
+        mesh_objects = []
+        for item in meshes:
+            if isinstance(item, Mesh):
+                mesh_objects.append(item)
+            elif isinstance(item, dict):
+                mesh_objects.append(Mesh(**item))
+        self.meshes = mesh_objects
+
+    def add_mesh(self, mesh: typing.Union[dict, Volume]):
+        """
+        Add a single mesh to the widget.
+
+        Parameters
+        ----------
+        mesh : dict
+            A dictionary containing the mesh information.
+
+        Returns
+        -------
+        None
+
+        Examples
+        --------
+        ::
+
+            nv = NiiVue()
+            nv.add_mesh({"path": "BrainMesh_ICBM152.lh.mz3"})
+
+        """
+        if isinstance(mesh, Mesh):
+            new_mesh = mesh
+        elif isinstance(mesh, dict):
+            new_mesh = Mesh(**mesh)
+        else:
+            return
+        self.meshes = [*self.meshes, new_mesh]
+
+    def load_volumes_async(
+        self,
+        volumes: list,
+        arrays: bool = False,
+        timeout: typing.Optional[float] = None,
+    ):
+        """
+        Load a list of volumes, returning a future for when they are loaded.
+
+        The future resolves once the frontend has decoded every volume and,
+        with ``arrays``, once ``img`` and ``hdr`` are available in Python. It
+        fails with ``TimeoutError`` after ``timeout`` seconds, and cancelling it
+        stops waiting. The frontend's messages are only processed after the
+        current cell finishes, so await the future in a later cell or a
+        background task.
+
+        Parameters
+        ----------
+        volumes : list
+            A list of dictionaries or Volume objects, as for
+            :meth:`load_volumes`.
+        arrays : bool, optional
+            Also wait for the arrays to be synced to Python. Default is False.
+            Only volumes with ``lazy_img`` are asked for their voxels; the
+            others send them once loaded.
+        timeout : float or None, optional
+            Seconds to wait before failing. Default is None, no limit.
+
+        Returns
+        -------
+        AwaitableFuture
+            Resolves to the list of loaded :class:`Volume` objects.
+
+        Examples
+        --------
+        ::
+
+            loaded = nv.load_volumes_async([{"path": "mni152.nii.gz"}], arrays=True)
+
+            # in a later cell
+            (volume,) = await loaded
+        """
+        self.load_volumes(volumes)
+        return self._gather_loaded(list(self.volumes), arrays, timeout)
+
+    def add_volume_async(
+        self,
+        volume: typing.Union[dict, Volume],
+        arrays: bool = False,
+        timeout: typing.Optional[float] = None,
+    ):
+        """
+        Add a volume, returning a future for when it is loaded.
+
+        See :meth:`load_volumes_async` for ``arrays`` and ``timeout``.
+
+        Returns
+        -------
+        AwaitableFuture
+            Resolves to the loaded :class:`Volume`.
+        """
+        count = len(self.volumes)
+        self.add_volume(volume)
+        if len(self.volumes) == count:
+            raise TypeError("volume must be a dict or a Volume.")
+        new_volume = self.volumes[-1]
+        return gather_futures(
+            self._loaded_futures(new_volume, arrays), new_volume, timeout
+        )
+
+    def load_meshes_async(
+        self,
+        meshes: list,
+        arrays: bool = False,
+        timeout: typing.Optional[float] = None,
+    ):
+        """
+        Load a list of meshes, returning a future for when they are loaded.
+
+        See :meth:`load_volumes_async`; with ``arrays``, the future also waits
+        for ``pts`` and ``tris`` to be available in Python.
+
+        Returns
+        -------
+        AwaitableFuture
+            Resolves to the list of loaded :class:`Mesh` objects.
+        """
+        self.load_meshes(meshes)
+        return self._gather_loaded(list(self.meshes), arrays, timeout)
+
+    def _gather_loaded(self, objects, arrays, timeout):
+        futures = []
+        for obj in objects:
+            futures.extend(self._loaded_futures(obj, arrays))
+        return gather_futures(futures, objects, timeout)
+
+    def load_document_async(self, path: str, timeout: typing.Optional[float] = None):
+        """
+        Load a document, returning a future for when it is loaded.
+
+        See :meth:`load_document` and :meth:`load_volumes_async`.
+
+        Returns
+        -------
+        AwaitableFuture
+            Resolves to the document data passed to ``on_document_loaded``
+            callbacks.
+        """
+        future = self._wait_for_event("document_loaded")
+        self.load_document(path)
+        return expire_after(future, timeout)
+
+    def canvas_attached_async(self, timeout: typing.Optional[float] = None):
+        """
+        Return a future resolved once the canvas is attached.
+
+        It resolves immediately if the canvas is already attached. See
+        :meth:`load_volumes_async` for ``timeout``.
+
+        Returns
+        -------
+        AwaitableFuture
+            Resolves to this widget.
+        """
+        return expire_after(_traits_ready(self, ["_canvas_attached"], bool), timeout)
+
+    """
+    Other functions
+    """
+
+    def save_document(self, file_name: str = "document.nvd", compress: bool = True):
+        """
+        Save the entire scene with settings as a document.
+
+        Parameters
+        ----------
+        file_name : str
+            The file name to save the document as.
+        compress : bool
+            A value represneing if the file should be compressed.
+
+        Returns
+        -------
+        None
+
+        Examples
+        --------
+        ::
+
+            nv.save_document("mydoc.nvd", False)
+
+        """
+        self.send({"type": "save_document", "data": [file_name, compress]})
+
+    def save_html(self, file_name: str = "untitled.html", canvas_id: str = "gl1"):
+        """
+        Save the current instance as an html page.
+
+        Parameters
+        ----------
+        file_name : str
+            The file name to save the page as.
+        canvas_id : str
+            The id of the canvas that NiiVue will be attached to.
+
+        Returns
+        -------
+        None
+
+        Examples
+        --------
+        ::
+
+            nv.save_html("mypage.html")
+
+        """
+        self.send({"type": "save_html", "data": [file_name, canvas_id]})
+
+    def save_image(
+        self,
+        file_name: str = "image.nii.gz",
+        is_save_drawing: bool = False,
+        volume_by_index: int = 0,
+    ):
+        """
+        Save the current image as a nii file.
+
+        Parameters
+        ----------
+        file_name : str
+            The file name to save the image as.
+        is_save_drawing : bool
+            A value representing if the drawings should be saved.
+        volume_by_index : int
+            The volume layer which should be saved (0 for background)
+
+        Returns
+        -------
+        None
+
+        Examples
+        --------
+        ::
+
+            nv.save_image("myimage.nii.gz", True, 2)
+
+        """
+        self.send(
+            {
+                "type": "save_image",
+                "data": [file_name, is_save_drawing, volume_by_index],
+            }
+        )
+
+    def _drawing_image(self, native=False):
+        """
+        Return the drawing as a label image aligned with the background volume.
+
+        By default the voxels keep the RAS order of ``draw_bitmap``, placed by
+        the background's ``mat_ras``; with ``native``, they are reordered to
+        the background's own voxel order and affine, as NiiVue saves them.
+        """
+        bitmap = self._trait_values.get("draw_bitmap")
+        if bitmap is None or not self.volumes:
+            raise RuntimeError("There is no drawing to save.")
+        back = self.volumes[0]
+        if native and back.hdr is not None and back.hdr.affine:
+            dims = [int(d) for d in back.hdr.dims[1:4]]
+            affine = np.asarray(back.hdr.affine, dtype=np.float64)
+        elif not native and len(back.dims_ras) >= 4 and back.mat_ras is not None:
+            dims = [int(d) for d in back.dims_ras[1:4]]
+            # draw_bitmap is in RAS voxel order, which mat_ras maps to world space
+            affine = np.asarray(back.mat_ras, dtype=np.float64)
+        else:
+            raise RuntimeError(
+                "The background volume's geometry is not available. "
+                "Ensure the canvas is attached."
+            )
+        if bitmap.size != math.prod(dims):
+            raise RuntimeError("The drawing does not match the background volume.")
+
+        spacing = np.linalg.norm(affine[:3, :3], axis=0)
+        hdr = NIFTI1Hdr(
+            dims=[3, *dims, 1, 1, 1, 1],
+            pixDims=[1.0, *spacing.tolist(), 1.0, 1.0, 1.0, 1.0],
+            affine=affine.tolist(),
+            sform_code=max(back.hdr.sform_code, 1) if back.hdr else 1,
+            xyzt_units=back.hdr.xyzt_units if back.hdr else 0,
+            intent_code=NIFTI_INTENT_LABEL,
+            cal_max=float(bitmap.max(initial=0)),
+        )
+        img = from_ras(hdr, bitmap) if native else bitmap
+        return hdr, img.astype(np.uint8, copy=False)
+
+    def drawing_to_nifti_bytes(
+        self,
+        compresslevel: typing.Optional[int] = None,
+        threads: typing.Optional[int] = None,
+    ) -> bytes:
+        """
+        Encode ``draw_bitmap`` as a NIfTI-1 label volume in Python.
+
+        The labels keep the voxel order of ``draw_bitmap`` (RAS, aligned with
+        the background volume), with an affine mapping them to the same world
+        coordinates as the background.
+
+        Parameters
+        ----------
+        compresslevel : int or None, optional
+            The gzip compression level (0-9), or None for an uncompressed
+            ``.nii`` file. Default is None.
+        threads : int or None, optional
+            The number of threads compressing blocks. Default is the number of
+            CPUs.
+
+        Returns
+        -------
+        bytes
+            The file contents.
+
+        Raises
+        ------
+        RuntimeError
+            If there is no drawing, or the background geometry is unknown.
+        """
+        buffer = io.BytesIO()
+        write_nifti(buffer, *self._drawing_image(), compresslevel, threads)
+        return buffer.getvalue()
+
+    def save_drawing(
+        self,
+        path: typing.Union[str, pathlib.Path],
+        compresslevel: int = 6,
+        threads: typing.Optional[int] = None,
+    ):
+        """
+        Write ``draw_bitmap`` to a NIfTI-1 label volume from the kernel.
+
+        See :meth:`drawing_to_nifti_bytes` for the layout and
+        :meth:`Volume.save` for the compression parameters.
+
+        Parameters
+        ----------
+        path : str or pathlib.Path
+            The file to write, gzipped if it ends in ``.gz``.
+        compresslevel : int, optional
+            The gzip compression level (0-9) for ``.gz`` files. Default is 6.
+        threads : int or None, optional
+            The number of threads compressing blocks. Default is the number of
+            CPUs.
+
+        Raises
+        ------
+        RuntimeError
+            If there is no drawing, or the background geometry is unknown.
 
         Examples
         --------
         ::
 
-            nv = NiiVue()
-            # use nv ...
-            nv.close()
+            nv.save_drawing("labels.nii.gz")
         """
-        super().close()
+        gzipped = str(path).endswith(".gz")
+        write_nifti(
+            path, *self._drawing_image(), compresslevel if gzipped else None, threads
+        )
 
-    def get_volume_index_by_id(self, volume_id: str) -> int:
-        """Return the index of the volume with the given id.
+    def _document(self, title: str) -> dict:
+        """Build a NiiVue document from the widget's traits."""
+        image_options = []
+        image_blobs = []
+        for i, volume in enumerate(self.volumes):
+            hdr, img = volume._nifti_image()
+            name = volume.name or f"image{i}"
+            options = {"name": name if is_nifti_name(name) else f"{name}.nii"}
+            for key, trait in IMAGE_OPTIONS_TO_SNAKE.items():
+                value = getattr(volume, trait)
+                if value is not None:
+                    options[key] = value
+            image_options.append(options)
+            image_blobs.append(Base64Blob(iter_nifti(hdr, img)))
+
+        meshes = []
+        for mesh in self.meshes:
+            pts = mesh._trait_values.get("pts")
+            tris = mesh._trait_values.get("tris")
+            if pts is None or tris is None:
+                raise RuntimeError(
+                    f"The points and triangles of mesh {mesh.name!r} are not "
+                    "available in Python."
+                )
+            meshes.append(
+                {
+                    "name": mesh.name,
+                    "pts": pts.ravel().tolist(),
+                    "tris": tris.ravel().tolist(),
+                    "rgba255": list(mesh.rgba255),
+                    "opacity": mesh.opacity,
+                    "visible": mesh.visible,
+                    "layers": [],
+                }
+            )
 
-        Parameters
-        ----------
-        volume_id : str
-            The id of the volume.
+        drawing = ""
+        if self._trait_values.get("draw_bitmap") is not None and self.volumes:
+            drawing = Base64Blob(iter_nifti(*self._drawing_image(native=True)))
+
+        scene_data = {
+            SNAKE_TO_SCENE_DATA[name]: getattr(self.scene, name)
+            for name in SNAKE_TO_SCENE_DATA
+            if getattr(self.scene, name) is not None
+        }
+        return {
+            "title": title,
+            "opts": serialize_options(self.opts, self),
+            "sceneData": scene_data,
+            "imageOptionsArray": image_options,
+            "encodedImageBlobs": image_blobs,
+            "encodedDrawingBlob": drawing,
+            "meshesString": json.dumps(meshes),
+            "labels": [],
+            "customData": "",
+            "previewImageDataURL": "",
+        }
+
+    def to_nvd_bytes(
+        self,
+        title: str = "",
+        compresslevel: typing.Optional[int] = 6,
+        threads: typing.Optional[int] = None,
+    ) -> bytes:
         """
-        for idx, vol in enumerate(self.volumes):
-            if vol.id == volume_id:
-                return idx
-        return -1
+        Encode the widget as a NiiVue document (``.nvd``) in Python.
 
-    def get_mesh_index_by_id(self, mesh_id: str) -> int:
-        """Return the index of the mesh with the given id.
+        See :meth:`save_nvd` for what the document holds, and for fetching
+        the current scene with :meth:`fetch_scene` or
+        ``nv.subscribe("scene")`` first.
 
         Parameters
         ----------
-        mesh_id : str
-            The id of the mesh.
+        title : str, optional
+            The title of the document.
+        compresslevel : int or None, optional
+            The gzip compression level (0-9), or None for plain JSON. Default
+            is 6.
+        threads : int or None, optional
+            The number of threads compressing blocks. Default is the number of
+            CPUs.
+
+        Returns
+        -------
+        bytes
+            The document.
+
+        Raises
+        ------
+        RuntimeError
+            If Python doesn't hold the voxels of a volume or the points of a
+            mesh.
         """
-        for idx, mesh in enumerate(self.meshes):
-            if mesh.id == mesh_id:
-                return idx
-        return -1
+        buffer = io.BytesIO()
+        write_document(buffer, self._document(title), compresslevel, threads)
+        return buffer.getvalue()
 
-    def load_volumes(self, volumes: list):
+    def save_nvd(
+        self,
+        path: typing.Union[str, pathlib.Path],
+        title: str = "",
+        compresslevel: typing.Optional[int] = 6,
+        threads: typing.Optional[int] = None,
+    ):
         """
-        Load a list of volume objects.
+        Write the widget to a NiiVue document (``.nvd``) from the kernel.
+
+        Unlike :meth:`save_document`, the document is built from the widget's
+        traits in Python, so this works without a browser. It holds ``opts``,
+        ``scene``, each volume's display options and voxels (as a NIfTI file),
+        each mesh's points, triangles, color and opacity, and the drawing. The
+        file is encoded and compressed as it is written, so neither the
+        document nor the images it embeds are copied in full.
+
+        ``scene`` only follows the frontend for the fields subscribed to, so
+        once the widget is displayed and the view may have been moved,
+        ``await nv.fetch_scene()`` in an earlier cell, or keep
+        ``nv.subscribe("scene")``, for the document to hold the current
+        camera and crosshair rather than the values last set from Python.
 
         Parameters
         ----------
-        volumes : list
-            A list of dictionaries or Volume objects.
+        path : str or pathlib.Path
+            The file to write.
+        title : str, optional
+            The title of the document.
+        compresslevel : int or None, optional
+            The gzip compression level (0-9), or None for plain JSON. Default
+            is 6.
+        threads : int or None, optional
+            The number of threads compressing blocks. Default is the number of
+            CPUs.
 
-        Returns
-        -------
-        None
+        Raises
+        ------
+        RuntimeError
+            If Python doesn't hold the voxels of a volume (await
+            ``fetch_img()`` first) or the points of a mesh.
 
         Examples
         --------
         ::
 
-            nv = NiiVue()
-            nv.load_volumes([{"path": "mni152.nii.gz"}])
-
+            for subject in subjects:
+                nv = NiiVue()
+                nv.load_volumes([{"path": f"{subject}/t1.nii.gz"}])
+                nv.save_nvd(f"{subject}.nvd", title=subject)
         """
-        volume_objects = []
-        for item in volumes:
-            if isinstance(item, Volume):
-                volume_objects.append(item)
-            elif isinstance(item, dict):
-                volume_objects.append(Volume(**item))
-        self.volumes = volume_objects
+        write_document(path, self._document(title), compresslevel, threads)
 
-    def add_volume(self, volume: typing.Union[dict, Volume]):
+    def load_nvd(self, source: typing.Union[bytes, str, pathlib.Path]) -> dict:
         """
-        Add a new volume to the widget.
+        Load a NiiVue document (``.nvd``) in Python.
+
+        Unlike :meth:`load_document`, the document is decoded in the kernel:
+        ``opts``, ``scene``, ``volumes``, ``meshes`` and ``draw_bitmap`` are set
+        from it and reach the frontend as ordinary trait updates, so the
+        document itself is never sent and no canvas is needed.
 
         Parameters
         ----------
-        volume : dict or Volume object
-            The volume information.
+        source : bytes-like, str or pathlib.Path
+            The document, or the path to it.
 
         Returns
         -------
-        None
+        dict
+            The decoded document, e.g. for its ``title`` or ``customData``.
 
         Examples
         --------
         ::
 
-            nv = NiiVue()
-            nv.add_volume({"path": "mni152.nii.gz"})
+            document = nv.load_nvd("subject01.nvd")
+        """
+        document = read_document(source)
+
+        options = document.get("imageOptionsArray") or []
+        volumes = []
+        for i, blob in enumerate(document.get("encodedImageBlobs") or []):
+            image = options[i] if i < len(options) else {}
+            name = image.get("name") or f"image{i}"
+            volumes.append(
+                Volume(
+                    data=decode_blob(blob),
+                    name=name if is_nifti_name(name) else f"{name}.nii",
+                    **{
+                        trait: image[key]
+                        for key, trait in IMAGE_OPTIONS_TO_SNAKE.items()
+                        if image.get(key) is not None
+                    },
+                )
+            )
 
-        """
-        if isinstance(volume, Volume):
-            new_volume = volume
-        elif isinstance(volume, dict):
-            new_volume = Volume(**volume)
-        else:
-            return
-        self.volumes = [*self.volumes, new_volume]
+        meshes = []
+        for i, mesh in enumerate(json.loads(document.get("meshesString") or "[]")):
+            pts = mesh["pts"]
+            tris = mesh["tris"]
+            # Typed arrays may have been serialized as {"0": ..., "1": ...}
+            if isinstance(pts, dict):
+                pts = list(pts.values())
+            if isinstance(tris, dict):
+                tris = list(tris.values())
+            meshes.append(
+                Mesh(
+                    pts=np.asarray(pts, dtype=np.float32).reshape(-1, 3),
+                    tris=np.asarray(tris, dtype=np.int32).reshape(-1, 3),
+                    name=mesh.get("name") or f"mesh{i}",
+                    rgba255=list(mesh.get("rgba255", [255, 255, 255, 255])),
+                    opacity=mesh.get("opacity", 1.0),
+                    visible=mesh.get("visible", True),
+                )
+            )
 
-    def load_meshes(self, meshes: list):
+        # NiiVue writes infinite options as "infinity"
+        infinities = {"infinity": "Infinity", "-infinity": "-Infinity"}
+        opts = {
+            key: infinities.get(value, value) if isinstance(value, str) else value
+            for key, value in (document.get("opts") or {}).items()
+            if key in CAMEL_TO_SNAKE
+        }
+        scene = {
+            SCENE_DATA_TO_SNAKE[key]: value
+            for key, value in (document.get("sceneData") or {}).items()
+            if key in SCENE_DATA_TO_SNAKE
+        }
+
+        self.opts = deserialize_options(opts, self)
+        self.volumes = volumes
+        self.meshes = meshes
+        self.scene._trait_values.update(scene)
+        self._notify_scene_changed()
+
+        drawing = document.get("encodedDrawingBlob")
+        if drawing and volumes:
+            hdr, img = read_nifti(decode_blob(drawing))
+            self.draw_bitmap = to_ras(hdr, img).astype(np.uint8)
+        return document
+
+    def save_scene(self, file_name: str = "scene.png"):
         """
-        Load a list of meshes objects.
+        Save the current scene with the provided file name.
 
         Parameters
         ----------
-        meshes : list
-            A list of dictionaries containing the mesh information.
+        file_name : str
+            The file name to save the scene as.
 
         Returns
         -------
@@ -1373,156 +3272,278 @@ class NiiVue(BaseAnyWidget):
         --------
         ::
 
-            nv = NiiVue()
-            nv.load_meshes([{"path": "BrainMesh_ICBM152.lh.mz3"}])
+            nv.save_scene("myscene.png")
 
         """
-        mesh_objects = []
-        for item in meshes:
-            if isinstance(item, Mesh):
-                mesh_objects.append(item)
-            elif isinstance(item, dict):
-                mesh_objects.append(Mesh(**item))
-        self.meshes = mesh_objects
+        self.send({"type": "save_scene", "data": [file_name]})
 
-    def add_mesh(self, mesh: typing.Union[dict, Volume]):
+    def rpc(
+        self,
+        method: str,
+        *params,
+        buffers: typing.Optional[list] = None,
+        timeout: typing.Optional[float] = None,
+    ):
         """
-        Add a single mesh to the widget.
+        Call a method of the frontend and return a future for its result.
+
+        The request carries an id that the frontend's reply is matched
+        against, so any number of calls can be in flight; at most
+        ``max_concurrent_requests`` are sent at a time. The reply is only
+        processed after the current cell finishes, so await the future in a
+        later cell or a background task.
 
         Parameters
         ----------
-        mesh : dict
-            A dictionary containing the mesh information.
+        method : str
+            The name of the method in ``rpcMethods`` (``js/widget.ts``), e.g.
+            ``"save_image"`` or ``"get_values"``.
+        *params
+            JSON-serializable arguments for the method.
+        buffers : list of bytes, optional
+            Binary payloads sent along with the request.
+        timeout : float or None, optional
+            Seconds to wait for the reply before failing with
+            ``TimeoutError``. Default is ``request_timeout``.
 
         Returns
         -------
-        None
+        AwaitableFuture
+            Resolves to a ``(result, buffers)`` tuple, or fails with
+            ``RuntimeError`` if the method raised an error.
 
         Examples
         --------
         ::
 
-            nv = NiiVue()
-            nv.add_mesh({"path": "BrainMesh_ICBM152.lh.mz3"})
+            future = nv.rpc("get_values", [[0, 0, 0]])
 
+            # in a later cell
+            values, _ = await future
         """
-        if isinstance(mesh, Mesh):
-            new_mesh = mesh
-        elif isinstance(mesh, dict):
-            new_mesh = Mesh(**mesh)
-        else:
-            return
-        self.meshes = [*self.meshes, new_mesh]
 
-    """
-    Other functions
-    """
+        def parse_reply(data, reply_buffers):
+            return data.get("result"), list(reply_buffers)
 
-    def save_document(self, file_name: str = "document.nvd", compress: bool = True):
+        return self._request(
+            "rpc",
+            {"method": method, "params": list(params)},
+            parse_reply,
+            buffers=buffers,
+            timeout=timeout,
+        )
+
+    def fetch_image(
+        self,
+        is_save_drawing: bool = False,
+        volume_by_index: int = 0,
+        timeout: typing.Optional[float] = None,
+    ):
         """
-        Save the entire scene with settings as a document.
+        Return the image :meth:`save_image` would download, as NIfTI bytes.
 
         Parameters
         ----------
-        file_name : str
-            The file name to save the document as.
-        compress : bool
-            A value represneing if the file should be compressed.
+        is_save_drawing : bool
+            Return the drawing instead of the volume.
+        volume_by_index : int
+            The volume layer to return (0 for background).
+        timeout : float or None, optional
+            See :meth:`rpc`.
 
         Returns
         -------
-        None
+        AwaitableFuture
+            Resolves to the uncompressed NIfTI file as ``bytes``.
 
         Examples
         --------
         ::
 
-            nv.save_document("mydoc.nvd", False)
+            future = nv.fetch_image(is_save_drawing=True)
 
+            # in a later cell
+            pathlib.Path("drawing.nii").write_bytes(await future)
         """
-        self.send({"type": "save_document", "data": [file_name, compress]})
 
-    def save_html(self, file_name: str = "untitled.html", canvas_id: str = "gl1"):
+        def parse_reply(data, buffers):
+            return bytes(buffers[0])
+
+        return self._request(
+            "rpc",
+            {"method": "save_image", "params": [is_save_drawing, volume_by_index]},
+            parse_reply,
+            timeout=timeout,
+        )
+
+    def fetch_values(self, points: list, timeout: typing.Optional[float] = None):
         """
-        Save the current instance as an html page.
+        Read the value of every volume at world coordinates in the frontend.
 
         Parameters
         ----------
-        file_name : str
-            The file name to save the page as.
-        canvas_id : str
-            The id of the canvas that NiiVue will be attached to.
+        points : list of list of float
+            Positions in millimeters, ``[[x, y, z], ...]``.
+        timeout : float or None, optional
+            See :meth:`rpc`.
 
         Returns
         -------
-        None
+        AwaitableFuture
+            Resolves to a dict mapping each volume id to the list of its values
+            at ``points``, with None outside the volume.
+        """
 
-        Examples
-        --------
-        ::
+        def parse_reply(data, buffers):
+            return data["result"]
 
-            nv.save_html("mypage.html")
+        points = [[float(c) for c in point[:3]] for point in points]
+        return self._request(
+            "rpc",
+            {"method": "get_values", "params": [points]},
+            parse_reply,
+            timeout=timeout,
+        )
 
+    def fetch_scene(self, timeout: typing.Optional[float] = None):
         """
-        self.send({"type": "save_html", "data": [file_name, canvas_id]})
+        Update ``scene`` with every field's current value in the frontend.
 
-    def save_image(
-        self,
-        file_name: str = "image.nii.gz",
-        is_save_drawing: bool = False,
-        volume_by_index: int = 0,
-    ):
-        """
-        Save the current image as a nii file.
+        ``scene`` is otherwise only updated for the fields subscribed to with
+        :meth:`subscribe`, so code that needs the scene once, such as
+        :meth:`save_nvd`, can fetch it instead of keeping a subscription.
 
         Parameters
         ----------
-        file_name : str
-            The file name to save the image as.
-        is_save_drawing : bool
-            A value representing if the drawings should be saved.
-        volume_by_index : int
-            The volume layer which should be saved (0 for background)
+        timeout : float or None, optional
+            See :meth:`rpc`.
 
         Returns
         -------
-        None
+        AwaitableFuture
+            Resolves to ``scene`` once it has been updated.
 
         Examples
         --------
         ::
 
-            nv.save_image("myimage.nii.gz", True, 2)
+            future = nv.fetch_scene()
 
+            # in a later cell
+            await future
+            nv.save_nvd("session.nvd")
         """
-        self.send(
-            {
-                "type": "save_image",
-                "data": [file_name, is_save_drawing, volume_by_index],
-            }
+
+        def parse_reply(data, buffers):
+            # like set_state, so the values aren't sent back to the frontend
+            self.scene._trait_values.update(parse_scene(data["result"]))
+            return self.scene
+
+        return self._request(
+            "rpc",
+            {"method": "get_scene", "params": [list(SNAKE_TO_CAMEL_SCENE.values())]},
+            parse_reply,
+            timeout=timeout,
         )
 
-    def save_scene(self, file_name: str = "scene.png"):
+    def capture(
+        self,
+        width: typing.Optional[int] = None,
+        height: typing.Optional[int] = None,
+        slice_type=None,
+        azimuth=None,
+        elevation: typing.Optional[float] = None,
+        format: str = "png",
+        timeout: typing.Optional[float] = None,
+    ):
         """
-        Save the current scene with the provided file name.
+        Render the scene in the frontend and return it to the kernel.
+
+        Unlike :meth:`save_scene`, nothing is downloaded: the frontend draws
+        each requested view into its canvas, grabs it and restores the view,
+        all in one round trip.
 
         Parameters
         ----------
-        file_name : str
-            The file name to save the scene as.
+        width, height : int or None, optional
+            The output size in pixels. Default is the current canvas size.
+        slice_type : SliceType or list of SliceType, optional
+            The view(s) to draw. Default is the current slice type.
+        azimuth : float or list of float, optional
+            The render view azimuth(s) in degrees. Default is the current one.
+        elevation : float or None, optional
+            The render view elevation in degrees. Default is the current one.
+        format : {"png", "rgba"}
+            Return PNG bytes, or an array of shape ``(height, width, 4)`` of
+            ``uint8`` RGBA values, top row first.
+        timeout : float or None, optional
+            See :meth:`rpc`.
 
         Returns
         -------
-        None
+        AwaitableFuture
+            Resolves to one image, or to a list of images, one per
+            combination of ``slice_type`` and ``azimuth``, if either is a list.
+
+        Raises
+        ------
+        ValueError
+            If the size, slice type or format is not valid.
 
         Examples
         --------
         ::
 
-            nv.save_scene("myscene.png")
+            future = nv.capture(
+                256, 256, slice_type=SliceType.RENDER, azimuth=[0, 90, 180, 270]
+            )
 
+            # in a later cell
+            for i, png in enumerate(await future):
+                pathlib.Path(f"view{i}.png").write_bytes(png)
         """
-        self.send({"type": "save_scene", "data": [file_name]})
+        if format not in ("png", "rgba"):
+            raise ValueError(f"Unknown capture format: {format!r}")
+        for size in (width, height):
+            if size is not None and (not isinstance(size, int) or size < 1):
+                raise ValueError("Width and height must be positive integers.")
+
+        several = isinstance(slice_type, (list, tuple)) or isinstance(
+            azimuth, (list, tuple)
+        )
+        slice_types = (
+            slice_type if isinstance(slice_type, (list, tuple)) else [slice_type]
+        )
+        azimuths = azimuth if isinstance(azimuth, (list, tuple)) else [azimuth]
+        views = [
+            {
+                "slice_type": None if st is None else SliceType(st).value,
+                "azimuth": None if az is None else float(az),
+                "elevation": None if elevation is None else float(elevation),
+            }
+            for st in slice_types
+            for az in azimuths
+        ]
+
+        def parse_reply(data, buffers):
+            size = data["result"]
+            if format == "png":
+                images = [bytes(buffer) for buffer in buffers]
+            else:
+                shape = (size["height"], size["width"], 4)
+                images = [
+                    np.frombuffer(buffer, dtype=np.uint8).reshape(shape).copy()
+                    for buffer in buffers
+                ]
+            return images if several else images[0]
+
+        request = {"width": width, "height": height, "views": views, "format": format}
+        return self._request(
+            "rpc",
+            {"method": "capture", "params": [request]},
+            parse_reply,
+            timeout=timeout,
+        )
 
     def set_mesh_property(self, mesh_id: str, attribute: str, value: typing.Any):
         """Set a property of a mesh.
@@ -2798,6 +4819,55 @@ class NiiVue(BaseAnyWidget):
     Custom event callbacks
     """
 
+    def events(self, event: str, policy: str = "latest", maxsize: int = 1):
+        """
+        Iterate asynchronously over the occurrences of an event.
+
+        The stream is registered like a callback with the matching ``on_*``
+        method, but only queues the events, so slow processing never holds up
+        the messages from the frontend. Each event is the argument the callback
+        would receive, or a tuple of them if there are several.
+
+        Parameters
+        ----------
+        event : str
+            The event name, e.g. ``"location_change"`` for
+            :meth:`on_location_change`.
+        policy : {"latest", "drop_oldest", "unbounded"}, optional
+            What to do with a new event when ``maxsize`` events are waiting:
+            keep only the new one (default), discard the oldest, or keep them
+            all, without a limit. See :class:`ipyniivue.utils.EventStream`.
+        maxsize : int, optional
+            The number of events that may wait. Default is 1.
+
+        Returns
+        -------
+        :class:`ipyniivue.utils.EventStream`
+            The stream; closing it (or leaving its ``async with`` block)
+            unregisters it.
+
+        Examples
+        --------
+        ::
+
+            async def follow_crosshair():
+                async with nv.events("location_change") as locations:
+                    async for location in locations:
+                        await update_plot(location)
+
+            task = asyncio.ensure_future(follow_crosshair())
+        """
+        register = getattr(self, f"on_{event}", None)
+        if register is None:
+            raise ValueError(f"Unknown event {event!r}.")
+        stream = EventStream(
+            maxsize=maxsize,
+            policy=policy,
+            on_close=lambda: register(stream.push, remove=True),
+        )
+        register(stream.push)
+        return stream
+
     def on_canvas_attached(self, callback, remove=False):
         """
         Register a callback for when the canvas becomes attached.
@@ -3421,6 +5491,16 @@ class NiiVue(BaseAnyWidget):
             - **id** (str): The ID of the volume.
             - **idx** (float or None): The index of the cursor position for the volume.
 
+            With ``nv.hover_lookup = "kernel"``, the frontend only sends the
+            cursor position, and the values are looked up in the ``img`` and
+            ``hdr`` each volume holds in the kernel (volumes without them get
+            None). The dictionary then also has the cursor position in
+            ``'mm'``, and each entry also has:
+
+            - **value** (float or None): The scaled voxel value.
+            - **label** (str or None): The name of ``idx`` in the volume's
+              ``colormap_label``.
+
         remove : bool, optional
             If `True`, remove the callback. Defaults to `False`.
 
@@ -3439,6 +5519,7 @@ class NiiVue(BaseAnyWidget):
 
         """
         self._register_callback("hover_idx_change", callback, remove=remove)
+        self._update_hover_mode()
 
     def on_opts_change(self, callback, remove=False):
         """
@@ -3465,6 +5546,88 @@ class NiiVue(BaseAnyWidget):
         """
         self._register_callback("opts_change", callback, remove=remove)
 
+    """
+    Subscriptions
+    """
+
+    def subscribe(self, field: str, rate: typing.Optional[float] = None):
+        """
+        Keep a ``scene`` or ``ui_data`` field updated from the frontend.
+
+        The frontend only sends the fields that are subscribed to, when the
+        niivue events that may change them fire; ``scene`` and ``ui_data``
+        otherwise keep the values last set from Python. Code reading, for
+        example, ``nv.scene.crosshair_pos`` to follow the user's clicks must
+        subscribe to it first. Instances that :meth:`broadcast_to` others are
+        always subscribed to the whole scene.
+
+        Parameters
+        ----------
+        field : str
+            ``"scene"`` or ``"ui_data"`` for every field of the object, or a
+            single field such as ``"scene.crosshair_pos"``.
+        rate : float or None, optional
+            The maximum number of updates per second. The latest value is
+            always sent. If None (default), every change is sent.
+
+        Examples
+        --------
+        ::
+
+            nv.subscribe("scene.crosshair_pos", rate=20)
+            nv.subscribe("ui_data.is_dragging")
+        """
+        self._subscription_fields(field)
+        if rate is not None and rate <= 0:
+            raise ValueError("rate must be positive or None.")
+        self._subscribed[field] = rate
+        self._update_subscriptions()
+
+    def unsubscribe(self, field: str):
+        """
+        Stop updating a field subscribed to with :meth:`subscribe`.
+
+        Parameters
+        ----------
+        field : str
+            The field passed to :meth:`subscribe`.
+        """
+        self._subscribed.pop(field, None)
+        self._update_subscriptions()
+
+    @staticmethod
+    def _subscription_fields(field):
+        """Return the group of a subscription and its camelCase field names."""
+        group, _, name = field.partition(".")
+        names = {"scene": SNAKE_TO_CAMEL_SCENE, "ui_data": SNAKE_TO_CAMEL_UIDATA}
+        if group not in names:
+            raise ValueError(f"Unknown field {field!r}; use scene or ui_data.")
+        mapping = names[group]
+        if not name:
+            return group, list(mapping.values())
+        if name not in mapping:
+            raise ValueError(f"Unknown {group} field {name!r}.")
+        return group, [mapping[name]]
+
+    @t.observe("other_nv")
+    def _update_subscriptions(self, change=None):
+        fields = dict(self._subscribed)
+        if self.other_nv:
+            # sync() needs every scene change
+            fields["scene"] = None
+        subscriptions = {}
+        for field, rate in fields.items():
+            group, names = self._subscription_fields(field)
+            group_rates = subscriptions.setdefault(group, {})
+            for name in names:
+                # a field subscribed to several times uses the highest rate
+                current = group_rates.get(name, 0)
+                if current is None or rate is None:
+                    group_rates[name] = None
+                else:
+                    group_rates[name] = max(current, rate)
+        self._subscriptions = subscriptions
+
     """
     Sync
     """
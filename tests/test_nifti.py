@@ -0,0 +1,302 @@
+import numpy as np
+import pytest
+
+from ipyniivue.nifti import downsample, encode_nifti, read_nifti
+from ipyniivue.utils import img_fingerprint
+
+nib = pytest.importorskip("nibabel")
+
+
+@pytest.mark.parametrize("image_class", ["Nifti1Image", "Nifti2Image"])
+@pytest.mark.parametrize("suffix", [".nii", ".nii.gz"])
+def test_read_nifti_matches_nibabel(tmp_path, image_class, suffix):
+    data = np.arange(4 * 5 * 6, dtype=np.int16).reshape(4, 5, 6)
+    affine = np.diag([2.0, 3.0, 4.0, 1.0])
+    affine[:3, 3] = [-10.0, 20.0, 5.0]
+    path = tmp_path / f"image{suffix}"
+    nib.save(getattr(nib, image_class)(data, affine), path)
+
+    hdr, img = read_nifti(path)
+
+    assert hdr.dims[:4] == [3, 4, 5, 6]
+    np.testing.assert_allclose(hdr.affine, affine)
+    np.testing.assert_array_equal(img, data.ravel(order="F"))
+
+
+def test_volume_decodes_nifti_in_kernel(tmp_path):
+    from ipyniivue import Volume
+
+    data = np.random.default_rng(0).random((3, 4, 5), dtype=np.float32)
+    path = tmp_path / "image.nii"
+    nib.save(nib.Nifti1Image(data, np.eye(4)), path)
+
+    volume = Volume(path=path)
+
+    np.testing.assert_array_equal(volume.img, data.ravel(order="F"))
+    assert volume._img_fingerprint == img_fingerprint(volume.img)
+    assert "img" not in volume.get_state()
+
+
+def test_volumes_share_decoded_img(tmp_path):
+    from ipyniivue import Volume
+
+    data = np.arange(3 * 4 * 5, dtype=np.int16).reshape(3, 4, 5)
+    path = tmp_path / "image.nii"
+    nib.save(nib.Nifti1Image(data, np.eye(4)), path)
+
+    first = Volume(path=path)
+    second = Volume(path=path)
+
+    assert second.img is first.img
+    assert second.hdr is first.hdr
+    assert first.get_state("path")["path"] == second.get_state("path")["path"]
+
+
+@pytest.mark.parametrize("byte_order", ["<", ">"])
+def test_volume_memmap(tmp_path, byte_order):
+    from ipyniivue import Volume
+
+    data = np.arange(3 * 4 * 5, dtype=f"{byte_order}f4").reshape(3, 4, 5)
+    path = tmp_path / "image.nii"
+    header = nib.Nifti1Header(endianness=byte_order)
+    nib.save(nib.Nifti1Image(data, np.eye(4), header=header), path)
+
+    volume = Volume(path=path, memmap=True)
+
+    assert isinstance(volume.img, np.memmap)
+    assert volume.img.dtype == np.dtype(f"{byte_order}f4")
+    np.testing.assert_array_equal(volume.img, data.ravel(order="F"))
+    assert volume._img_fingerprint == img_fingerprint(data.ravel(order="F"))
+
+
+def test_downsample_keeps_world_coordinates(tmp_path):
+    data = np.arange(5 * 6 * 7, dtype=np.int16).reshape(5, 6, 7)
+    affine = np.diag([2.0, 2.0, 2.0, 1.0])
+    affine[:3, 3] = [-10, -20, -30]
+    path = tmp_path / "image.nii"
+    nib.save(nib.Nifti1Image(data, affine), path)
+
+    hdr, img = downsample(*read_nifti(path), 2)
+    preview = tmp_path / "preview.nii"
+    preview.write_bytes(encode_nifti(hdr, img))
+    loaded = nib.load(preview)
+
+    assert loaded.shape == (3, 3, 4)
+    # Pooled voxel 0 is centred between source voxels 0 and 1
+    np.testing.assert_allclose(loaded.affine[:3, 3], [-9, -19, -29])
+    np.testing.assert_allclose(np.diag(loaded.affine)[:3], [4, 4, 4])
+    assert loaded.dataobj[0, 0, 0] == np.rint(data[:2, :2, :2].mean())
+    # Blocks at the edge may be partial
+    assert loaded.dataobj[2, 2, 3] == np.rint(data[4, 4:, 6].mean())
+
+
+def test_progressive_volume_builds_pyramid(tmp_path):
+    from ipyniivue import Volume
+
+    data = np.zeros((16, 16, 8), dtype=np.float32)
+    path = tmp_path / "image.nii"
+    nib.save(nib.Nifti1Image(data, np.eye(4)), path)
+
+    volume = Volume(path=path, progressive=True)
+
+    assert [level["factor"] for level in volume._pyramid] == [4, 2]
+    assert sorted(volume._pyramid_levels) == [2, 4]
+
+
+def test_frame_streaming(tmp_path):
+    from ipyniivue import Volume
+
+    data = np.arange(2 * 3 * 4 * 6, dtype=np.float32).reshape(2, 3, 4, 6)
+    path = tmp_path / "series.nii"
+    nib.save(nib.Nifti1Image(data, np.eye(4)), path)
+
+    volume = Volume(path=path, frame_window=2, memmap=True)
+    sent = []
+    volume.send = lambda msg, buffers=None: sent.append((msg, buffers))
+
+    assert volume._frame_stream["n_frames"] == 6
+    assert volume.n_frame_4d == 6
+    for index in (4, 1, 5):
+        volume._handle_custom_msg(
+            {"event": "frame_request", "data": {"index": index}}, []
+        )
+        msg, buffers = sent[-1]
+        assert msg["data"]["index"] == index
+        frame = np.frombuffer(buffers[0], dtype=msg["data"]["type"])
+        np.testing.assert_array_equal(frame, data[..., index].ravel(order="F"))
+    assert list(volume._frame_cache) == [1, 5]
+
+    # Edits in Python make the frontend refetch its frames
+    volume.img = np.zeros_like(volume.img)
+    assert sent[-1][0]["type"] == "frames_invalidated"
+    assert not volume._frame_cache
+
+
+def test_kernel_hover_lookup(tmp_path):
+    from ipyniivue import NiiVue, Volume
+
+    data = np.arange(4 * 5 * 6, dtype=np.int16).reshape(4, 5, 6)
+    affine = np.diag([2.0, 2.0, 2.0, 1.0])
+    affine[:3, 3] = [-4.0, -4.0, -4.0]
+    path = tmp_path / "labels.nii"
+    nib.save(nib.Nifti1Image(data, affine), path)
+
+    nv = NiiVue()
+    assert nv._hover_mode == "off"
+    nv.volumes = [Volume(path=path), Volume(url="https://example.com/a.nii.gz")]
+    nv.volumes[0].set_colormap_label(
+        {
+            "R": [0] * 120,
+            "G": [0] * 120,
+            "B": [0] * 120,
+            "labels": [str(i) for i in range(120)],
+        }
+    )
+    events = []
+    nv.on_hover_idx_change(events.append)
+    nv.hover_lookup = "kernel"
+    assert nv._hover_mode == "kernel"
+
+    # voxel (1, 2, 3)
+    nv._handle_custom_msg(
+        {"event": "hover_idx_change", "data": {"mm": [-2.0, 0.2, 2.0]}}, []
+    )
+    (event,) = events
+    first, second = event["idx_values"]
+    assert first["idx"] == data[1, 2, 3]
+    assert first["label"] == str(data[1, 2, 3])
+    assert second == {"id": nv.volumes[1].id, "idx": None, "value": None, "label": None}
+
+    # A zero slope means no scaling, so the intercept isn't applied either
+    nv.volumes[0].hdr.scl_slope = 0.0
+    nv.volumes[0].hdr.scl_inter = 100.0
+    nv._handle_custom_msg(
+        {"event": "hover_idx_change", "data": {"mm": [-2.0, 0.2, 2.0]}}, []
+    )
+    assert events[-1]["idx_values"][0]["value"] == data[1, 2, 3]
+
+    nv.on_hover_idx_change(events.append, remove=True)
+    assert nv._hover_mode == "off"
+
+
+def test_volume_save_streams_parallel_gzip(tmp_path, monkeypatch):
+    from ipyniivue import Volume, nifti
+
+    data = np.random.default_rng(0).integers(0, 50, (20, 30, 40), dtype=np.int16)
+    affine = np.diag([2.0, 3.0, 4.0, 1.0])
+    path = tmp_path / "image.nii"
+    nib.save(nib.Nifti1Image(data, affine), path)
+    volume = Volume(path=path)
+
+    # Several small blocks, so they are joined into one deflate stream
+    monkeypatch.setattr(nifti, "GZIP_BLOCK_SIZE", 4096)
+    out = tmp_path / "copy.nii.gz"
+    volume.save(out, compresslevel=1, threads=3)
+
+    saved = nib.load(out)
+    np.testing.assert_array_equal(saved.get_fdata(), data)
+    np.testing.assert_allclose(saved.affine, affine)
+    assert volume.to_nifti_bytes() == encode_nifti(volume.hdr, volume.img)
+
+
+def test_save_drawing_as_label_volume(tmp_path):
+    from ipyniivue import NiiVue, Volume
+
+    back = Volume(url="https://example.com/image.nii.gz")
+    back.dims_ras = [3, 4, 5, 6]
+    back.mat_ras = np.diag([2.0, 2.0, 2.0, 1.0])
+    nv = NiiVue()
+    nv.volumes = [back]
+    nv.draw_bitmap = np.zeros(4 * 5 * 6, dtype=np.uint8)
+    nv.draw_bitmap[7] = 2
+
+    nv.save_drawing(tmp_path / "labels.nii.gz")
+
+    saved = nib.load(tmp_path / "labels.nii.gz")
+    assert saved.shape == (4, 5, 6)
+    assert saved.header["intent_code"] == 1002
+    np.testing.assert_allclose(saved.affine, back.mat_ras)
+    np.testing.assert_array_equal(saved.get_fdata().ravel(order="F"), nv.draw_bitmap)
+
+
+def test_nvd_round_trip(tmp_path):
+    from ipyniivue import Mesh, NiiVue, Volume
+    from ipyniivue.document import read_document
+
+    data = np.arange(4 * 5 * 6, dtype=np.float32).reshape(4, 5, 6)
+    # Oblique voxel order, so the drawing is reoriented to and from RAS
+    affine = np.array([[0, 0, -2, 10], [-3, 0, 0, 5], [0, 4, 0, 1], [0, 0, 0, 1.0]])
+    nib.save(nib.Nifti1Image(data, affine), tmp_path / "image.nii")
+    nv = NiiVue(show_3d_crosshair=True)
+    nv.volumes = [Volume(path=tmp_path / "image.nii", colormap="hot", opacity=0.5)]
+    mesh = Mesh(data=b"", name="mesh.mz3")
+    mesh.pts = np.array([0, 0, 0, 1, 0, 0, 0, 1, 0], dtype=np.float32)
+    mesh.tris = np.array([0, 1, 2], dtype=np.int32)
+    nv.meshes = [mesh]
+    nv.scene.render_azimuth = 45.0
+    nv.draw_bitmap = np.zeros(4 * 5 * 6, dtype=np.uint8)
+    nv.draw_bitmap[[3, 17]] = [1, 2]
+
+    nv.save_nvd(tmp_path / "session.nvd", title="subject")
+    assert read_document(tmp_path / "session.nvd")["sceneData"]["azimuth"] == 45.0
+
+    loaded = NiiVue()
+    document = loaded.load_nvd(tmp_path / "session.nvd")
+
+    assert document["title"] == "subject"
+    assert loaded.opts.show_3d_crosshair
+    assert loaded.scene.render_azimuth == 45.0
+    (volume,) = loaded.volumes
+    assert (volume.colormap, volume.opacity) == ("hot", 0.5)
+    np.testing.assert_array_equal(volume.img, data.ravel(order="F"))
+    np.testing.assert_allclose(volume.hdr.affine, affine)
+    np.testing.assert_array_equal(loaded.draw_bitmap, nv.draw_bitmap)
+    (loaded_mesh,) = loaded.meshes
+    assert loaded_mesh.rgba255 == mesh.rgba255
+    assert loaded_mesh.name == "mesh.mz3"
+    np.testing.assert_array_equal(loaded_mesh.pts.ravel(), mesh.pts)
+    np.testing.assert_array_equal(loaded_mesh.tris.ravel(), mesh.tris)
+
+
+def test_encode_nifti_rejects_dims_beyond_nifti1():
+    from ipyniivue import NIFTI1Hdr
+
+    hdr = NIFTI1Hdr(dims=[1, 40000, 1, 1, 1, 1, 1, 1], pixDims=[1] * 8)
+    with pytest.raises(ValueError, match="16-bit"):
+        encode_nifti(hdr, np.zeros(40000, dtype=np.uint8))
+
+
+def test_failed_write_nifti_keeps_existing_file(tmp_path, monkeypatch):
+    from ipyniivue import Volume, nifti
+
+    path = tmp_path / "image.nii.gz"
+    nib.save(nib.Nifti1Image(np.zeros((4, 4, 4), dtype=np.uint8), np.eye(4)), path)
+    original = path.read_bytes()
+    volume = Volume(path=path)
+
+    def fail_midway(f, blocks, level, threads):
+        f.write(next(iter(blocks)))
+        raise OSError("disk full")
+
+    monkeypatch.setattr(nifti, "write_gzip", fail_midway)
+    with pytest.raises(OSError, match="disk full"):
+        volume.save(path)
+    assert path.read_bytes() == original
+    assert sorted(tmp_path.iterdir()) == [path]
+
+
+def test_failed_save_nvd_keeps_existing_file(tmp_path, monkeypatch):
+    from ipyniivue import NiiVue, document
+
+    path = tmp_path / "session.nvd"
+    path.write_bytes(b"previous")
+
+    def fail_midway(f, blocks, level, threads):
+        f.write(next(iter(blocks)))
+        raise OSError("disk full")
+
+    monkeypatch.setattr(document, "write_gzip", fail_midway)
+    with pytest.raises(OSError, match="disk full"):
+        NiiVue().save_nvd(path)
+    assert path.read_bytes() == b"previous"
+    assert sorted(tmp_path.iterdir()) == [path]
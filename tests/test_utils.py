@@ -0,0 +1,175 @@
+import zlib
+
+import numpy as np
+import pytest
+
+from ipyniivue.utils import (
+    BlobStore,
+    ChunkedDataHandler,
+    FileCache,
+    atomic_write,
+    encode_array_update,
+    narrow_array,
+)
+
+
+def test_chunked_data_handler_out_of_order():
+    data = np.arange(1000, dtype=np.int16)
+    raw = data.tobytes()
+    chunk_size = 300
+    chunks = [raw[i : i + chunk_size] for i in range(0, len(raw), chunk_size)]
+
+    handler = ChunkedDataHandler(len(chunks), "int16", len(raw), chunk_size)
+    for index in reversed(range(len(chunks))):
+        assert not handler.is_complete()
+        handler.add_chunk(index, memoryview(chunks[index]))
+
+    assert handler.is_complete()
+    np.testing.assert_array_equal(handler.get_numpy_array(), data)
+
+
+@pytest.mark.parametrize(
+    ("changed", "encoding"),
+    [
+        (np.s_[10:20], "ranges"),
+        (np.s_[::97], "sparse"),
+        (np.s_[::2], "full"),
+    ],
+)
+def test_encode_array_update(changed, encoding):
+    old = np.zeros(1000, dtype=np.float32)
+    new = old.copy()
+    new[changed] = 1.0
+
+    msg_type, data, buffers = encode_array_update(old, new)
+
+    assert data["encoding"] == encoding
+    restored = old.copy()
+    if msg_type == "buffer_change":
+        restored = np.frombuffer(buffers[0], dtype=np.float32)
+    elif msg_type == "buffer_update":
+        indices = np.frombuffer(buffers[0], dtype=np.uint32)
+        restored[indices] = np.frombuffer(buffers[1], dtype=np.float32)
+    else:
+        ranges = np.frombuffer(buffers[0], dtype=np.uint32).reshape(-1, 2)
+        values = np.frombuffer(buffers[1], dtype=np.float32)
+        offset = 0
+        for start, length in ranges:
+            restored[start : start + length] = values[offset : offset + length]
+            offset += length
+    np.testing.assert_array_equal(restored, new)
+    assert data["bytes_saved"] == new.nbytes - sum(len(b) for b in buffers)
+
+
+def test_encode_array_update_unchanged():
+    array = np.arange(10, dtype=np.uint8)
+    assert encode_array_update(array, array.copy()) is None
+
+
+def test_chunked_data_handler_deflate():
+    data = np.zeros(10000, dtype=np.uint16)
+    data[::50] = 7
+    compressed = zlib.compress(data.tobytes())
+
+    handler = ChunkedDataHandler(
+        2,
+        "uint16",
+        len(compressed),
+        64,
+        compression="deflate",
+        raw_size=data.nbytes,
+    )
+    handler.add_chunk(1, memoryview(compressed[64:]))
+    handler.add_chunk(0, memoryview(compressed[:64]))
+
+    np.testing.assert_array_equal(handler.get_numpy_array(), data)
+
+
+def test_file_cache(tmp_path):
+    path = tmp_path / "image.nii"
+    path.write_bytes(b"a" * 100)
+    cache = FileCache(max_bytes=150, mmap_threshold=1000)
+
+    first = cache.read(path)
+    assert cache.read(str(path)) is first
+    assert (cache.hits, cache.misses) == (1, 1)
+
+    # A changed file is read again and replaces the outdated entry
+    path.write_bytes(b"b" * 120)
+    assert cache.read(path) == b"b" * 120
+    assert cache.misses == 2
+    assert len(cache._entries) == 1
+
+    # Large files are memory-mapped instead of cached
+    big = tmp_path / "big.nii"
+    big.write_bytes(b"c" * 2000)
+    data = cache.read(big)
+    assert isinstance(data, memoryview)
+    assert data.tobytes() == b"c" * 2000
+    assert len(cache._entries) == 1
+
+
+def test_blob_store(tmp_path):
+    class Owner:
+        pass
+
+    path = tmp_path / "mesh.gii"
+    path.write_bytes(b"a" * 100)
+    store = BlobStore()
+    first, second = Owner(), Owner()
+
+    key = store.add_file(path, first)
+    assert store.add_file(str(path), second) == key
+    assert bytes(store.get(key)) == b"a" * 100
+    assert store.stats()["bytes_referenced"] == 200
+
+    # A file changed on disk is no longer served under its old key
+    path.write_bytes(b"b" * 100)
+    assert store.get(key) is None
+    # ... and its old hash is forgotten
+    assert len(store._file_hashes) == 1
+
+    # Blobs are released with the last widget using them
+    del first
+    assert store.stats()["blobs"] == 1
+    del second
+    assert store.stats()["blobs"] == 0
+
+
+@pytest.mark.parametrize(
+    ("dtype", "tolerance"),
+    [("float32", 1e-6), ("float16", 1e-2), ("uint8", 2e-2), ("int16", 1e-4)],
+)
+def test_narrow_array(dtype, tolerance):
+    values = np.linspace(-3, 7, 1000)
+    wire, scaling, max_error = narrow_array(values, dtype)
+
+    assert wire.dtype == dtype
+    slope, inter = scaling or (1.0, 0.0)
+    restored = wire * slope + inter
+    assert max_error == pytest.approx(np.abs(restored - values).max())
+    assert max_error < tolerance
+
+
+def test_atomic_write_keeps_mode(tmp_path):
+    path = tmp_path / "out.bin"
+    path.write_bytes(b"old")
+    path.chmod(0o640)
+    with atomic_write(path) as f:
+        f.write(b"new")
+    assert path.read_bytes() == b"new"
+    assert path.stat().st_mode & 0o777 == 0o640
+
+    # A new file gets the mode open() gives it
+    with open(tmp_path / "reference.bin", "wb"):
+        pass
+    with atomic_write(tmp_path / "created.bin") as f:
+        f.write(b"data")
+    assert (tmp_path / "created.bin").stat().st_mode == (
+        tmp_path / "reference.bin"
+    ).stat().st_mode
+    assert sorted(p.name for p in tmp_path.iterdir()) == [
+        "created.bin",
+        "out.bin",
+        "reference.bin",
+    ]
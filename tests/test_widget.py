@@ -0,0 +1,492 @@
+import asyncio
+import zlib
+
+import numpy as np
+import pytest
+
+from ipyniivue import Mesh, NIFTI1Hdr, NiiVue, SliceType, Volume
+
+
+def _chunk_messages(prop, transfer_id, array, chunk_size):
+    raw = array.tobytes()
+    total_chunks = -(-len(raw) // chunk_size)
+    return [
+        {
+            f"chunk_{prop}_{i}": {
+                "transfer_id": transfer_id,
+                "chunk_index": i,
+                "total_chunks": total_chunks,
+                "total_size": len(raw),
+                "chunk_size": chunk_size,
+                "compression": None,
+                "raw_size": len(raw),
+                "data_type": array.dtype.name,
+                "chunk": memoryview(raw[i * chunk_size : (i + 1) * chunk_size]),
+            }
+        }
+        for i in range(total_chunks)
+    ]
+
+
+def test_concurrent_chunked_uploads_do_not_mix():
+    first = Volume(url="https://example.com/first.nii.gz")
+    second = Volume(url="https://example.com/second.nii.gz")
+    first_img = np.arange(500, dtype=np.float32)
+    second_img = -np.arange(500, dtype=np.float32)
+
+    # Interleave two uploads to different volumes, both using the same id
+    first_msgs = _chunk_messages("img", "t-0", first_img, 256)
+    second_msgs = _chunk_messages("img", "t-0", second_img, 256)
+    for first_msg, second_msg in zip(first_msgs, second_msgs):
+        first.set_state(first_msg)
+        second.set_state(second_msg)
+
+    np.testing.assert_array_equal(first.img, first_img)
+    np.testing.assert_array_equal(second.img, second_img)
+    assert not first._data_handlers
+    assert not second._data_handlers
+
+
+def test_binary_update_compression():
+    volume = Volume(url="https://example.com/image.nii.gz")
+    volume.compression = {"buffer_change": 1024}
+    volume._codecs = ["deflate"]
+    sent = []
+    volume.send = lambda msg, buffers=None: sent.append((msg, buffers))
+
+    volume.img = np.zeros(4096, dtype=np.uint8)
+    volume.img = np.ones(4096, dtype=np.uint8)
+
+    ((msg, buffers),) = sent
+    assert msg["type"] == "buffer_change"
+    assert msg["data"]["compression"] == "deflate"
+    assert zlib.decompress(buffers[0]) == volume.img.tobytes()
+    assert msg["data"]["bytes_saved"] == volume.img.nbytes - len(buffers[0])
+
+
+def test_lazy_img_is_requested_by_fetch_img():
+    volume = Volume(url="https://example.com/image.nii.gz", lazy_img=True)
+    assert not volume._img_requested
+    assert "img" not in volume.get_state()
+
+    # Reading or introspecting img never starts a transfer
+    assert volume.img is None
+    assert not volume._img_requested
+
+    future = volume.fetch_img()
+    assert volume._img_requested
+    assert not future.done()
+    volume.set_trait("img", np.arange(4, dtype=np.int16))
+
+    np.testing.assert_array_equal(future.result(timeout=0), np.arange(4))
+    assert not volume._img_requested
+
+
+def test_image_loaded_keeps_lazy_img():
+    nv = NiiVue()
+    nv.add_volume({"url": "https://example.com/image.nii.gz", "lazy_img": True})
+    (volume,) = nv.volumes
+    loaded = []
+    nv.on_image_loaded(loaded.append)
+
+    volume.hdr = NIFTI1Hdr(dims=[3, 2, 2, 2, 1, 1, 1, 1])
+    nv._handle_custom_msg({"event": "image_loaded", "data": {"id": volume.id}}, [])
+
+    assert loaded == [volume]
+    assert not volume._img_requested
+
+
+def test_fetch_region():
+    data = np.arange(4 * 5 * 6, dtype=np.float32).reshape((4, 5, 6), order="F")
+    volume = Volume(url="https://example.com/image.nii.gz")
+    volume.hdr = NIFTI1Hdr(dims=[3, 4, 5, 6, 1, 1, 1, 1])
+    sent = []
+    volume.send = lambda msg, buffers=None: sent.append(msg)
+
+    # Without img, the frontend is asked for just the box
+    future = volume.fetch_region((1, 3), slice(2, None), -1)
+    (msg,) = sent
+    assert msg["type"] == "fetch_region"
+    assert msg["data"]["x"] == [1, 3]
+    assert msg["data"]["y"] == [2, 5]
+    assert msg["data"]["z"] == [5, 6]
+    box = np.asfortranarray(data[1:3, 2:5, 5:6])
+    volume._handle_custom_msg(
+        {
+            "event": "reply",
+            "data": {"request_id": msg["data"]["request_id"], "type": "float32"},
+        },
+        [memoryview(box.tobytes(order="F"))],
+    )
+    np.testing.assert_array_equal(future.result(timeout=0), data[1:3, 2:5, 5:6])
+
+    # With img, the box is sliced locally
+    volume.img = data.ravel(order="F")
+    local = volume.fetch_region(slice(None), 0, (1, 4)).result(timeout=0)
+    np.testing.assert_array_equal(local, data[:, 0:1, 1:4])
+    assert len(sent) == 1
+
+
+def test_requests_are_limited_and_rpc_replies_parsed():
+    nv = NiiVue()
+    nv.max_concurrent_requests = 2
+    sent = []
+    nv.send = lambda msg, buffers=None: sent.append(msg)
+
+    futures = [nv.rpc("get_values", [[0, 0, i]]) for i in range(4)]
+    assert len(sent) == 2
+    assert sent[0]["type"] == "rpc"
+    assert sent[0]["data"]["method"] == "get_values"
+    assert sent[0]["data"]["params"] == [[[0, 0, 0]]]
+
+    # Cancelling a sent request frees its slot, and a cancelled queued one
+    # is never sent
+    futures[0].cancel()
+    futures[3].cancel()
+    assert len(sent) == 3
+    assert sent[2]["data"]["params"] == [[[0, 0, 2]]]
+
+    nv._handle_custom_msg(
+        {
+            "event": "reply",
+            "data": {"request_id": sent[1]["data"]["request_id"], "result": [1]},
+        },
+        [memoryview(b"ab")],
+    )
+    result, buffers = futures[1].result(timeout=0)
+    assert result == [1]
+    assert [bytes(b) for b in buffers] == [b"ab"]
+
+    nv._handle_custom_msg(
+        {
+            "event": "reply",
+            "data": {"request_id": sent[2]["data"]["request_id"], "error": "boom"},
+        },
+        [],
+    )
+    with pytest.raises(RuntimeError, match="boom"):
+        futures[2].result(timeout=0)
+    assert len(sent) == 3
+    assert not nv._pending_requests
+    assert not nv._queued_requests
+
+
+def test_capture_views():
+    nv = NiiVue()
+    sent = []
+    nv.send = lambda msg, buffers=None: sent.append(msg)
+
+    future = nv.capture(
+        2, 1, slice_type=SliceType.RENDER, azimuth=[0, 90], format="rgba"
+    )
+    (msg,) = sent
+    (request,) = msg["data"]["params"]
+    assert msg["data"]["method"] == "capture"
+    assert (request["width"], request["height"]) == (2, 1)
+    assert [view["azimuth"] for view in request["views"]] == [0, 90]
+    assert {view["slice_type"] for view in request["views"]} == {4}
+
+    pixels = [np.arange(8, dtype=np.uint8) + i for i in range(2)]
+    nv._handle_custom_msg(
+        {
+            "event": "reply",
+            "data": {
+                "request_id": msg["data"]["request_id"],
+                "result": {"width": 2, "height": 1},
+            },
+        },
+        [memoryview(p.tobytes()) for p in pixels],
+    )
+    images = future.result(timeout=0)
+    assert [image.shape for image in images] == [(1, 2, 4)] * 2
+    np.testing.assert_array_equal(images[1].ravel(), pixels[1])
+
+    with pytest.raises(ValueError):
+        nv.capture(format="jpeg")
+
+
+def test_blob_upload_is_chunked_and_windowed():
+    data = bytes(range(256)) * 40
+    volume = Volume(data=data, name="image.mgz")
+    volume._blob_chunk_size = 1000
+    volume._blob_window = 3
+    sent = []
+    volume.send = lambda msg, buffers=None: sent.append((msg, buffers))
+    key = volume.get_state("data")["data"]["blob"]
+
+    volume._handle_custom_msg({"event": "blob_request", "data": {"hash": key}}, [])
+    assert [msg["data"]["chunk_index"] for msg, _ in sent] == [0, 1, 2]
+
+    # Each acknowledgement lets one more chunk through
+    received = bytearray()
+    for chunk_index in range(11):
+        msg, buffers = sent[chunk_index]
+        assert msg["data"]["total_chunks"] == 11
+        received += buffers[0]
+        volume._handle_custom_msg(
+            {"event": "blob_ack", "data": {"hash": key, "chunk_index": chunk_index}},
+            [],
+        )
+        assert len(sent) == min(chunk_index + 4, 11)
+
+    assert bytes(received) == data
+    assert not volume._blob_uploads
+
+    # An upload the frontend stopped acknowledging is dropped with an error,
+    # so the frontend doesn't wait for it forever
+    volume._handle_custom_msg({"event": "blob_request", "data": {"hash": key}}, [])
+    volume._blob_uploads[key].last_update -= volume._chunk_timeout + 1
+    sent.clear()
+    volume._release_stale_transfers()
+    assert not volume._blob_uploads
+    assert [msg["data"] for msg, _ in sent] == [{"hash": key, "error": "timed out"}]
+
+
+def test_transport_quantizes_img_updates():
+    volume = Volume(url="https://example.com/image.nii.gz")
+    volume.transport = {"img": "uint8"}
+    sent = []
+    volume.send = lambda msg, buffers=None: sent.append((msg, buffers))
+
+    volume.img = np.zeros(1000)
+    img = np.linspace(0, 1, 1000)
+    volume.img = img
+
+    msg, buffers = sent[-1]
+    assert msg["type"] == "buffer_change"
+    assert msg["data"]["type"] == "uint8"
+    slope, inter = msg["data"]["scl_slope"], msg["data"]["scl_inter"]
+    restored = np.frombuffer(buffers[0], dtype=np.uint8) * slope + inter
+    assert np.abs(restored - img).max() <= volume.transport_errors["img"]
+    assert volume.transport_errors["img"] <= slope / 2 + 1e-12
+
+    # Later changes with the same scaling are sent as diffs of narrowed values
+    edited = img.copy()
+    edited[500:503] = 0.25
+    volume.img = edited
+    msg, _ = sent[-1]
+    assert msg["type"] in ("buffer_update", "buffer_ranges")
+    assert msg["data"]["type"] == "uint8"
+
+
+def test_mesh_from_arrays():
+    pts = np.array([[0, 0, 0], [1, 0, 0], [0, 1, 0], [0, 0, 1]], dtype=np.float64)
+    tris = np.array([[0, 1, 2], [0, 1, 3]])
+    mesh = Mesh(pts=pts, tris=tris)
+
+    assert mesh.name == "mesh"
+    assert mesh.pts.dtype == np.float32
+    assert mesh.tris.dtype == np.uint32
+    state = mesh.get_state()
+    assert state["pts"]["type"] == "float32"
+    assert state["tris"]["type"] == "uint32"
+
+    # Deforming the mesh sends only the moved vertices
+    sent = []
+    mesh.send = lambda msg, buffers=None: sent.append(msg)
+    moved = pts.copy()
+    moved[3] = [0, 0, 2]
+    mesh.pts = moved
+    ((msg,),) = [sent]
+    assert msg["type"] in ("buffer_update", "buffer_ranges")
+    assert mesh.get_state("pts") == {}
+
+    with pytest.raises(ValueError, match="both 'pts' and 'tris'"):
+        Mesh(pts=pts)
+
+
+def test_batch_sends_one_envelope():
+    nv = NiiVue()
+    volumes = [Volume(url=f"https://example.com/{i}.nii.gz") for i in range(3)]
+    nv.volumes = volumes
+    sent = []
+    for widget in [nv, *volumes]:
+        widget._send = lambda msg, buffers=None, w=widget: sent.append((w, msg))
+
+    with nv.batch():
+        for volume in volumes:
+            volume.cal_min = 1.0
+            volume.cal_max = 5.0
+            volume.opacity = 0.5
+        nv.opts.is_colorbar = True
+        nv.opts.show_3d_crosshair = True
+        nv.draw_scene()
+        assert not sent
+
+    ((widget, msg),) = sent
+    assert widget is nv
+    content = msg["content"]
+    assert content["type"] == "batch"
+    assert content["data"]["redraw"] == "update_gl_volume"
+    ops = content["data"]["ops"]
+    assert [op["model_id"] for op in ops[:3]] == [v.model_id for v in volumes]
+    assert ops[0]["state"] == {"cal_min": 1.0, "cal_max": 5.0, "opacity": 0.5}
+    assert ops[3]["model_id"] == nv.model_id
+    assert set(ops[3]["state"]) == {"opts"}
+    assert nv._batch is None
+    assert all(volume._batch is None for volume in volumes)
+
+    sent.clear()
+    volumes[0].cal_max = 6.0
+    assert sent[0][0] is volumes[0]
+
+
+def test_batch_splits_binary_state():
+    from ipyniivue.widget import _split_buffers
+
+    raw = memoryview(b"abc")
+    state, paths, buffers = _split_buffers(
+        {"name": "x", "data": {"blob": raw}, "chunks": [b"1", 2]}
+    )
+    assert state == {"name": "x", "data": {"blob": None}, "chunks": [None, 2]}
+    assert paths == [["data", "blob"], ["chunks", 0]]
+    assert buffers == [raw, b"1"]
+
+
+def test_throttle_sends_latest_value():
+    async def sweep():
+        volume = Volume(url="https://example.com/image.nii.gz")
+        volume.throttle = {"cal_max": 20}
+        sent = []
+        volume._send = lambda msg, buffers=None: sent.append(msg["state"])
+
+        for i in range(10):
+            volume.cal_max = float(i)
+        assert sent == [{"cal_max": 0.0}]
+
+        await asyncio.sleep(0.1)
+        assert sent == [{"cal_max": 0.0}, {"cal_max": 9.0}]
+        assert volume.throttle_dropped == {"cal_max": 8}
+
+        volume.opacity = 0.5
+        assert sent[-1] == {"opacity": 0.5}
+
+    asyncio.run(sweep())
+
+
+def test_throttled_scene_is_redrawn_once():
+    async def sweep():
+        nv = NiiVue()
+        nv.throttle = {"scene": 20}
+        sent = []
+        nv._send = lambda msg, buffers=None: sent.append(msg)
+
+        for azimuth in range(0, 100, 10):
+            nv.set_render_azimuth_elevation(azimuth, 15)
+        await asyncio.sleep(0.1)
+
+        draws = [m for m in sent if m.get("content", {}).get("type") == "draw_scene"]
+        updates = [m["state"]["scene"] for m in sent if m["method"] == "update"]
+        assert len(draws) == len(updates) == 2
+        assert updates[-1]["renderAzimuth"] == 90
+
+    asyncio.run(sweep())
+
+
+def test_subscriptions():
+    nv = NiiVue()
+    assert nv._subscriptions == {}
+
+    nv.subscribe("scene.crosshair_pos", rate=20)
+    nv.subscribe("ui_data.is_dragging")
+    assert nv._subscriptions == {
+        "scene": {"crosshairPos": 20},
+        "ui_data": {"isDragging": None},
+    }
+    with pytest.raises(ValueError):
+        nv.subscribe("scene.nope")
+
+    nv.broadcast_to(NiiVue())
+    assert nv._subscriptions["scene"]["crosshairPos"] is None
+    assert "renderAzimuth" in nv._subscriptions["scene"]
+
+    nv.other_nv = []
+    nv.unsubscribe("ui_data.is_dragging")
+    assert nv._subscriptions == {"scene": {"crosshairPos": 20}}
+
+
+@pytest.mark.parametrize(
+    ("policy", "received", "dropped"),
+    [("latest", [4], 4), ("drop_oldest", [3, 4], 3), ("unbounded", [0, 1, 2, 3, 4], 0)],
+)
+def test_event_stream_policies(policy, received, dropped):
+    async def consume():
+        nv = NiiVue()
+        stream = nv.events("location_change", policy=policy, maxsize=2)
+        for i in range(5):
+            nv._handle_custom_msg({"event": "location_change", "data": i}, [])
+        stream.close()
+        assert not nv._event_handlers["location_change"].callbacks
+        return [event async for event in stream], stream.dropped
+
+    assert asyncio.run(consume()) == (received, dropped)
+
+
+def test_load_volumes_async():
+    async def load():
+        nv = NiiVue()
+        volumes = [{"url": "https://example.com/a.nii.gz"}]
+        loaded = nv.load_volumes_async(volumes, timeout=5)
+        assert not loaded.done()
+
+        (volume,) = nv.volumes
+        nv._handle_custom_msg({"event": "image_loaded", "data": {"id": volume.id}}, [])
+        assert await loaded == [volume]
+
+        # already loaded
+        assert await nv.load_volumes_async([volume]) == [volume]
+
+        # The frontend uploads img by itself, so it isn't requested again
+        waiting = nv.load_volumes_async([volume], arrays=True, timeout=0.01)
+        with pytest.raises(TimeoutError):
+            await waiting
+        assert not volume._img_requested
+
+        lazy = nv.add_volume_async(
+            {"url": "https://example.com/b.nii.gz", "lazy_img": True},
+            arrays=True,
+            timeout=0.01,
+        )
+        with pytest.raises(TimeoutError):
+            await lazy
+        lazy_volume = nv.volumes[-1]
+        assert lazy_volume._img_requested
+        assert lazy_volume._img_futures[0].cancelled()
+
+        attached = nv.canvas_attached_async()
+        nv._canvas_attached = True
+        assert await attached is nv
+
+    asyncio.run(load())
+
+
+def test_fetch_scene_updates_stale_scene_for_documents():
+    nv = NiiVue()
+    sent = []
+    nv.send = lambda msg, buffers=None: sent.append(msg)
+    nv.scene.render_azimuth = 45.0
+
+    # The user rotated the view in the browser; without a subscription the
+    # Python copy still holds the old azimuth
+    assert nv._document("")["sceneData"]["azimuth"] == 45.0
+
+    sent.clear()
+    future = nv.fetch_scene()
+    (msg,) = sent
+    assert msg["data"]["method"] == "get_scene"
+    assert "renderAzimuth" in msg["data"]["params"][0]
+    nv._handle_custom_msg(
+        {
+            "event": "reply",
+            "data": {
+                "request_id": msg["data"]["request_id"],
+                "result": {"renderAzimuth": 120.0, "renderElevation": 15.0},
+            },
+        },
+        [],
+    )
+    assert future.result(timeout=0) is nv.scene
+    scene_data = nv._document("")["sceneData"]
+    assert (scene_data["azimuth"], scene_data["elevation"]) == (120.0, 15.0)
+    # The fetched values aren't sent back to the frontend as a change
+    assert len(sent) == 1